@@ -17,6 +17,7 @@ import logging
 
 from database import db
 from models import User, Market, Weather, DamageStatus, UserMarketInterest, MarketAlarmLog
+from market_index import invalidate_market_weather, mark_market_indexes_stale
 
 logger = logging.getLogger(__name__)
 
@@ -219,8 +220,11 @@ class MarketAdminView(SecureModelView):
     def action_activate(self, ids):
         try:
             query = Market.query.filter(Market.id.in_(ids))
+            grids = query.with_entities(Market.nx, Market.ny).distinct().all()
             count = query.update({Market.is_active: True}, synchronize_session='fetch')
             db.session.commit()
+            mark_market_indexes_stale()
+            invalidate_market_weather(grids)
             flash(f'{count}개의 시장을 활성화했습니다.', 'success')
         except Exception as e:
             db.session.rollback()
@@ -230,8 +234,11 @@ class MarketAdminView(SecureModelView):
     def action_deactivate(self, ids):
         try:
             query = Market.query.filter(Market.id.in_(ids))
+            grids = query.with_entities(Market.nx, Market.ny).distinct().all()
             count = query.update({Market.is_active: False}, synchronize_session='fetch')
             db.session.commit()
+            mark_market_indexes_stale()
+            invalidate_market_weather(grids)
             flash(f'{count}개의 시장을 비활성화했습니다.', 'success')
         except Exception as e:
             db.session.rollback()
@@ -501,35 +508,18 @@ class SystemControlView(BaseView):
 
             for user in interested_users:
                 if user.can_receive_fcm():
-                    fcm_tokens.append(user.fcm_token)
                     valid_users.append(user)
 
+            # 사용자별 전체 기기 토큰 (사용자/기기 간 중복 제거)
+            if valid_users:
+                from user_devices import collect_tokens
+                fcm_tokens = collect_tokens(valid_users)
+
             if not fcm_tokens:
                 flash(f'{market.name}에 관심을 가진 사용자 중 FCM 알림을 받을 수 있는 사용자가 없습니다.', 'warning')
                 return redirect(url_for('.index'))
 
-            # FCM 알림 전송
-            from fcm_integration.fcm_utils import fcm_service
-
-            notification_data = {
-                'type': 'test_notification',
-                'market_id': str(market.id),
-                'market_name': market.name,
-            }
-
-            result = fcm_service.send_multicast(
-                tokens=fcm_tokens,
-                title=title,
-                body=body,
-                data=notification_data
-            )
-
-            success_count = result.get('success_count', 0) if result else 0
-            failure_count = result.get('failure_count', 0) if result else len(valid_users)
-
-            logger.info(f"테스트 알림 전송 - 시장: {market.name}, 대상: {len(valid_users)}명, 성공: {success_count}명, 실패: {failure_count}명")
-
-            # 알림 로그 기록
+            # 알림 로그를 성공/실패 0건으로 먼저 기록 (실제 결과는 전송 워커가 반영)
             from models import MarketAlarmLog
             from database import db
             from datetime import datetime
@@ -540,8 +530,8 @@ class SystemControlView(BaseView):
                 alert_title=title,
                 alert_body=body,
                 total_users=len(valid_users),
-                success_count=success_count,
-                failure_count=failure_count,
+                success_count=0,
+                failure_count=0,
                 weather_data={'type': 'test_notification'},
                 created_at=datetime.utcnow()
             )
@@ -549,7 +539,30 @@ class SystemControlView(BaseView):
             db.session.add(alarm_log)
             db.session.commit()
 
-            flash(f'테스트 알림을 전송했습니다. (대상: {len(valid_users)}명, 성공: {success_count}명, 실패: {failure_count}명)', 'success')
+            # FCM 알림 전송 (아웃박스 적재 - 전송 워커가 처리)
+            from notification_outbox import enqueue_notification
+
+            notification_data = {
+                'type': 'test_notification',
+                'market_id': str(market.id),
+                'market_name': market.name,
+            }
+
+            entry, _ = enqueue_notification(
+                tokens=fcm_tokens,
+                title=title,
+                body=body,
+                data=notification_data,
+                alarm_log_ids=[alarm_log.id],
+                recipient_count=len(valid_users)
+            )
+
+            logger.info(f"테스트 알림 적재 - 시장: {market.name}, 대상: {len(valid_users)}명, 아웃박스 ID: {entry.id}")
+
+            from weather_cache import weather_response_cache
+            weather_response_cache.invalidate_dashboards()
+
+            flash(f'테스트 알림을 전송 대기열에 등록했습니다. (대상: {len(valid_users)}명)', 'success')
 
         except Exception as e:
             logger.error(f"테스트 알림 전송 오류: {e}")
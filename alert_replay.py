@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+날씨 알림 엔진 드라이런 / 재생(replay) 도구
+
+저장된 Weather 스냅샷(또는 JSON Lines로 보관된 스냅샷)을 평가 → 그룹화 → 메시지 생성
+파이프라인 전체에 통과시키되, 실제 FCM 전송 대신 no-op 발송기를 사용합니다.
+처리량, 단계별 소요 시간, 전송되었을 알림 규모를 보고하므로
+알림 핫패스의 재현 가능한 벤치마크로 사용할 수 있습니다.
+
+사용법:
+    python alert_replay.py                                   # 현재 DB 데이터로 드라이런
+    python alert_replay.py --as-of "2026-10-19 15:00"        # 과거 시점 기준 재생
+    python alert_replay.py --export snapshot.jsonl --since "2026-10-19 00:00"
+    python alert_replay.py --archive snapshot.jsonl --as-of "2026-10-19 15:00"
+"""
+
+import json
+import time
+import logging
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from weather_alerts import WeatherAlertSystem
+
+logger = logging.getLogger(__name__)
+
+
+class NoopSender:
+    """FCM 대신 전송될 알림 내역만 집계하는 no-op 발송기 (스레드 안전)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.messages = 0
+        self.tokens = 0
+        self.payload_bytes = 0
+        self.by_type = Counter()
+
+    def _record(self, token_count: int, title: str, body: str, data: Optional[Dict]):
+        size = len(title.encode('utf-8')) + len(body.encode('utf-8'))
+        if data:
+            size += len(json.dumps(data, ensure_ascii=False).encode('utf-8'))
+
+        with self._lock:
+            self.messages += token_count
+            self.tokens += token_count
+            self.payload_bytes += size * token_count
+            self.by_type[(data or {}).get('type', 'unknown')] += token_count
+
+    def send_notification(self, token: str, title: str, body: str,
+                          data: Optional[Dict] = None, image_url: Optional[str] = None) -> bool:
+        self._record(1, title, body, data)
+        return True
+
+    def send_multicast(self, tokens: List[str], title: str, body: str, data: Optional[Dict] = None) -> Dict:
+        self._record(len(tokens), title, body, data)
+        return {"success_count": len(tokens), "failure_count": 0, "failed_tokens": [], "invalid_tokens": []}
+
+    def send_to_topic(self, topic: str, title: str, body: str, data: Optional[Dict] = None) -> bool:
+        self._record(1, title, body, data)
+        return True
+
+    def prune_invalid_tokens(self) -> int:
+        return 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'messages': self.messages,
+            'tokens': self.tokens,
+            'payload_bytes': self.payload_bytes,
+            'by_type': dict(self.by_type)
+        }
+
+
+class ArchiveForecastSource:
+    """JSON Lines로 보관된 Weather 스냅샷에서 예보 데이터를 제공"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rows_by_grid = defaultdict(list)
+        self.row_count = 0
+
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                row = json.loads(line)
+                if row.get('api_type') != 'forecast':
+                    continue
+                row['created_at'] = datetime.fromisoformat(row['created_at']) if row.get('created_at') else None
+                self.rows_by_grid[(row['nx'], row['ny'])].append(row)
+                self.row_count += 1
+
+        for rows in self.rows_by_grid.values():
+            rows.sort(key=lambda r: (r.get('fcst_date') or '', r.get('fcst_time') or ''))
+
+    def get_forecast(self, nx: int, ny: int, since: datetime, until: datetime) -> Dict[str, Any]:
+        """_get_forecast_from_db와 같은 형식으로 [since, until] 사이에 수집된 예보 반환"""
+        data = [
+            {
+                'fcst_date': row.get('fcst_date'),
+                'fcst_time': row.get('fcst_time'),
+                'pop': row.get('pop'),
+                'pty': row.get('pty'),
+                'tmp': row.get('temp'),
+                'wsd': row.get('wind_speed'),
+                'sno': 0,
+            }
+            for row in self.rows_by_grid.get((nx, ny), [])
+            if row['created_at'] is not None and since <= row['created_at'] <= until
+        ]
+
+        if not data:
+            return {'status': 'empty', 'message': 'No forecast data in archive'}
+        return {'status': 'success', 'data': data}
+
+
+def export_weather_snapshot(path: str, since: datetime, until: Optional[datetime] = None) -> int:
+    """
+    Weather 테이블의 레코드를 JSON Lines로 보관 (정리 작업으로 삭제되기 전 재생용 스냅샷 확보)
+
+    Returns:
+        int: 기록된 레코드 수
+    """
+    from app import app
+    from models import Weather
+
+    with app.app_context():
+        query = Weather.query.filter(Weather.created_at >= since)
+        if until is not None:
+            query = query.filter(Weather.created_at <= until)
+
+        count = 0
+        with open(path, 'w', encoding='utf-8') as f:
+            for weather in query.order_by(Weather.id).yield_per(1000):
+                f.write(json.dumps(weather.to_dict(), ensure_ascii=False) + '\n')
+                count += 1
+
+    logger.info(f"날씨 스냅샷 {count}건을 {path}에 저장했습니다.")
+    return count
+
+
+def run_alert_replay(hours: int = 24,
+                     as_of: Optional[datetime] = None,
+                     archive_path: Optional[str] = None,
+                     dispatch_workers: Optional[int] = None) -> Dict[str, Any]:
+    """
+    알림 파이프라인을 no-op 발송기로 실행하고 성능/규모 보고서 반환
+
+    Args:
+        hours: 확인할 예보 시간 범위
+        as_of: 재생 기준 시각 (로컬 시간). None이면 현재 시각
+        archive_path: 보관된 스냅샷 경로. None이면 DB의 Weather 테이블 사용
+        dispatch_workers: 전송 단계 동시 스레드 수 (None이면 기본 설정)
+
+    Returns:
+        dict: 실행 결과, 처리량, 단계별 소요 시간, 전송 예정 알림 규모
+    """
+    sender = NoopSender()
+    alert_system = WeatherAlertSystem(sender=sender)
+    alert_system.reference_time = as_of
+    alert_system.api_fallback_enabled = False  # 재생 시 기상청 API 호출/저장 금지
+    alert_system.incremental_enabled = False  # 벤치마크는 항상 전체 시장 평가
+    if dispatch_workers:
+        alert_system.dispatch_workers = dispatch_workers
+
+    source_desc = 'database'
+    if archive_path:
+        alert_system.forecast_source = ArchiveForecastSource(archive_path)
+        source_desc = f"archive:{archive_path} ({alert_system.forecast_source.row_count} rows)"
+
+    started = time.perf_counter()
+    result = alert_system.check_all_markets_with_all_conditions(hours=hours, dry_run=True)
+    elapsed = time.perf_counter() - started
+
+    checked = result.get('checked_markets', 0)
+    report = {
+        'success': result.get('success', False),
+        'error': result.get('error'),
+        'source': source_desc,
+        'as_of': (as_of or datetime.now()).isoformat(),
+        'hours': hours,
+        'elapsed_seconds': round(elapsed, 4),
+        'throughput': {
+            'markets_per_second': round(checked / elapsed, 2) if elapsed > 0 else None,
+            'messages_per_second': round(sender.messages / elapsed, 2) if elapsed > 0 else None
+        },
+        'stages': result.get('metrics', {}),
+        'volume': {
+            'checked_markets': checked,
+            'skipped_markets': result.get('skipped_markets', 0),
+            'alerting_markets': result.get('alerting_markets', 0),
+            'target_users': result.get('target_users', 0),
+            **sender.to_dict()
+        }
+    }
+
+    logger.info(
+        f"알림 드라이런 완료: {checked}개 시장, {sender.messages}건 전송 예정, "
+        f"{report['elapsed_seconds']}s 소요"
+    )
+    return report
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='날씨 알림 엔진 드라이런/재생')
+    parser.add_argument('--hours', type=int, default=24, help='확인할 예보 시간 범위')
+    parser.add_argument('--as-of', help='재생 기준 시각 (예: "2026-10-19 15:00")')
+    parser.add_argument('--archive', help='재생에 사용할 스냅샷(JSON Lines) 경로')
+    parser.add_argument('--workers', type=int, help='전송 단계 동시 스레드 수')
+    parser.add_argument('--export', help='Weather 레코드를 지정 경로로 보관하고 종료')
+    parser.add_argument('--since', help='--export 시작 시각 (UTC)')
+    parser.add_argument('--until', help='--export 종료 시각 (UTC)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.export:
+        if not args.since:
+            parser.error('--export에는 --since가 필요합니다.')
+        export_weather_snapshot(
+            args.export,
+            datetime.fromisoformat(args.since),
+            datetime.fromisoformat(args.until) if args.until else None
+        )
+    else:
+        report = run_alert_replay(
+            hours=args.hours,
+            as_of=datetime.fromisoformat(args.as_of) if args.as_of else None,
+            archive_path=args.archive,
+            dispatch_workers=args.workers
+        )
+        print(json.dumps(report, ensure_ascii=False, indent=2))
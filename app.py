@@ -129,20 +129,32 @@ def submit_report():
 
 @app.route('/api/reports', methods=['GET'])
 def get_reports():
-    """신고 내역 조회 (관리자용)"""
-    from models import MarketReport, Market
+    """신고 내역 조회 (관리자용, cursor 파라미터가 있으면 커서 페이지네이션)"""
     from auth_utils import admin_required
+    from listing_queries import REPORT_LIST
+    from models import MarketReport
+    from pagination import (REPORT_ORDER, CursorError, cursor_pagination_info, cursor_requested,
+                            keyset_paginate, requested_total_mode)
     
     @admin_required
     def _get_reports(current_user):
-        reports = MarketReport.query.order_by(MarketReport.created_at.desc()).all()
-        result = []
-        for report in reports:
-            market = Market.query.get(report.market_id)
-            report_data = report.to_dict()
-            report_data['market_name'] = market.name if market else '알 수 없음'
-            result.append(report_data)
-        return jsonify(result)
+        # 신고자/시장 이름은 조인으로 함께 조회 (신고마다 추가 조회 없음)
+        query = REPORT_LIST.query()
+
+        if cursor_requested():
+            per_page = request.args.get('per_page', 20, type=int)
+            try:
+                page = keyset_paginate(query, REPORT_ORDER, per_page, request.args.get('cursor'),
+                                       total_mode=requested_total_mode())
+            except CursorError as e:
+                return jsonify({'error': str(e)}), 400
+            return jsonify({
+                'data': REPORT_LIST.serialize_all(page.items),
+                'pagination': cursor_pagination_info(page, per_page)
+            })
+
+        rows = query.order_by(MarketReport.created_at.desc(), MarketReport.id.desc()).all()
+        return jsonify(REPORT_LIST.serialize_all(rows))
     
     return _get_reports()
 
@@ -484,6 +496,8 @@ def delete_account():
     """회원 탈퇴"""
     from auth_utils import login_required
     from models import User
+    from market_topics import unsubscribe_token_from_market_topics
+    from user_devices import remove_user_devices
 
     @login_required
     def _delete_account(current_user):
@@ -499,6 +513,8 @@ def delete_account():
 
             # 민감 정보 및 기능적 데이터 초기화
             current_user.password_hash = 'deleted'  # nullable=False 이므로 None 대신 비활성 상태 표시
+            unsubscribe_token_from_market_topics(current_user)
+            remove_user_devices(current_user)
             current_user.fcm_token = None
             current_user.fcm_enabled = False
 
@@ -524,6 +540,8 @@ def register_fcm_token():
     """FCM 토큰 등록/업데이트"""
     from auth_utils import login_required
     from models import User
+    from market_topics import sync_user_market_topics, unsubscribe_token_from_market_topics
+    from user_devices import register_device, remove_device
     
     @login_required
     def _register_fcm_token(current_user):
@@ -537,21 +555,27 @@ def register_fcm_token():
             fcm_token = data.get('token')
             device_info = data.get('device_info', {})
             
-            # FCM 토큰 중복 제거 (다른 사용자가 같은 토큰을 가지고 있다면 삭제)
+            # 토큰 변경 여부 (register_device가 User.fcm_token을 새 토큰으로 바꾸기 전에 확인)
+            previous_token = current_user.fcm_token
+
+            # 기기 토큰 upsert (token 유일 인덱스) - 다른 사용자에게 있던 토큰이면 현재 사용자에게 이동
             # 예: 같은 기기에서 다른 계정으로 로그인한 경우
-            existing_users = User.query.filter(
-                User.fcm_token == fcm_token, 
-                User.id != current_user.id
-            ).all()
-            
-            if existing_users:
-                for old_user in existing_users:
+            previous_owner_id = register_device(current_user, fcm_token, device_info, data.get('platform'))
+            if previous_owner_id is not None:
+                old_user = db.session.get(User, previous_owner_id)
+                if old_user is not None and old_user.fcm_token == fcm_token:
                     logger.info(f"Duplicate FCM token found. Clearing token for user {old_user.id} ({old_user.email})")
-                    old_user.fcm_token = None
-                    old_user.fcm_enabled = False
+                    # 이전 사용자의 시장 주제 구독 해제 (같은 기기가 남의 시장 알림을 받지 않도록)
+                    unsubscribe_token_from_market_topics(old_user, fcm_token)
+                    remove_device(old_user, fcm_token)
+                    if not old_user.fcm_token:
+                        old_user.fcm_enabled = False
             
-            # 토큰 업데이트
-            current_user.update_fcm_token(fcm_token, device_info)
+            # 대표 토큰이 바뀌면 이전 토큰의 시장 주제 구독 해제
+            if previous_token and previous_token != fcm_token:
+                unsubscribe_token_from_market_topics(current_user, previous_token)
+
+            sync_user_market_topics(current_user)
             db.session.commit()
             
             # 기본 주제 구독 (선택사항)
@@ -564,7 +588,8 @@ def register_fcm_token():
             return jsonify({
                 'message': 'FCM 토큰이 등록되었습니다.',
                 'fcm_enabled': current_user.fcm_enabled,
-                'subscribed_topics': current_user.fcm_topics
+                'subscribed_topics': current_user.fcm_topics,
+                'device_count': current_user.devices.count()
             })
             
         except Exception as e:
@@ -573,10 +598,43 @@ def register_fcm_token():
     
     return _register_fcm_token()
 
+@app.route('/api/fcm/devices', methods=['GET', 'DELETE'])
+def fcm_devices():
+    """등록된 기기 목록 조회 / 기기 토큰 삭제 (로그아웃 시)"""
+    from auth_utils import login_required
+    from models import UserDevice
+    from market_topics import unsubscribe_token_from_market_topics
+    from user_devices import remove_device
+
+    @login_required
+    def _fcm_devices(current_user):
+        if request.method == 'GET':
+            devices = current_user.devices.order_by(UserDevice.last_seen_at.desc()).all()
+            return jsonify({'devices': [device.to_dict() for device in devices]})
+
+        data = request.get_json(silent=True, force=True) or {}
+        token = data.get('token')
+        if not token:
+            return jsonify({'error': 'FCM 토큰이 필요합니다.'}), 400
+
+        try:
+            if current_user.fcm_token == token:
+                unsubscribe_token_from_market_topics(current_user, token)
+            if not remove_device(current_user, token):
+                return jsonify({'error': '등록되지 않은 기기입니다.'}), 404
+            db.session.commit()
+            return jsonify({'message': '기기가 삭제되었습니다.', 'device_count': current_user.devices.count()})
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'error': f'기기 삭제 실패: {str(e)}'}), 500
+
+    return _fcm_devices()
+
 @app.route('/api/fcm/settings', methods=['GET', 'POST'])
 def fcm_settings():
     """FCM 설정 조회/업데이트"""
     from auth_utils import login_required
+    from market_topics import sync_user_market_topics
 
     @login_required
     def _fcm_settings(current_user):
@@ -600,6 +658,8 @@ def fcm_settings():
                         current_user.enable_fcm()
                     else:
                         current_user.disable_fcm()
+                    # 주제 기반 전송 모드: 수신 가능 여부에 맞춰 시장 주제 구독/해제
+                    sync_user_market_topics(current_user)
 
                 # 주제 구독 관리
                 if 'subscribe_topics' in data:
@@ -721,9 +781,10 @@ def update_do_not_disturb():
 
 @app.route('/api/fcm/test', methods=['POST'])
 def test_fcm_notification():
-    """FCM 테스트 알림 전송"""
+    """FCM 테스트 알림 전송 (아웃박스 적재)"""
     from auth_utils import login_required
-    from fcm_integration.fcm_utils import fcm_service
+    from notification_outbox import enqueue_notification
+    from user_devices import user_tokens
     
     @login_required
     def _test_fcm_notification(current_user):
@@ -731,21 +792,22 @@ def test_fcm_notification():
             return jsonify({'error': 'FCM 알림을 받을 수 없는 상태입니다.'}), 400
         
         try:
-            # 테스트 알림 전송
-            success = fcm_service.send_notification(
-                token=current_user.fcm_token,
+            # 테스트 알림 적재
+            entry, _ = enqueue_notification(
+                tokens=user_tokens(current_user),
                 title="🧪 테스트 알림",
                 body="FCM 설정이 정상적으로 작동합니다!",
                 data={
                     "type": "test",
                     "user_id": str(current_user.id)
-                }
+                },
+                idempotency_key=request.headers.get('Idempotency-Key')
             )
             
-            if success:
-                return jsonify({'message': '테스트 알림이 전송되었습니다.'})
-            else:
-                return jsonify({'error': '테스트 알림 전송에 실패했습니다.'}), 500
+            return jsonify({
+                'message': '테스트 알림이 전송 대기열에 등록되었습니다.',
+                'outbox_id': entry.id
+            }), 202
                 
         except Exception as e:
             return jsonify({'error': f'테스트 알림 전송 실패: {str(e)}'}), 500
@@ -754,10 +816,11 @@ def test_fcm_notification():
 
 @app.route('/api/admin/fcm/send', methods=['POST'])
 def admin_send_fcm():
-    """관리자용 FCM 알림 전송"""
-    from fcm_integration.fcm_utils import fcm_service
+    """관리자용 FCM 알림 전송 (아웃박스 적재)"""
+    from notification_outbox import enqueue_notification
     from models import User
     from auth_utils import admin_required
+    from user_devices import collect_tokens
     
     @admin_required
     def _admin_send_fcm(current_user):
@@ -773,20 +836,24 @@ def admin_send_fcm():
             title = data.get('title')
             body = data.get('body')
             notification_data = data.get('data', {})
+            # 같은 키로 다시 요청하면 기존 적재 건을 반환 (중복 전송 방지)
+            idempotency_key = data.get('idempotency_key') or request.headers.get('Idempotency-Key')
             
             # 전송 방식 선택
             if data.get('topic'):
                 # 주제로 전송
-                success = fcm_service.send_to_topic(
+                entry, created = enqueue_notification(
                     topic=data['topic'],
                     title=title,
                     body=body,
-                    data=notification_data
+                    data=notification_data,
+                    idempotency_key=idempotency_key
                 )
                 return jsonify({
-                    'message': f"주제 '{data['topic']}'로 알림이 전송되었습니다.",
-                    'success': success
-                })
+                    'message': f"주제 '{data['topic']}' 알림이 전송 대기열에 등록되었습니다.",
+                    'outbox_id': entry.id,
+                    'duplicate': not created
+                }), 202
             
             elif data.get('user_ids'):
                 # 특정 사용자들에게 전송
@@ -799,13 +866,18 @@ def admin_send_fcm():
                 if not users:
                     return jsonify({'error': '알림을 받을 수 있는 사용자가 없습니다.'}), 400
                 
-                tokens = [user.fcm_token for user in users]
-                result = fcm_service.send_multicast(tokens, title, body, notification_data)
+                # 사용자/기기 간 중복 제거한 전체 기기 토큰
+                tokens = collect_tokens(users)
+                entry, created = enqueue_notification(
+                    tokens=tokens, title=title, body=body, data=notification_data,
+                    idempotency_key=idempotency_key
+                )
                 
                 return jsonify({
-                    'message': f'{len(users)}명의 사용자에게 알림이 전송되었습니다.',
-                    'result': result
-                })
+                    'message': f'{len(users)}명의 사용자 알림이 전송 대기열에 등록되었습니다.',
+                    'outbox_id': entry.id,
+                    'duplicate': not created
+                }), 202
             
             else:
                 # 모든 FCM 활성화 사용자에게 전송
@@ -818,24 +890,161 @@ def admin_send_fcm():
                 if not users:
                     return jsonify({'error': '알림을 받을 수 있는 사용자가 없습니다.'}), 400
                 
-                tokens = [user.fcm_token for user in users]
-                result = fcm_service.send_multicast(tokens, title, body, notification_data)
+                # 사용자/기기 간 중복 제거한 전체 기기 토큰
+                tokens = collect_tokens(users)
+                entry, created = enqueue_notification(
+                    tokens=tokens, title=title, body=body, data=notification_data,
+                    idempotency_key=idempotency_key
+                )
                 
                 return jsonify({
-                    'message': f'전체 {len(users)}명의 사용자에게 알림이 전송되었습니다.',
-                    'result': result
-                })
+                    'message': f'전체 {len(users)}명의 사용자 알림이 전송 대기열에 등록되었습니다.',
+                    'outbox_id': entry.id,
+                    'duplicate': not created
+                }), 202
                 
         except Exception as e:
             return jsonify({'error': f'알림 전송 실패: {str(e)}'}), 500
     
     return _admin_send_fcm()
 
+@app.route('/api/admin/fcm/market-topics/sync', methods=['POST'])
+def admin_sync_market_topics():
+    """관리자용: 시장별 FCM 주제 구독 일괄 재동기화 (백그라운드 작업)"""
+    from auth_utils import admin_required
+    from background_jobs import job_registry
+    from market_topics import resync_all_market_topics
+
+    @admin_required
+    def _admin_sync_market_topics(current_user):
+        data = request.get_json(silent=True, force=True) or {}
+        market_ids = data.get('market_ids')
+
+        def _run():
+            with app.app_context():
+                return resync_all_market_topics(market_ids)
+
+        try:
+            job_id = job_registry.submit('market_topic_sync', _run)
+            return jsonify({
+                'status': 'accepted',
+                'message': '시장 주제 재동기화 작업이 시작되었습니다.',
+                'job_id': job_id,
+                'status_url': f'/api/admin/jobs/{job_id}'
+            }), 202
+        except Exception as e:
+            return jsonify({'error': f'시장 주제 재동기화 실패: {str(e)}'}), 500
+
+    return _admin_sync_market_topics()
+
+@app.route('/api/admin/fcm/validate-tokens', methods=['POST'])
+def admin_validate_fcm_tokens():
+    """관리자용: 저장된 FCM 토큰 dry-run 검증 즉시 실행 (백그라운드 작업)"""
+    from auth_utils import admin_required
+    from background_jobs import job_registry
+    from token_validation import validate_stored_tokens
+
+    @admin_required
+    def _admin_validate_fcm_tokens(current_user):
+        def _run():
+            with app.app_context():
+                return validate_stored_tokens()
+
+        try:
+            job_id = job_registry.submit('fcm_token_validation', _run)
+            return jsonify({
+                'status': 'accepted',
+                'message': 'FCM 토큰 검증 작업이 시작되었습니다.',
+                'job_id': job_id,
+                'status_url': f'/api/admin/jobs/{job_id}'
+            }), 202
+        except Exception as e:
+            return jsonify({'error': f'FCM 토큰 검증 실패: {str(e)}'}), 500
+
+    return _admin_validate_fcm_tokens()
+
+@app.route('/api/admin/fcm/stats', methods=['GET'])
+def get_fcm_delivery_stats():
+    """관리자용: FCM 전송 속도 조절(대기열 깊이/스로틀링), 알림 병합, 전송 결과 통계"""
+    from fcm_integration.fcm_utils import fcm_service
+    from weather_alerts import weather_alert_system
+    from auth_utils import admin_required
+
+    @admin_required
+    def _get_fcm_delivery_stats(current_user):
+        try:
+            stats = fcm_service.get_delivery_stats()
+            coalescer_metrics = getattr(weather_alert_system.sender, 'metrics', None)
+            if coalescer_metrics is not None:
+                stats['coalescer'] = coalescer_metrics()
+            return jsonify(stats)
+        except Exception as e:
+            return jsonify({'error': f'FCM 전송 통계 조회 실패: {str(e)}'}), 500
+
+    return _get_fcm_delivery_stats()
+
+@app.route('/api/admin/weather-cache/stats', methods=['GET'])
+def get_weather_cache_stats():
+    """관리자용: 날씨 조회 응답 캐시 적중/실패 통계"""
+    from weather_cache import weather_response_cache
+    from auth_utils import admin_required
+
+    @admin_required
+    def _get_weather_cache_stats(current_user):
+        try:
+            return jsonify(weather_response_cache.metrics())
+        except Exception as e:
+            return jsonify({'error': f'날씨 캐시 통계 조회 실패: {str(e)}'}), 500
+
+    return _get_weather_cache_stats()
+
+@app.route('/api/admin/notifications/outbox', methods=['GET'])
+def get_notification_outbox():
+    """관리자용: 알림 아웃박스 상태별 통계와 최근 데드레터 조회"""
+    from models import NotificationOutbox
+    from notification_outbox import get_outbox_stats
+    from auth_utils import admin_required
+
+    @admin_required
+    def _get_notification_outbox(current_user):
+        try:
+            limit = min(request.args.get('limit', 20, type=int), 100)
+            dead_letters = NotificationOutbox.query.filter_by(status='dead') \
+                .order_by(NotificationOutbox.updated_at.desc()).limit(limit).all()
+            return jsonify({
+                'stats': get_outbox_stats(),
+                'dead_letters': [entry.to_dict() for entry in dead_letters]
+            })
+        except Exception as e:
+            return jsonify({'error': f'아웃박스 조회 실패: {str(e)}'}), 500
+
+    return _get_notification_outbox()
+
+@app.route('/api/admin/notifications/outbox/<int:outbox_id>/retry', methods=['POST'])
+def retry_notification_outbox(outbox_id):
+    """관리자용: 데드레터 메시지 재전송 요청"""
+    from notification_outbox import requeue_dead_letter
+    from auth_utils import admin_required
+
+    @admin_required
+    def _retry_notification_outbox(current_user):
+        try:
+            entry = requeue_dead_letter(outbox_id)
+            if entry is None:
+                return jsonify({'error': '재전송할 데드레터 메시지를 찾을 수 없습니다.'}), 404
+            return jsonify({'message': '메시지가 다시 전송 대기열에 등록되었습니다.', 'outbox': entry.to_dict()})
+        except Exception as e:
+            return jsonify({'error': f'재전송 요청 실패: {str(e)}'}), 500
+
+    return _retry_notification_outbox()
+
 @app.route('/api/admin/logs/alerts', methods=['GET'])
 def get_admin_alert_logs():
-    """관리자용 알림 전송 이력 조회"""
-    from models import MarketAlarmLog, Market
+    """관리자용 알림 전송 이력 조회 (cursor 파라미터가 있으면 커서 페이지네이션)"""
+    from models import MarketAlarmLog
     from auth_utils import admin_required
+    from listing_queries import ALARM_LOG_DETAIL
+    from pagination import ALARM_LOG_ORDER, CursorError, cursor_requested, keyset_paginate, requested_total_mode
     
     @admin_required
     def _get_logs(current_user):
@@ -843,20 +1052,34 @@ def get_admin_alert_logs():
         per_page = request.args.get('per_page', 20, type=int)
         market_id = request.args.get('market_id', type=int)
         
-        query = MarketAlarmLog.query
+        # 시장 이름은 조인으로 함께 조회
+        query = ALARM_LOG_DETAIL.query()
         
         # 필터링
         if market_id:
-            query = query.filter_by(market_id=market_id)
-            
+            query = query.filter(MarketAlarmLog.market_id == market_id)
+
+        if cursor_requested():
+            try:
+                result = keyset_paginate(query, ALARM_LOG_ORDER, per_page, request.args.get('cursor'),
+                                         total_mode=requested_total_mode())
+            except CursorError as e:
+                return jsonify({'error': str(e)}), 400
+            return jsonify({
+                'logs': ALARM_LOG_DETAIL.serialize_all(result.items),
+                'total': result.total,
+                'next_cursor': result.next_cursor,
+                'has_next': result.has_next
+            })
+
         # 정렬 (최신순)
-        query = query.order_by(MarketAlarmLog.created_at.desc())
+        query = query.order_by(MarketAlarmLog.created_at.desc(), MarketAlarmLog.id.desc())
         
         # 페이징
         pagination = query.paginate(page=page, per_page=per_page, error_out=False)
         
         return jsonify({
-            'logs': [log.to_dict() for log in pagination.items],
+            'logs': ALARM_LOG_DETAIL.serialize_all(pagination.items),
             'total': pagination.total,
             'pages': pagination.pages,
             'current_page': page,
@@ -867,9 +1090,11 @@ def get_admin_alert_logs():
 
 @app.route('/api/user/logs/alerts', methods=['GET'])
 def get_user_alert_logs():
-    """사용자용 알림 전송 이력 조회 (관심 시장만)"""
+    """사용자용 알림 전송 이력 조회 (관심 시장만, cursor 파라미터가 있으면 커서 페이지네이션)"""
     from models import MarketAlarmLog, UserMarketInterest
     from auth_utils import login_required
+    from listing_queries import ALARM_LOG_DETAIL
+    from pagination import ALARM_LOG_ORDER, CursorError, cursor_requested, keyset_paginate, requested_total_mode
     
     @login_required
     def _get_user_logs(current_user):
@@ -885,25 +1110,43 @@ def get_user_alert_logs():
         market_ids = [m[0] for m in interested_market_ids]
         
         if not market_ids:
-            return jsonify({
+            empty = {
                 'logs': [],
                 'total': 0,
-                'pages': 0,
-                'current_page': page,
                 'has_next': False,
                 'message': '등록된 관심 시장이 없습니다.'
-            })
-            
+            }
+            if cursor_requested():
+                empty['next_cursor'] = None
+            else:
+                empty.update({'pages': 0, 'current_page': page})
+            return jsonify(empty)
+
         # 해당 시장들의 알림 로그 조회
-        query = MarketAlarmLog.query.filter(
+        query = ALARM_LOG_DETAIL.query().filter(
             MarketAlarmLog.market_id.in_(market_ids)
-        ).order_by(MarketAlarmLog.created_at.desc())
+        )
+
+        if cursor_requested():
+            try:
+                result = keyset_paginate(query, ALARM_LOG_ORDER, per_page, request.args.get('cursor'),
+                                         total_mode=requested_total_mode())
+            except CursorError as e:
+                return jsonify({'error': str(e)}), 400
+            return jsonify({
+                'logs': ALARM_LOG_DETAIL.serialize_all(result.items),
+                'total': result.total,
+                'next_cursor': result.next_cursor,
+                'has_next': result.has_next
+            })
+
+        query = query.order_by(MarketAlarmLog.created_at.desc(), MarketAlarmLog.id.desc())
         
         # 페이징
         pagination = query.paginate(page=page, per_page=per_page, error_out=False)
         
         return jsonify({
-            'logs': [log.to_dict() for log in pagination.items],
+            'logs': ALARM_LOG_DETAIL.serialize_all(pagination.items),
             'total': pagination.total,
             'pages': pagination.pages,
             'current_page': page,
@@ -960,7 +1203,11 @@ def create_user_admin():
 
 @app.route('/api/markets', methods=['GET', 'POST'])
 def handle_markets():
+    from sqlalchemy import func
     from models import Market
+    from http_cache import conditional_response, make_etag
+    from pagination import (MARKET_NAME_ORDER, CursorError, cursor_pagination_info, cursor_requested,
+                            decode_cursor, keyset_paginate, requested_total_mode)
     if request.method == 'GET':
         # 쿼리 파라미터
         page = request.args.get('page', 1, type=int)
@@ -974,25 +1221,64 @@ def handle_markets():
         if is_active is not None:
             query = query.filter_by(is_active=(is_active.lower() == 'true'))
 
-        # 페이지네이션
-        pagination = query.order_by(Market.name).paginate(
-            page=page,
-            per_page=per_page,
-            error_out=False
-        )
+        # 검증자: 조건에 맞는 시장 수와 최근 수정 시각 (집계 한 번, 변경 없으면 목록 조회 생략)
+        market_count, last_updated = query.with_entities(
+            func.count(Market.id), func.max(Market.updated_at)
+        ).one()
 
-        return jsonify({
-            'status': 'success',
-            'data': [market.to_dict() for market in pagination.items],
-            'pagination': {
-                'page': pagination.page,
-                'per_page': pagination.per_page,
-                'total': pagination.total,
-                'pages': pagination.pages,
-                'has_next': pagination.has_next,
-                'has_prev': pagination.has_prev
+        if cursor_requested():
+            # 커서 방식: (name, id) 다음부터 인덱스로 조회 (OFFSET 없음, 개수는 위 집계 재사용)
+            cursor = request.args.get('cursor')
+            try:
+                if cursor:
+                    decode_cursor(MARKET_NAME_ORDER, cursor)
+            except CursorError as e:
+                return jsonify({'error': str(e)}), 400
+
+            def _build_cursor_page():
+                result = keyset_paginate(query, MARKET_NAME_ORDER, per_page, cursor)
+                info = cursor_pagination_info(result, per_page)
+                if requested_total_mode():
+                    info['total'] = market_count
+                return {
+                    'status': 'success',
+                    'data': [market.to_dict() for market in result.items],
+                    'pagination': info
+                }
+
+            return conditional_response(
+                make_etag('markets-cursor', cursor, per_page, is_active, requested_total_mode(),
+                          market_count, last_updated),
+                _build_cursor_page,
+                last_modified=last_updated
+            )
+
+        def _build():
+            # 페이지네이션
+            pagination = query.order_by(Market.name).paginate(
+                page=page,
+                per_page=per_page,
+                error_out=False
+            )
+
+            return {
+                'status': 'success',
+                'data': [market.to_dict() for market in pagination.items],
+                'pagination': {
+                    'page': pagination.page,
+                    'per_page': pagination.per_page,
+                    'total': pagination.total,
+                    'pages': pagination.pages,
+                    'has_next': pagination.has_next,
+                    'has_prev': pagination.has_prev
+                }
             }
-        })
+
+        return conditional_response(
+            make_etag('markets', page, per_page, is_active, market_count, last_updated),
+            _build,
+            last_modified=last_updated
+        )
 
     elif request.method == 'POST':
         data = request.get_json(silent=True, force=True) or {}
@@ -1009,8 +1295,8 @@ def handle_markets():
 
 @app.route('/api/markets/search', methods=['GET'])
 def search_markets():
-    """시장 이름으로 검색"""
-    from models import Market
+    """시장 이름/위치/초성으로 검색 (순위순)"""
+    from market_search import search_markets as search_market_index
 
     query = request.args.get('q', '').strip()
     limit = request.args.get('limit', 20, type=int)
@@ -1022,29 +1308,81 @@ def search_markets():
         return jsonify({'error': '검색어는 최소 2글자 이상이어야 합니다.'}), 400
 
     try:
-        markets = Market.search_by_name(query, limit)
+        results = search_market_index(query, max(1, min(limit, 100)))
         return jsonify({
             'query': query,
-            'count': len(markets),
-            'markets': [market.to_dict() for market in markets]
+            'count': len(results),
+            'markets': [dict(market.to_dict(), match_type=match_type) for market, match_type in results]
         })
     except Exception as e:
         return jsonify({'error': f'검색 중 오류가 발생했습니다: {str(e)}'}), 500
 
+@app.route('/api/markets/nearby', methods=['GET'])
+def get_nearby_markets():
+    """위경도에서 가까운 시장과 최신 날씨 조회"""
+    from weather_lookup import build_nearby_markets
+
+    lat = request.args.get('lat', type=float)
+    lon = request.args.get('lon', type=float)
+    k = request.args.get('k', 5, type=int)
+    radius_km = request.args.get('radius_km', type=float)
+
+    if lat is None or lon is None:
+        return jsonify({'error': 'lat, lon 파라미터가 필요합니다.'}), 400
+    if not (-90 <= lat <= 90) or not (-180 <= lon <= 180):
+        return jsonify({'error': '위경도 범위가 올바르지 않습니다.'}), 400
+    if radius_km is not None and radius_km <= 0:
+        return jsonify({'error': 'radius_km는 0보다 커야 합니다.'}), 400
+
+    try:
+        return jsonify(build_nearby_markets(lat, lon, max(1, min(k, 50)), radius_km))
+    except Exception as e:
+        return jsonify({'error': f'가까운 시장 조회 실패: {str(e)}'}), 500
+
+@app.route('/api/markets/map', methods=['GET'])
+def get_market_map():
+    """지도 영역 안의 시장 군집/표식과 알림 상태 조회"""
+    from http_cache import conditional_response, make_etag
+    from market_map import MARKET_MAP_MAX_MARKERS, MapBounds, market_map_index
+
+    bounds = [request.args.get(key, type=float) for key in ('south', 'west', 'north', 'east')]
+    zoom = request.args.get('zoom', type=int)
+
+    if any(value is None for value in bounds) or zoom is None:
+        return jsonify({'error': 'south, west, north, east, zoom 파라미터가 필요합니다.'}), 400
+    bounds = MapBounds(*bounds)
+    if not (-90 <= bounds.south <= bounds.north <= 90) or not all(-180 <= v <= 180 for v in (bounds.west, bounds.east)):
+        return jsonify({'error': '지도 영역 범위가 올바르지 않습니다.'}), 400
+    if not (0 <= zoom <= 22):
+        return jsonify({'error': 'zoom은 0~22 사이여야 합니다.'}), 400
+
+    try:
+        # 군집은 알림 실행/시장 변경 때만 다시 계산되므로 스냅숏 버전과 요청 영역으로 검증
+        snapshot = market_map_index.snapshot()
+        etag = make_etag(snapshot.version, snapshot.built_at, zoom, *bounds)
+        return conditional_response(etag, lambda: market_map_index.query(bounds, zoom, MARKET_MAP_MAX_MARKERS))
+    except Exception as e:
+        return jsonify({'error': f'지도 시장 조회 실패: {str(e)}'}), 500
+
 @app.route('/api/markets/<int:market_id>', methods=['GET'])
 def get_market_detail(market_id):
     """특정 시장 상세 정보 조회"""
     from models import Market
+    from http_cache import conditional_response, make_etag
 
     try:
         market = Market.query.get(market_id)
         if not market:
             return jsonify({'error': '시장을 찾을 수 없습니다.'}), 404
 
-        return jsonify({
-            'status': 'success',
-            'data': market.to_dict()
-        })
+        return conditional_response(
+            make_etag('market', market.id, market.updated_at),
+            lambda: {
+                'status': 'success',
+                'data': market.to_dict()
+            },
+            last_modified=market.updated_at
+        )
     except Exception as e:
         return jsonify({'error': f'시장 조회 실패: {str(e)}'}), 500
 
@@ -1196,31 +1534,74 @@ def bulk_update_alert_conditions():
 @app.route('/api/watchlist', methods=['GET'])
 def get_user_watchlist():
     """사용자의 관심 시장 목록 조회"""
-    from models import UserMarketInterest
+    from sqlalchemy import case, func
+    from models import UserMarketInterest, Market
     from auth_utils import login_required
+    from http_cache import conditional_response, make_etag
     
     @login_required
     def _get_user_watchlist(current_user):
         try:
-            interests = UserMarketInterest.query.filter_by(
-                user_id=current_user.id,
-                is_active=True
-            ).all()
-            
-            return jsonify({
-                'count': len(interests),
-                'watchlist': [interest.to_dict() for interest in interests]
-            })
+            # 검증자: 활성 관심 수, 관심 항목/시장의 최근 수정 시각 (비활성 항목 포함해 추가·삭제 모두 반영)
+            interest_updated = func.coalesce(UserMarketInterest.updated_at, UserMarketInterest.created_at)
+            active_count, interests_updated, markets_updated = db.session.query(
+                func.count(case((UserMarketInterest.is_active == True, 1))),
+                func.max(interest_updated),
+                func.max(Market.updated_at)
+            ).select_from(UserMarketInterest).outerjoin(
+                Market, Market.id == UserMarketInterest.market_id
+            ).filter(UserMarketInterest.user_id == current_user.id).one()
+
+            def _build():
+                interests = UserMarketInterest.query.filter_by(
+                    user_id=current_user.id,
+                    is_active=True
+                ).all()
+
+                return {
+                    'count': len(interests),
+                    'watchlist': [interest.to_dict() for interest in interests]
+                }
+
+            return conditional_response(
+                make_etag('watchlist', current_user.id, active_count, interests_updated, markets_updated),
+                _build,
+                last_modified=max((t for t in (interests_updated, markets_updated) if t), default=None),
+                cache_control='private, no-cache'
+            )
         except Exception as e:
             return jsonify({'error': f'관심 목록 조회 실패: {str(e)}'}), 500
     
     return _get_user_watchlist()
 
+@app.route('/api/watchlist/dashboard', methods=['GET'])
+def get_watchlist_dashboard():
+    """관심 시장 대시보드 (시장, 현재 날씨, 최신 예보, 최근 알림을 한 번에 조회)"""
+    from auth_utils import login_required
+    from weather_cache import weather_response_cache
+    from weather_lookup import build_watchlist_dashboard
+
+    @login_required
+    def _get_watchlist_dashboard(current_user):
+        try:
+            # 관심 목록 변경, 날씨 수집, 알림 로그 기록 시 무효화되는 사용자별 캐시
+            dashboard, cache_key = weather_response_cache.get_dashboard(current_user.id)
+            if dashboard is None:
+                dashboard = build_watchlist_dashboard(current_user.id)
+                weather_response_cache.set(cache_key, dashboard)
+            return jsonify(dashboard)
+        except Exception as e:
+            return jsonify({'error': f'관심 시장 대시보드 조회 실패: {str(e)}'}), 500
+
+    return _get_watchlist_dashboard()
+
 @app.route('/api/watchlist', methods=['POST'])
 def add_to_watchlist():
     """시장을 관심 목록에 추가"""
     from models import UserMarketInterest, Market
     from auth_utils import login_required
+    from market_topics import sync_user_market_topics
+    from weather_cache import weather_response_cache
     
     @login_required
     def _add_to_watchlist(current_user):
@@ -1244,6 +1625,11 @@ def add_to_watchlist():
             interest = UserMarketInterest.add_interest(current_user.id, market_id)
             db.session.add(interest)
             db.session.commit()
+
+            # 주제 기반 전송 모드: 시장 주제 구독
+            sync_user_market_topics(current_user)
+            db.session.commit()
+            weather_response_cache.invalidate_user(current_user.id)
             
             return jsonify({
                 'message': f'{market.name}이(가) 관심 목록에 추가되었습니다.',
@@ -1261,6 +1647,8 @@ def remove_from_watchlist(market_id):
     """시장을 관심 목록에서 제거"""
     from models import UserMarketInterest
     from auth_utils import login_required
+    from market_topics import sync_user_market_topics
+    from weather_cache import weather_response_cache
     
     @login_required
     def _remove_from_watchlist(current_user):
@@ -1271,6 +1659,11 @@ def remove_from_watchlist(market_id):
                 return jsonify({'error': '관심 목록에 해당 시장이 없습니다.'}), 404
             
             db.session.commit()
+
+            # 주제 기반 전송 모드: 시장 주제 구독 해제
+            sync_user_market_topics(current_user)
+            db.session.commit()
+            weather_response_cache.invalidate_user(current_user.id)
             
             return jsonify({
                 'message': '관심 목록에서 제거되었습니다.',
@@ -1288,6 +1681,8 @@ def toggle_notification_for_interest(interest_id):
     """특정 관심 시장의 알림 설정 토글"""
     from models import UserMarketInterest
     from auth_utils import login_required
+    from market_topics import sync_user_market_topics
+    from weather_cache import weather_response_cache
     
     @login_required
     def _toggle_notification(current_user):
@@ -1303,6 +1698,11 @@ def toggle_notification_for_interest(interest_id):
             # 알림 설정 토글
             interest.notification_enabled = not interest.notification_enabled
             db.session.commit()
+
+            # 주제 기반 전송 모드: 알림 설정에 맞춰 시장 주제 구독/해제
+            sync_user_market_topics(current_user)
+            db.session.commit()
+            weather_response_cache.invalidate_user(current_user.id)
             
             status = "활성화" if interest.notification_enabled else "비활성화"
             return jsonify({
@@ -1336,10 +1736,38 @@ def handle_damage_status():
         db.session.commit()
         return jsonify(damage_status.to_dict()), 201
 
+def _current_weather_response(result):
+    """현재 날씨 응답 (관측 행 ID/저장 시각을 검증자로 조건부 응답)"""
+    from http_cache import conditional_response, make_etag, parse_timestamp
+
+    weather = result['data']
+    return conditional_response(
+        make_etag('current', result['nx'], result['ny'], weather.get('id'),
+                  weather.get('created_at'), result.get('location_name')),
+        lambda: result,
+        last_modified=parse_timestamp(weather.get('created_at'))
+    )
+
+def _forecast_weather_response(result):
+    """예보 응답 (발표 시각, 행 수, 최대 행 ID를 검증자로 조건부 응답)"""
+    from http_cache import conditional_response, make_etag, parse_timestamp
+
+    rows = result['data']
+    saved_at = [t for t in (parse_timestamp(row.get('created_at')) for row in rows) if t]
+    return conditional_response(
+        make_etag('forecast', result['nx'], result['ny'], result['base_date'], result['base_time'],
+                  len(rows), max((row.get('id') or 0 for row in rows), default=0)),
+        lambda: result,
+        last_modified=max(saved_at) if saved_at else None
+    )
+
 @app.route('/api/weather/current', methods=['POST'])
 def get_current_weather():
-    """현재 날씨 정보 조회 (시장의 최신 데이터 가져오기)"""
-    from models import Weather, Market
+    """현재 날씨 정보 조회 (시장의 최신 데이터 가져오기, 격자별 응답 캐시)"""
+    from models import Market
+    from weather_cache import weather_response_cache
+    from weather_latest import get_latest_current
+    from weather_lookup import build_current_result
 
     data = request.get_json(silent=True, force=True) or {}
 
@@ -1352,27 +1780,22 @@ def get_current_weather():
         nx = int(data['nx'])
         ny = int(data['ny'])
 
+        # 수집 시 무효화되는 격자별 캐시 확인
+        cached, cache_key = weather_response_cache.get('current', nx, ny)
+        if cached is not None:
+            return _current_weather_response(cached)
+
         # 해당 격자좌표를 가진 시장 찾기
         market = Market.query.filter_by(nx=nx, ny=ny, is_active=True).first()
 
         if market:
-            # 시장이 있으면 해당 시장의 최신 날씨 데이터 조회
-            weather = Weather.query.filter_by(
-                nx=nx,
-                ny=ny,
-                api_type='current'
-            ).order_by(Weather.created_at.desc()).first()
+            # 시장이 있으면 해당 시장의 최신 날씨 데이터 조회 (최신 포인터 기본키 조회)
+            weather = get_latest_current(nx, ny)
 
             if weather:
-                result = {
-                    'status': 'success',
-                    'message': f'{market.name}의 최신 날씨 데이터를 가져왔습니다.',
-                    'data': weather.to_dict(),
-                    'location_name': market.name,
-                    'nx': market.nx,
-                    'ny': market.ny
-                }
-                return jsonify(result)
+                result = build_current_result(market, weather)
+                weather_response_cache.set(cache_key, result)
+                return _current_weather_response(result)
             else:
                 logger.warning(f"현재 날씨 조회 실패: {market.name}의 날씨 데이터 없음")
                 return jsonify({
@@ -1395,8 +1818,10 @@ def get_current_weather():
 
 @app.route('/api/weather/forecast', methods=['POST'])
 def get_forecast_weather():
-    """날씨 예보 정보 조회 (데이터베이스에서 최신 데이터 가져오기)"""
-    from models import Weather
+    """날씨 예보 정보 조회 (데이터베이스에서 최신 데이터 가져오기, 격자별 응답 캐시)"""
+    from weather_cache import weather_response_cache
+    from weather_latest import latest_forecast_query
+    from weather_lookup import build_forecast_result
 
     data = request.get_json(silent=True, force=True) or {}
 
@@ -1408,18 +1833,15 @@ def get_forecast_weather():
         nx = int(data['nx'])
         ny = int(data['ny'])
 
-        # 데이터베이스에서 해당 격자 좌표의 최신 예보 데이터 조회
-        # 예보는 여러 시간대의 데이터가 있으므로 최신 base_date/base_time 기준으로 모두 가져옴
-        forecasts = Weather.query.filter_by(
-            nx=nx,
-            ny=ny,
-            api_type='forecast'
-        ).order_by(
-            Weather.base_date.desc(),
-            Weather.base_time.desc(),
-            Weather.fcst_date.asc(),
-            Weather.fcst_time.asc()
-        ).limit(100).all()
+        # 수집 시 무효화되는 격자별 캐시 확인
+        cached, cache_key = weather_response_cache.get('forecast', nx, ny)
+        if cached is not None:
+            return _forecast_weather_response(cached)
+
+        # 해당 격자 좌표의 최신 발표(base_date/base_time) 예보를 모두 가져옴
+        # (최신 포인터로 발표를 찾고 해당 발표 행만 조회, 이력 정렬 없음)
+        query = latest_forecast_query(nx, ny)
+        forecasts = query.limit(100).all() if query is not None else []
 
         if not forecasts:
             return jsonify({
@@ -1427,28 +1849,10 @@ def get_forecast_weather():
                 'message': f'해당 위치({nx}, {ny})의 예보 데이터가 없습니다. 스케줄러가 아직 데이터를 수집하지 않았거나 해당 지역이 활성 시장 목록에 없습니다.'
             }), 404
 
-        # 가장 최신 base_date/base_time을 가진 예보들만 필터링
-        latest_base_date = forecasts[0].base_date
-        latest_base_time = forecasts[0].base_time
-
-        latest_forecasts = [
-            f for f in forecasts
-            if f.base_date == latest_base_date and f.base_time == latest_base_time
-        ]
-
         # 성공 응답 구성
-        result = {
-            'status': 'success',
-            'message': '데이터베이스에서 최신 예보 데이터를 가져왔습니다.',
-            'data': [weather.to_dict() for weather in latest_forecasts],
-            'location_name': forecasts[0].location_name if forecasts else '',
-            'nx': nx,
-            'ny': ny,
-            'base_date': latest_base_date,
-            'base_time': latest_base_time
-        }
-
-        return jsonify(result)
+        result = build_forecast_result(nx, ny, forecasts)
+        weather_response_cache.set(cache_key, result)
+        return _forecast_weather_response(result)
 
     except ValueError:
         return jsonify({'error': 'nx와 ny는 정수여야 합니다.'}), 400
@@ -1456,6 +1860,50 @@ def get_forecast_weather():
         logger.error(f"예보 날씨 조회 오류: {e}")
         return jsonify({'error': f'서버 오류: {str(e)}'}), 500
 
+@app.route('/api/weather/batch', methods=['POST'])
+def get_batch_weather():
+    """
+    여러 시장/격자의 현재 날씨와 최신 예보 일괄 조회
+
+    요청: {"market_ids": [1, 2], "grids": [{"nx": 60, "ny": 127}], "stream": false}
+    격자 단위로 중복 제거하며, 격자 수가 많으면(또는 stream=true) 격자별 NDJSON으로 스트리밍합니다.
+    """
+    import json
+    from flask import Response, stream_with_context
+    from weather_lookup import (BatchRequestError, batch_should_stream, iter_batch_weather,
+                                parse_batch_request, resolve_batch_grids)
+
+    data = request.get_json(silent=True, force=True) or {}
+
+    try:
+        market_ids, grids = parse_batch_request(data)
+    except BatchRequestError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        resolved, missing_market_ids = resolve_batch_grids(market_ids, grids)
+
+        if batch_should_stream(len(resolved), data.get('stream')):
+            def _generate():
+                for item in iter_batch_weather(resolved):
+                    yield json.dumps(item, ensure_ascii=False) + '\n'
+                if missing_market_ids:
+                    yield json.dumps({'missing_market_ids': missing_market_ids}, ensure_ascii=False) + '\n'
+
+            return Response(stream_with_context(_generate()), mimetype='application/x-ndjson')
+
+        results = list(iter_batch_weather(resolved))
+        return jsonify({
+            'status': 'success',
+            'count': len(results),
+            'results': results,
+            'missing_market_ids': missing_market_ids
+        })
+
+    except Exception as e:
+        logger.error(f"일괄 날씨 조회 오류: {e}")
+        return jsonify({'error': f'서버 오류: {str(e)}'}), 500
+
 @app.route('/api/weather', methods=['GET'])
 def get_weather_history():
     """저장된 날씨 데이터 조회"""
@@ -1646,8 +2094,9 @@ def manual_weather_alert_check():
 def test_weather_alert_to_user():
     """관리자용 테스트: 특정 사용자에게 날씨 알림 전송"""
     from auth_utils import admin_required
-    from fcm_integration.fcm_utils import fcm_service
+    from notification_outbox import enqueue_notification
     from models import User, Market
+    from user_devices import user_tokens
     import json
 
     @admin_required
@@ -1789,13 +2238,15 @@ def test_weather_alert_to_user():
                 'sent_by': current_user.email
             }
 
-            # FCM 알림 전송
-            success = fcm_service.send_notification(
-                token=user.fcm_token,
+            # FCM 알림 전송 (아웃박스 적재)
+            entry, _ = enqueue_notification(
+                tokens=user_tokens(user),
                 title=title,
                 body=body,
-                data=notification_data
+                data=notification_data,
+                idempotency_key=data.get('idempotency_key') or request.headers.get('Idempotency-Key')
             )
+            success = entry is not None
 
             logger.info(f"관리자 {current_user.email}가 사용자 {user.email}에게 {alert_type} 테스트 알림 전송")
 
@@ -1812,7 +2263,7 @@ def test_weather_alert_to_user():
                         'alert_type': alert_type,
                         'title': title,
                         'is_dnd_ignored': is_dnd and ignore_dnd,
-                        'fcm_result': {'success': success}
+                        'fcm_result': {'success': success, 'outbox_id': entry.id, 'status': entry.status}
                     }
                 })
             else:
@@ -1833,29 +2284,24 @@ def test_weather_alert_to_user():
 
 @app.route('/api/admin/weather-alerts/test-summary', methods=['POST'])
 def test_weather_summary_alert():
-    """관리자용 테스트: 모든 관심 시장의 날씨 요약 알림 전송"""
+    """관리자용 테스트: 모든 관심 시장의 날씨 요약 알림 전송 (백그라운드 작업)"""
     from auth_utils import admin_required
     from weather_alerts import send_test_weather_summary_to_all_users
+    from background_jobs import job_registry
 
     @admin_required
     def _test_weather_summary_alert(current_user):
         try:
             logger.info(f"관리자 {current_user.email}가 날씨 요약 테스트 알림을 요청했습니다.")
 
-            result = send_test_weather_summary_to_all_users()
+            job_id = job_registry.submit('weather_summary_test', send_test_weather_summary_to_all_users)
 
-            if result.get('success'):
-                return jsonify({
-                    'status': 'success',
-                    'message': '날씨 요약 알림 전송 완료',
-                    'result': result
-                })
-            else:
-                return jsonify({
-                    'status': 'error',
-                    'message': '날씨 요약 알림 전송 실패',
-                    'error': result.get('error')
-                }), 500
+            return jsonify({
+                'status': 'accepted',
+                'message': '날씨 요약 알림 전송 작업이 시작되었습니다.',
+                'job_id': job_id,
+                'status_url': f'/api/admin/jobs/{job_id}'
+            }), 202
 
         except Exception as e:
             logger.error(f"날씨 요약 알림 테스트 실패: {e}")
@@ -1863,11 +2309,72 @@ def test_weather_summary_alert():
 
     return _test_weather_summary_alert()
 
+
+@app.route('/api/admin/jobs/<job_id>', methods=['GET'])
+def get_background_job(job_id):
+    """관리자용: 백그라운드 작업 상태 및 결과 조회"""
+    from auth_utils import admin_required
+    from background_jobs import job_registry
+
+    @admin_required
+    def _get_background_job(current_user):
+        job = job_registry.get(job_id)
+        if not job:
+            return jsonify({'error': '작업을 찾을 수 없습니다.'}), 404
+        return jsonify(job)
+
+    return _get_background_job()
+
+@app.route('/api/admin/weather-alerts/dry-run', methods=['POST'])
+def weather_alert_dry_run():
+    """관리자용: 실제 전송 없이 날씨 알림 파이프라인 실행 (성능/전송 규모 측정, 백그라운드 작업)"""
+    from auth_utils import admin_required
+    from alert_replay import run_alert_replay
+    from background_jobs import job_registry
+
+    @admin_required
+    def _weather_alert_dry_run(current_user):
+        data = request.get_json(silent=True, force=True) or {}
+
+        try:
+            hours = int(data.get('hours', 24))
+            as_of = datetime.fromisoformat(data['as_of']) if data.get('as_of') else None
+        except (TypeError, ValueError):
+            return jsonify({'error': 'hours는 정수, as_of는 ISO 형식(YYYY-MM-DDTHH:MM)이어야 합니다.'}), 400
+
+        def _run():
+            report = run_alert_replay(hours=hours, as_of=as_of)
+            if not report.get('success'):
+                raise RuntimeError(report.get('error') or '날씨 알림 드라이런 실패')
+            return report
+
+        try:
+            logger.info(f"관리자 {current_user.email}가 날씨 알림 드라이런을 요청했습니다.")
+
+            job_id = job_registry.submit('weather_alert_dry_run', _run)
+
+            return jsonify({
+                'status': 'accepted',
+                'message': '날씨 알림 드라이런 작업이 시작되었습니다. (실제 전송 없음)',
+                'job_id': job_id,
+                'status_url': f'/api/admin/jobs/{job_id}'
+            }), 202
+
+        except Exception as e:
+            logger.error(f"날씨 알림 드라이런 실패: {e}")
+            return jsonify({'error': f'날씨 알림 드라이런 실패: {str(e)}'}), 500
+
+    return _weather_alert_dry_run()
+
 # 알림 이력 관련 API
 @app.route('/api/alarm-logs', methods=['GET'])
 def get_alarm_logs():
-    """알림 이력 목록 조회 (페이지네이션 및 필터링 지원)"""
+    """알림 이력 목록 조회 (페이지/커서 페이지네이션 및 필터링 지원)"""
+    from models import MarketAlarmLog, UserMarketInterest
     from auth_utils import login_required
+    from listing_queries import ALARM_LOG_LIST
+    from pagination import (ALARM_LOG_ORDER, CursorError, cursor_pagination_info, cursor_requested,
+                            keyset_paginate, requested_total_mode)
 
     @login_required
     def _get_alarm_logs(current_user):
@@ -1882,24 +2389,23 @@ def get_alarm_logs():
             start_date = request.args.get('start_date', type=str)
             end_date = request.args.get('end_date', type=str)
 
-            # 기본 쿼리
-            query = MarketAlarmLog.query
+            # 기본 쿼리 (필요한 컬럼만, 시장 이름은 조인으로 함께 조회)
+            query = ALARM_LOG_LIST.query()
 
-            # 일반 사용자는 자신의 관심시장 알림만 조회 가능
+            # 일반 사용자는 자신의 관심시장 알림만 조회 가능 (관심 시장은 서브쿼리로)
             if not current_user.is_admin():
-                user_market_ids = [interest.market_id for interest in
-                                  UserMarketInterest.query.filter_by(
-                                      user_id=current_user.id,
-                                      is_active=True
-                                  ).all()]
-                query = query.filter(MarketAlarmLog.market_id.in_(user_market_ids))
+                user_market_ids = db.session.query(UserMarketInterest.market_id).filter_by(
+                    user_id=current_user.id,
+                    is_active=True
+                )
+                query = query.filter(MarketAlarmLog.market_id.in_(user_market_ids.scalar_subquery()))
 
             # 필터 적용
             if market_id:
-                query = query.filter_by(market_id=market_id)
+                query = query.filter(MarketAlarmLog.market_id == market_id)
 
             if alert_type:
-                query = query.filter_by(alert_type=alert_type)
+                query = query.filter(MarketAlarmLog.alert_type == alert_type)
 
             if start_date:
                 from datetime import datetime
@@ -1912,36 +2418,17 @@ def get_alarm_logs():
                 query = query.filter(MarketAlarmLog.created_at <= end_dt)
 
             # 정렬 및 페이지네이션
-            query = query.order_by(MarketAlarmLog.created_at.desc())
-            pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-
-            # 결과 직렬화
-            logs = []
-            for log in pagination.items:
-                log_data = {
-                    'id': log.id,
-                    'market_id': log.market_id,
-                    'market_name': log.market.name if log.market else None,
-                    'alert_type': log.alert_type,
-                    'alert_title': log.alert_title,
-                    'alert_body': log.alert_body,
-                    'total_users': log.total_users,
-                    'success_count': log.success_count,
-                    'failure_count': log.failure_count,
-                    'temperature': log.temperature,
-                    'rain_probability': log.rain_probability,
-                    'wind_speed': log.wind_speed,
-                    'precipitation_type': log.precipitation_type,
-                    'forecast_time': log.forecast_time,
-                    'checked_hours': log.checked_hours,
-                    'created_at': log.created_at.isoformat() if log.created_at else None
-                }
-                logs.append(log_data)
-
-            return jsonify({
-                'status': 'success',
-                'data': logs,
-                'pagination': {
+            if cursor_requested():
+                # 커서 방식: (created_at, id) 다음부터 인덱스로 조회 (COUNT/OFFSET 없음)
+                result = keyset_paginate(query, ALARM_LOG_ORDER, per_page, request.args.get('cursor'),
+                                         total_mode=requested_total_mode())
+                items = result.items
+                pagination_info = cursor_pagination_info(result, per_page)
+            else:
+                query = query.order_by(MarketAlarmLog.created_at.desc(), MarketAlarmLog.id.desc())
+                pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+                items = pagination.items
+                pagination_info = {
                     'page': pagination.page,
                     'per_page': pagination.per_page,
                     'total': pagination.total,
@@ -1949,8 +2436,18 @@ def get_alarm_logs():
                     'has_next': pagination.has_next,
                     'has_prev': pagination.has_prev
                 }
+
+            # 결과 직렬화
+            logs = ALARM_LOG_LIST.serialize_all(items)
+
+            return jsonify({
+                'status': 'success',
+                'data': logs,
+                'pagination': pagination_info
             })
 
+        except CursorError as e:
+            return jsonify({'error': str(e)}), 400
         except Exception as e:
             logger.error(f"알림 이력 조회 실패: {e}")
             return jsonify({'error': f'알림 이력 조회 실패: {str(e)}'}), 500
@@ -1960,12 +2457,15 @@ def get_alarm_logs():
 @app.route('/api/alarm-logs/<int:log_id>', methods=['GET'])
 def get_alarm_log_detail(log_id):
     """특정 알림 이력 상세 조회"""
+    from models import MarketAlarmLog, UserMarketInterest
     from auth_utils import login_required
+    from listing_queries import ALARM_LOG_DETAIL
 
     @login_required
     def _get_alarm_log_detail(current_user):
         try:
-            log = MarketAlarmLog.query.get(log_id)
+            # 시장 이름까지 한 번에 조회
+            log = ALARM_LOG_DETAIL.query().filter(MarketAlarmLog.id == log_id).first()
 
             if not log:
                 return jsonify({'error': '알림 이력을 찾을 수 없습니다.'}), 404
@@ -1981,26 +2481,8 @@ def get_alarm_log_detail(log_id):
                 if not is_interested:
                     return jsonify({'error': '접근 권한이 없습니다.'}), 403
 
-            # 상세 정보 반환
-            log_data = {
-                'id': log.id,
-                'market_id': log.market_id,
-                'market_name': log.market.name if log.market else None,
-                'alert_type': log.alert_type,
-                'alert_title': log.alert_title,
-                'alert_body': log.alert_body,
-                'total_users': log.total_users,
-                'success_count': log.success_count,
-                'failure_count': log.failure_count,
-                'weather_data': log.weather_data,  # JSON 전체 데이터
-                'temperature': log.temperature,
-                'rain_probability': log.rain_probability,
-                'wind_speed': log.wind_speed,
-                'precipitation_type': log.precipitation_type,
-                'forecast_time': log.forecast_time,
-                'checked_hours': log.checked_hours,
-                'created_at': log.created_at.isoformat() if log.created_at else None
-            }
+            # 상세 정보 반환 (weather_data 전체 포함)
+            log_data = ALARM_LOG_DETAIL.serialize(log)
 
             return jsonify({
                 'status': 'success',
@@ -2016,7 +2498,9 @@ def get_alarm_log_detail(log_id):
 @app.route('/api/markets/<int:market_id>/alarm-logs', methods=['GET'])
 def get_market_alarm_logs(market_id):
     """특정 시장의 알림 이력 조회"""
+    from models import Market, MarketAlarmLog, UserMarketInterest
     from auth_utils import login_required
+    from listing_queries import MARKET_ALARM_LOG_LIST
 
     @login_required
     def _get_market_alarm_logs(current_user):
@@ -2043,34 +2527,16 @@ def get_market_alarm_logs(market_id):
             alert_type = request.args.get('alert_type', type=str)
 
             # 쿼리
-            query = MarketAlarmLog.query.filter_by(market_id=market_id)
+            query = MARKET_ALARM_LOG_LIST.query().filter(MarketAlarmLog.market_id == market_id)
 
             if alert_type:
-                query = query.filter_by(alert_type=alert_type)
+                query = query.filter(MarketAlarmLog.alert_type == alert_type)
 
-            query = query.order_by(MarketAlarmLog.created_at.desc())
+            query = query.order_by(MarketAlarmLog.created_at.desc(), MarketAlarmLog.id.desc())
             pagination = query.paginate(page=page, per_page=per_page, error_out=False)
 
             # 결과 직렬화
-            logs = []
-            for log in pagination.items:
-                log_data = {
-                    'id': log.id,
-                    'alert_type': log.alert_type,
-                    'alert_title': log.alert_title,
-                    'alert_body': log.alert_body,
-                    'total_users': log.total_users,
-                    'success_count': log.success_count,
-                    'failure_count': log.failure_count,
-                    'temperature': log.temperature,
-                    'rain_probability': log.rain_probability,
-                    'wind_speed': log.wind_speed,
-                    'precipitation_type': log.precipitation_type,
-                    'forecast_time': log.forecast_time,
-                    'checked_hours': log.checked_hours,
-                    'created_at': log.created_at.isoformat() if log.created_at else None
-                }
-                logs.append(log_data)
+            logs = MARKET_ALARM_LOG_LIST.serialize_all(pagination.items)
 
             return jsonify({
                 'status': 'success',
@@ -2157,6 +2623,10 @@ def account_deletion_page():
 
             # 민감 정보 초기화
             user.password_hash = 'deleted'
+            from market_topics import unsubscribe_token_from_market_topics
+            from user_devices import remove_user_devices
+            unsubscribe_token_from_market_topics(user)
+            remove_user_devices(user)
             user.fcm_token = None
             user.fcm_enabled = False
 
@@ -2263,6 +2733,45 @@ def init_scheduler():
         import traceback
         logger.error(f"Traceback: {traceback.format_exc()}")
 
+def init_outbox_dispatcher():
+    """알림 아웃박스 전송 워커 시작"""
+    try:
+        from notification_outbox import outbox_dispatcher
+        outbox_dispatcher.start(app)
+    except Exception as e:
+        logger.error(f"Failed to start notification outbox dispatcher: {e}")
+
+def init_weather_latest():
+    """weather_latest 포인터 테이블이 비어 있으면 기존 날씨 이력에서 채움"""
+    try:
+        from weather_latest import rebuild_weather_latest
+        rebuild_weather_latest()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Failed to rebuild weather_latest: {e}")
+
+def init_market_indexes():
+    """시장 검색/위치/지도 인덱스를 미리 구성 (첫 조회 지연 방지)"""
+    try:
+        from market_search import market_search_index
+        from market_geo import market_geo_index
+        from market_map import market_map_index
+        market_search_index.rebuild()
+        market_geo_index.rebuild()
+        market_map_index.rebuild()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Failed to build market indexes: {e}")
+
+def init_user_devices():
+    """User.fcm_token만 있고 user_devices에 없는 기존 토큰을 기기 테이블로 이전"""
+    try:
+        from user_devices import backfill_user_devices
+        backfill_user_devices()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Failed to backfill user devices: {e}")
+
 # 스케줄러 자동 시작 플래그
 _scheduler_initialized = False
 
@@ -2271,7 +2780,11 @@ def ensure_scheduler_running():
     global _scheduler_initialized
     if not _scheduler_initialized:
         with app.app_context():
+            init_user_devices()
+            init_weather_latest()
+            init_market_indexes()
             init_scheduler()
+        init_outbox_dispatcher()
         _scheduler_initialized = True
 
 # Flask 앱 시작 시 스케줄러 자동 시작
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+프로세스 내 백그라운드 작업 관리
+
+관리자 API 등에서 오래 걸리는 작업을 요청 스레드 밖에서 실행하고,
+작업 ID로 진행 상태와 결과를 조회할 수 있게 합니다.
+uWSGI를 단일 프로세스로 실행하므로(uwsgi.ini) 메모리 내 레지스트리로 충분합니다.
+"""
+
+import os
+import uuid
+import logging
+import threading
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundJobRegistry:
+    """작업 제출/상태 조회용 레지스트리 (스레드 안전)"""
+
+    def __init__(self, max_workers: int = 2, max_history: int = 100):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='background-job')
+        self._jobs: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_history = max_history
+
+    def submit(self, name: str, func: Callable, *args, **kwargs) -> str:
+        """
+        작업을 백그라운드로 실행하고 즉시 작업 ID 반환
+
+        Args:
+            name: 작업 종류 이름
+            func: 실행할 함수 (반환값이 작업 결과로 저장됨)
+
+        Returns:
+            str: 작업 ID
+        """
+        job_id = uuid.uuid4().hex
+        job = {
+            'job_id': job_id,
+            'name': name,
+            'status': 'queued',
+            'created_at': datetime.utcnow().isoformat(),
+            'started_at': None,
+            'finished_at': None,
+            'result': None,
+            'error': None
+        }
+
+        with self._lock:
+            self._jobs[job_id] = job
+            # 완료된 오래된 작업부터 정리
+            while len(self._jobs) > self.max_history:
+                oldest_id, oldest = next(iter(self._jobs.items()))
+                if oldest['status'] in ('queued', 'running'):
+                    break
+                self._jobs.pop(oldest_id)
+
+        self._executor.submit(self._run, job_id, func, args, kwargs)
+        logger.info(f"백그라운드 작업 제출: {name} ({job_id})")
+        return job_id
+
+    def _run(self, job_id: str, func: Callable, args, kwargs):
+        self._update(job_id, status='running', started_at=datetime.utcnow().isoformat())
+        try:
+            result = func(*args, **kwargs)
+            self._update(job_id, status='completed', result=result,
+                         finished_at=datetime.utcnow().isoformat())
+        except Exception as e:
+            logger.error(f"백그라운드 작업 {job_id} 실패: {e}\n{traceback.format_exc()}")
+            self._update(job_id, status='failed', error=str(e),
+                         finished_at=datetime.utcnow().isoformat())
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """작업 상태 조회 (없으면 None)"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+
+job_registry = BackgroundJobRegistry(
+    max_workers=int(os.environ.get('BACKGROUND_JOB_WORKERS', '2'))
+)
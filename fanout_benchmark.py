@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+알림 fan-out 부하 벤치마크
+
+가상의 시장/사용자/관심 시장/예보 데이터를 별도 DB에 채운 뒤, 실제 알림 파이프라인
+(WeatherAlertSystem.check_all_markets_with_all_conditions)을 FCMService + 테스트용
+전송 백엔드(fake 또는 로컬 HTTP 스탠드인)로 실행해 처리량과 단계별 소요 시간을 보고합니다.
+실제 Firebase로는 아무 것도 전송하지 않습니다.
+
+사용법:
+    python fanout_benchmark.py                                   # 10만 건, 프로세스 내 fake 백엔드
+    python fanout_benchmark.py --backend http --latency-ms 30    # 로컬 HTTP 스탠드인 서버 자동 실행
+    python fanout_benchmark.py --backend http --standin-url http://127.0.0.1:8765   # 이미 실행 중인 서버 사용
+
+주의: --database-url 의 알림 로그/평가 메모가 변경됩니다. 운영 DB를 지정하지 마세요.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+BENCH_MARKET_PREFIX = 'BENCH-'
+BENCH_EMAIL_DOMAIN = 'benchmark.local'
+
+
+def _benchmark_data_matches(users: int, markets: int, markets_per_user: int) -> bool:
+    """이미 있는 벤치마크 데이터가 요청한 구성(시장/사용자 범위, 관심 시장 수)과 같은지 확인"""
+    from sqlalchemy import func
+    from models import Market, User, UserMarketInterest
+
+    market_count, first_market, last_market = Market.query.with_entities(
+        func.count(Market.id), func.min(Market.name), func.max(Market.name)
+    ).filter(Market.name.like(f'{BENCH_MARKET_PREFIX}%')).one()
+    if market_count != markets or (markets and (first_market, last_market) != (
+            f'{BENCH_MARKET_PREFIX}{0:05d}', f'{BENCH_MARKET_PREFIX}{markets - 1:05d}')):
+        return False
+
+    bench_users = User.query.filter(User.email.like(f'%@{BENCH_EMAIL_DOMAIN}'))
+    if bench_users.count() != users:
+        return False
+
+    interests = UserMarketInterest.query.filter(
+        UserMarketInterest.user_id.in_(bench_users.with_entities(User.id))
+    ).count()
+    return interests == users * markets_per_user
+
+
+def clear_benchmark_data(db) -> None:
+    """벤치마크 시장/사용자와 딸린 관심 시장·기기·알림 로그·평가 메모·예보 삭제"""
+    from sqlalchemy import and_, exists
+    from models import (Market, MarketAlarmLog, MarketEvaluationMemo, User, UserDevice, UserMarketInterest,
+                        Weather)
+
+    market_ids = db.session.query(Market.id).filter(Market.name.like(f'{BENCH_MARKET_PREFIX}%'))
+    user_ids = db.session.query(User.id).filter(User.email.like(f'%@{BENCH_EMAIL_DOMAIN}'))
+
+    Weather.query.filter(exists().where(and_(
+        Market.name.like(f'{BENCH_MARKET_PREFIX}%'), Market.nx == Weather.nx, Market.ny == Weather.ny
+    ))).delete(synchronize_session=False)
+    UserMarketInterest.query.filter(
+        (UserMarketInterest.user_id.in_(user_ids)) | (UserMarketInterest.market_id.in_(market_ids))
+    ).delete(synchronize_session=False)
+    UserDevice.query.filter(UserDevice.user_id.in_(user_ids)).delete(synchronize_session=False)
+    MarketAlarmLog.query.filter(MarketAlarmLog.market_id.in_(market_ids)).delete(synchronize_session=False)
+    MarketEvaluationMemo.query.filter(MarketEvaluationMemo.market_id.in_(market_ids)).delete(synchronize_session=False)
+    User.query.filter(User.email.like(f'%@{BENCH_EMAIL_DOMAIN}')).delete(synchronize_session=False)
+    Market.query.filter(Market.name.like(f'{BENCH_MARKET_PREFIX}%')).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def seed_benchmark_data(db, users: int, markets: int, markets_per_user: int) -> None:
+    """
+    벤치마크용 시장/사용자/관심 시장/예보를 일괄 생성
+
+    같은 구성의 데이터가 이미 있으면 재사용하고, 구성이 다르면(이전 실행과 인자가 다르거나
+    중간에 실패한 경우) 벤치마크 데이터를 모두 지우고 다시 만듭니다.
+    """
+    from sqlalchemy import insert
+    from models import Market, User, UserMarketInterest, Weather
+    from weather_latest import refresh_weather_latest
+
+    if markets < 1 or users < 0 or not 0 < markets_per_user <= markets:
+        raise ValueError('시장 수는 1 이상, 사용자당 관심 시장 수는 1 이상 시장 수 이하여야 합니다.')
+
+    if _benchmark_data_matches(users, markets, markets_per_user):
+        logger.info("기존 벤치마크 데이터 재사용")
+        return
+
+    clear_benchmark_data(db)
+
+    started = time.perf_counter()
+    now = datetime.utcnow()
+
+    # 시장마다 서로 다른 격자 (평가/예보 조회 비용이 시장 수에 비례하도록)
+    db.session.execute(insert(Market), [
+        {
+            'name': f'{BENCH_MARKET_PREFIX}{i:05d}',
+            'location': '벤치마크',
+            'nx': 1 + i % 149,
+            'ny': 1 + (i // 149) % 253,
+            'is_active': True,
+            'created_at': now
+        }
+        for i in range(markets)
+    ])
+    db.session.commit()
+
+    market_ids = [m.id for m in Market.query.filter(Market.name.like(f'{BENCH_MARKET_PREFIX}%')).order_by(Market.id)]
+
+    chunk = 5000
+    for start in range(0, users, chunk):
+        stop = min(users, start + chunk)
+        db.session.execute(insert(User), [
+            {
+                'name': f'bench{i}',
+                'email': f'bench{i}@{BENCH_EMAIL_DOMAIN}',
+                'password_hash': 'benchmark',
+                'is_active': True,
+                'fcm_enabled': True,
+                'fcm_token': f'bench-token-{i:07d}',
+                'do_not_disturb': {'enabled': False},
+                'created_at': now
+            }
+            for i in range(start, stop)
+        ])
+        db.session.commit()
+
+        user_ids = [u.id for u in User.query.filter(
+            User.email.in_([f'bench{i}@{BENCH_EMAIL_DOMAIN}' for i in range(start, stop)])
+        )]
+        db.session.execute(insert(UserMarketInterest), [
+            {
+                'user_id': user_id,
+                'market_id': market_ids[(offset + k * 7) % len(market_ids)],
+                'is_active': True,
+                'notification_enabled': True,
+                'created_at': now
+            }
+            for offset, user_id in enumerate(user_ids, start=start)
+            for k in range(markets_per_user)
+        ])
+        db.session.commit()
+
+    # 모든 시장에 강수 예보 (알림 조건 충족)
+    local_now = datetime.now()
+    base_date = local_now.strftime('%Y%m%d')
+    rows = []
+    for market in Market.query.filter(Market.name.like(f'{BENCH_MARKET_PREFIX}%')):
+        for hour in range(1, 7):
+            forecast_time = local_now + timedelta(hours=hour)
+            rows.append({
+                'base_date': base_date, 'base_time': local_now.strftime('%H00'),
+                'fcst_date': forecast_time.strftime('%Y%m%d'), 'fcst_time': forecast_time.strftime('%H00'),
+                'nx': market.nx, 'ny': market.ny, 'api_type': 'forecast',
+                'pop': 80.0, 'pty': '1', 'temp': 18.0, 'wind_speed': 3.0, 'created_at': now
+            })
+    db.session.execute(insert(Weather), rows)
+    db.session.commit()
+    # 수집 경로를 거치지 않았으므로 격자별 최신 발표 포인터를 다시 계산
+    refresh_weather_latest({(row['nx'], row['ny']) for row in rows})
+
+    logger.info(f"벤치마크 데이터 생성: 시장 {markets}개, 사용자 {users}명 ({time.perf_counter() - started:.1f}s)")
+
+
+def reset_run_state(db) -> None:
+    """이전 실행의 알림 로그/평가 메모 삭제 (중복 알림 방지 로직이 다음 실행을 막지 않도록)"""
+    from models import Market, MarketAlarmLog, MarketEvaluationMemo, User
+
+    market_ids = db.session.query(Market.id).filter(Market.name.like(f'{BENCH_MARKET_PREFIX}%'))
+    MarketAlarmLog.query.filter(MarketAlarmLog.market_id.in_(market_ids)).delete(synchronize_session=False)
+    MarketEvaluationMemo.query.filter(MarketEvaluationMemo.market_id.in_(market_ids)).delete(synchronize_session=False)
+
+    # 이전 실행에서 무효 토큰으로 정리된 벤치마크 사용자 토큰 복구
+    for user in User.query.filter(User.email.like(f'%@{BENCH_EMAIL_DOMAIN}'), User.fcm_token.is_(None)):
+        user.fcm_token = f"bench-token-{int(user.name[len('bench'):]):07d}"
+    db.session.commit()
+
+
+def run_benchmark(args) -> dict:
+    from fcm_integration.delivery_backends import FakeBackend, HttpStandInBackend
+    from fcm_integration.fcm_utils import FCMService
+    from fcm_integration.rate_governor import RateGovernor
+
+    standin = None
+    model_options = dict(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                         error_rate=args.error_rate, unregistered_rate=args.unregistered_rate)
+    if args.backend == 'http':
+        url = args.standin_url
+        if not url:
+            from fcm_integration.fcm_standin import start_standin_server
+            standin = start_standin_server(port=0, quota_per_second=args.quota_per_second, **model_options)
+            url = f"http://127.0.0.1:{standin.server_address[1]}"
+        backend = HttpStandInBackend(url)
+    else:
+        backend = FakeBackend(seed=42, **model_options)
+
+    from app import app, db
+    from weather_alerts import WeatherAlertSystem
+
+    with app.app_context():
+        db.create_all()
+        seed_benchmark_data(db, args.users, args.markets, args.markets_per_user)
+        reset_run_state(db)
+
+    governor = RateGovernor(rate_per_second=args.rate_limit)
+    sender = FCMService(backend=backend, governor=governor)
+    sender.send_workers = args.send_workers
+
+    alert_system = WeatherAlertSystem(sender=sender)
+    alert_system.api_fallback_enabled = False
+    alert_system.incremental_enabled = False
+    alert_system.delivery_mode = 'token'
+    alert_system.dispatch_workers = args.dispatch_workers
+    alert_system.dispatch_max_in_flight = args.dispatch_workers * 4
+
+    started = time.perf_counter()
+    result = alert_system.check_all_markets_with_all_conditions(hours=24)
+    elapsed = time.perf_counter() - started
+
+    backend_stats = backend.stats()
+    delivered = sum(backend_stats.values())
+    report = {
+        'success': result.get('success', False),
+        'error': result.get('error'),
+        'backend': backend.name,
+        'latency_ms': args.latency_ms,
+        'users': args.users,
+        'markets': args.markets,
+        'dispatch_workers': args.dispatch_workers,
+        'elapsed_seconds': round(elapsed, 3),
+        'notifications_attempted': delivered,
+        'notifications_per_second': round(delivered / elapsed, 1) if elapsed > 0 else None,
+        'backend_outcomes': backend_stats,
+        'rate_governor': governor.metrics(),
+        'alerts_sent': result.get('alerts_sent'),
+        'stages': result.get('metrics', {})
+    }
+
+    if standin is not None:
+        standin.shutdown()
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='알림 fan-out 부하 벤치마크')
+    parser.add_argument('--database-url', default='sqlite:////tmp/fanout_benchmark.db',
+                        help='벤치마크 전용 DB (운영 DB 지정 금지)')
+    parser.add_argument('--users', type=int, default=100000, help='사용자 수 (= 개별 알림 수)')
+    parser.add_argument('--markets', type=int, default=500, help='시장 수')
+    parser.add_argument('--markets-per-user', type=int, default=1,
+                        help='사용자별 관심 시장 수 (3 이상이면 요약 알림으로 묶임)')
+    parser.add_argument('--backend', choices=['fake', 'http'], default='fake')
+    parser.add_argument('--standin-url', help='실행 중인 스탠드인 서버 주소 (없으면 자동 실행)')
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--jitter-ms', type=float, default=5)
+    parser.add_argument('--error-rate', type=float, default=0.005)
+    parser.add_argument('--unregistered-rate', type=float, default=0.01)
+    parser.add_argument('--quota-per-second', type=int, default=0,
+                        help='자동 실행한 스탠드인 서버의 초당 할당량 (초과 시 429 + Retry-After)')
+    parser.add_argument('--rate-limit', type=float, default=0, help='FCM 초당 전송 제한 (0이면 무제한)')
+    parser.add_argument('--dispatch-workers', type=int, default=64, help='사용자 배치 전송 스레드 수')
+    parser.add_argument('--send-workers', type=int, default=32, help='FCMService 토큰 전송 스레드 수')
+    args = parser.parse_args()
+
+    # app 임포트 전에 DB와 발송 경로 설정
+    os.environ['DATABASE_URL'] = args.database_url
+    os.environ['NOTIFICATION_OUTBOX_ENABLED'] = 'false'
+    os.environ.setdefault('FCM_BACKEND', 'fake')
+
+    logging.basicConfig(level=logging.WARNING)
+    logger.setLevel(logging.INFO)
+    # 토큰별 경고 로그는 측정을 왜곡하므로 생략
+    logging.getLogger('fcm_integration.fcm_utils').setLevel(logging.CRITICAL)
+
+    report = run_benchmark(args)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    sys.exit(0 if report['success'] else 1)
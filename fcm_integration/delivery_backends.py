@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+FCM 전송 백엔드
+
+FCMService는 구성한 messaging.Message를 백엔드의 send()로 넘기기만 합니다.
+운영에서는 FirebaseBackend(실제 FCM)를, 부하/지연 테스트에서는 실제 Firebase 없이
+지연·오류·등록 해제 토큰을 흉내 내는 FakeBackend(프로세스 내) 또는
+HttpStandInBackend(fcm_standin.py 로컬 HTTP 서버)를 사용합니다.
+
+환경변수:
+    FCM_BACKEND              firebase(기본) | fake | http
+    FCM_STANDIN_URL          http 백엔드 주소 (기본 http://127.0.0.1:8765)
+    FCM_FAKE_LATENCY_MS      fake 백엔드 평균 지연 (ms)
+    FCM_FAKE_JITTER_MS       fake 백엔드 지연 편차 (ms)
+    FCM_FAKE_ERROR_RATE      fake 백엔드 일시 오류 비율 (0~1)
+    FCM_FAKE_UNREGISTERED_RATE  fake 백엔드 등록 해제 토큰 비율 (0~1)
+"""
+
+import os
+import time
+import random
+import zlib
+import threading
+import logging
+from collections import Counter
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import requests
+from firebase_admin import messaging, exceptions
+
+logger = logging.getLogger(__name__)
+
+
+class DeliveryBackend:
+    """전송 백엔드 인터페이스"""
+
+    name = 'base'
+    # 실제 Firebase 초기화가 필요한지 여부
+    requires_firebase = False
+
+    def send(self, message: messaging.Message, dry_run: bool = False) -> str:
+        """
+        메시지 1건 전송
+
+        Args:
+            message: 전송할 메시지
+            dry_run: True면 실제로 전달하지 않고 검증만 (토큰 유효성 확인용)
+
+        Returns:
+            str: 메시지 ID
+
+        Raises:
+            messaging.UnregisteredError, messaging.SenderIdMismatchError, exceptions.FirebaseError
+        """
+        raise NotImplementedError
+
+    def subscribe_to_topic(self, tokens: List[str], topic: str):
+        """주제 구독 (테스트 백엔드는 모두 성공으로 처리)"""
+        return SimpleNamespace(success_count=len(tokens), failure_count=0)
+
+    def unsubscribe_from_topic(self, tokens: List[str], topic: str):
+        """주제 구독 해제 (테스트 백엔드는 모두 성공으로 처리)"""
+        return SimpleNamespace(success_count=len(tokens), failure_count=0)
+
+    def stats(self) -> Dict[str, int]:
+        return {}
+
+
+class FirebaseBackend(DeliveryBackend):
+    """실제 FCM (firebase_admin.messaging.send)"""
+
+    name = 'firebase'
+    requires_firebase = True
+
+    def send(self, message: messaging.Message, dry_run: bool = False) -> str:
+        if dry_run:
+            return messaging.send(message, dry_run=True)
+        return messaging.send(message)
+
+    def subscribe_to_topic(self, tokens: List[str], topic: str):
+        return messaging.subscribe_to_topic(tokens, topic)
+
+    def unsubscribe_from_topic(self, tokens: List[str], topic: str):
+        return messaging.unsubscribe_from_topic(tokens, topic)
+
+
+class FailureModel:
+    """
+    토큰별 전송 결과 시뮬레이션 (FakeBackend와 HTTP 스탠드인 서버가 공유)
+
+    등록 해제 여부는 토큰 해시로 결정하므로 같은 토큰은 항상 같은 결과를 돌려주고
+    (실제 FCM처럼 재시도해도 성공하지 않음), 일시 오류만 무작위로 발생합니다.
+    """
+
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0.0,
+                 unregistered_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.unregistered_rate = unregistered_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self):
+        if self.latency_ms or self.jitter_ms:
+            with self._lock:
+                delay_ms = self._random.gauss(self.latency_ms, self.jitter_ms) if self.jitter_ms else self.latency_ms
+            time.sleep(max(0.0, delay_ms) / 1000.0)
+
+    def is_unregistered(self, token: Optional[str]) -> bool:
+        if not token or not self.unregistered_rate:
+            return False
+        return (zlib.crc32(token.encode('utf-8')) % 10000) < self.unregistered_rate * 10000
+
+    def is_transient_error(self) -> bool:
+        if not self.error_rate:
+            return False
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def outcome(self, token: Optional[str]) -> str:
+        """지연 후 'sent' | 'unregistered' | 'unavailable' 반환"""
+        self.delay()
+        if self.is_unregistered(token):
+            return 'unregistered'
+        if self.is_transient_error():
+            return 'unavailable'
+        return 'sent'
+
+
+class FakeBackend(DeliveryBackend):
+    """프로세스 내 가짜 FCM (네트워크 없이 지연/오류만 흉내)"""
+
+    name = 'fake'
+
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0.0,
+                 unregistered_rate: float = 0.0, seed: Optional[int] = None, encode: bool = True):
+        self.model = FailureModel(latency_ms, jitter_ms, error_rate, unregistered_rate, seed)
+        # 실제 전송처럼 메시지를 FCM v1 JSON으로 직렬화 (직렬화 비용 포함 측정)
+        self.encode = encode
+        self._counts = Counter()
+        self._lock = threading.Lock()
+        self._sequence = 0
+
+    def send(self, message: messaging.Message, dry_run: bool = False) -> str:
+        if self.encode:
+            messaging._MessagingService.encode_message(message)
+
+        outcome = self.model.outcome(message.token)
+        with self._lock:
+            # dry run(토큰 검증)은 별도 집계
+            self._counts[f"validate_{outcome}" if dry_run else outcome] += 1
+            self._sequence += 1
+            sequence = self._sequence
+
+        if outcome == 'unregistered':
+            raise messaging.UnregisteredError('Requested entity was not found.')
+        if outcome == 'unavailable':
+            raise exceptions.UnavailableError('Simulated FCM outage.')
+        return f"projects/fake/messages/{sequence}"
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+
+class HttpStandInBackend(DeliveryBackend):
+    """로컬 HTTP 스탠드인 서버(fcm_standin.py)로 FCM v1 형식 요청 전송"""
+
+    name = 'http'
+
+    def __init__(self, base_url: str = 'http://127.0.0.1:8765', project_id: str = 'standin', timeout: float = 10):
+        self.url = f"{base_url.rstrip('/')}/v1/projects/{project_id}/messages:send"
+        self.timeout = timeout
+        self._local = threading.local()
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def _session(self) -> requests.Session:
+        # 스레드마다 연결 재사용
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            self._local.session = session
+        return session
+
+    def _count(self, outcome: str):
+        with self._lock:
+            self._counts[outcome] += 1
+
+    def send(self, message: messaging.Message, dry_run: bool = False) -> str:
+        payload = {'message': messaging._MessagingService.encode_message(message)}
+        if dry_run:
+            payload['validate_only'] = True
+        try:
+            response = self._session().post(self.url, json=payload, timeout=self.timeout)
+        except requests.RequestException as e:
+            self._count('unavailable')
+            raise exceptions.UnavailableError(f'FCM stand-in request failed: {e}', cause=e)
+
+        if response.status_code == 200:
+            self._count('sent')
+            return response.json().get('name', '')
+
+        error = (response.json() if response.content else {}).get('error', {})
+        error_code = next((d.get('errorCode') for d in error.get('details', []) if d.get('errorCode')), None)
+        message_text = error.get('message', f'HTTP {response.status_code}')
+
+        if error_code == 'UNREGISTERED':
+            self._count('unregistered')
+            raise messaging.UnregisteredError(message_text)
+        if error_code == 'SENDER_ID_MISMATCH':
+            self._count('sender_id_mismatch')
+            raise messaging.SenderIdMismatchError(message_text)
+
+        # Retry-After 등 응답 헤더는 http_response로 전달 (RateGovernor가 사용)
+        if response.status_code == 429:
+            self._count('quota_exceeded')
+            raise messaging.QuotaExceededError(message_text, http_response=response)
+
+        self._count('unavailable')
+        if response.status_code == 503:
+            raise exceptions.UnavailableError(message_text, http_response=response)
+        raise exceptions.UnknownError(message_text, http_response=response)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+
+def create_backend_from_env() -> DeliveryBackend:
+    """FCM_BACKEND 환경변수에 맞는 전송 백엔드 생성"""
+    backend = os.environ.get('FCM_BACKEND', 'firebase').lower()
+
+    if backend == 'fake':
+        return FakeBackend(
+            latency_ms=float(os.environ.get('FCM_FAKE_LATENCY_MS', '0')),
+            jitter_ms=float(os.environ.get('FCM_FAKE_JITTER_MS', '0')),
+            error_rate=float(os.environ.get('FCM_FAKE_ERROR_RATE', '0')),
+            unregistered_rate=float(os.environ.get('FCM_FAKE_UNREGISTERED_RATE', '0'))
+        )
+    if backend == 'http':
+        return HttpStandInBackend(os.environ.get('FCM_STANDIN_URL', 'http://127.0.0.1:8765'))
+    if backend != 'firebase':
+        logger.warning(f"Unknown FCM_BACKEND '{backend}', falling back to firebase")
+    return FirebaseBackend()
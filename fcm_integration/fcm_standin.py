@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+로컬 FCM 스탠드인 서버
+
+FCM HTTP v1 API(POST /v1/projects/<project>/messages:send)와 같은 형식으로 응답하며
+지연, 일시 오류(503), 등록 해제 토큰(404 UNREGISTERED), 할당량 초과(429 + Retry-After)를 흉내 냅니다.
+HttpStandInBackend와 함께 실제 Firebase 없이 알림 전송 부하/지연을 측정할 때 사용합니다.
+
+사용법:
+    python -m fcm_integration.fcm_standin --port 8765 --latency-ms 30 --jitter-ms 10 \\
+        --error-rate 0.01 --unregistered-rate 0.02 --quota-per-second 2000
+    curl http://127.0.0.1:8765/stats
+"""
+
+import json
+import time
+import logging
+import argparse
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fcm_integration.delivery_backends import FailureModel
+
+logger = logging.getLogger(__name__)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive (클라이언트 세션 재사용)
+
+    def _reply(self, status: int, payload: dict, headers: dict = None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self._reply(200, self.server.snapshot())
+        else:
+            self._reply(404, {'error': {'code': 404, 'message': 'Not found'}})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+
+        if not self.path.endswith('/messages:send'):
+            self._reply(404, {'error': {'code': 404, 'message': 'Not found'}})
+            return
+
+        try:
+            request_body = json.loads(raw or b'{}')
+            message = request_body.get('message') or {}
+        except ValueError:
+            self._reply(400, {'error': {'code': 400, 'status': 'INVALID_ARGUMENT', 'message': 'Invalid JSON'}})
+            return
+
+        retry_after = self.server.check_quota()
+        if retry_after is not None:
+            self.server.record('quota_exceeded')
+            self._reply(429, {'error': {
+                'code': 429, 'status': 'RESOURCE_EXHAUSTED', 'message': 'Quota exceeded for sending messages.',
+                'details': [{'@type': 'type.googleapis.com/google.firebase.fcm.v1.FcmError',
+                             'errorCode': 'QUOTA_EXCEEDED'}]
+            }}, headers={'Retry-After': str(retry_after)})
+            return
+
+        outcome = self.server.model.outcome(message.get('token'))
+        # validate_only(dry run) 요청은 별도 집계
+        sequence = self.server.record(f"validate_{outcome}" if request_body.get('validate_only') else outcome)
+
+        if outcome == 'unregistered':
+            self._reply(404, {'error': {
+                'code': 404, 'status': 'NOT_FOUND', 'message': 'Requested entity was not found.',
+                'details': [{'@type': 'type.googleapis.com/google.firebase.fcm.v1.FcmError',
+                             'errorCode': 'UNREGISTERED'}]
+            }})
+        elif outcome == 'unavailable':
+            self._reply(503, {'error': {
+                'code': 503, 'status': 'UNAVAILABLE', 'message': 'Simulated FCM outage.',
+                'details': [{'@type': 'type.googleapis.com/google.firebase.fcm.v1.FcmError',
+                             'errorCode': 'UNAVAILABLE'}]
+            }})
+        else:
+            project = self.path.split('/')[3] if self.path.count('/') >= 4 else 'standin'
+            self._reply(200, {'name': f"projects/{project}/messages/{sequence}"})
+
+    def log_message(self, format, *args):
+        # 요청마다 로그를 남기면 측정에 영향을 주므로 생략
+        pass
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address, model: FailureModel, quota_per_second: int = 0):
+        super().__init__(address, StandInHandler)
+        self.model = model
+        # 초당 허용 요청 수 (0이면 무제한, 초과 시 429 + Retry-After)
+        self.quota_per_second = quota_per_second
+        self._counts = Counter()
+        self._lock = threading.Lock()
+        self._quota_window = 0
+        self._quota_used = 0
+
+    def check_quota(self):
+        """할당량을 넘었으면 Retry-After 초, 아니면 None"""
+        if not self.quota_per_second:
+            return None
+        with self._lock:
+            window = int(time.time())
+            if window != self._quota_window:
+                self._quota_window = window
+                self._quota_used = 0
+            self._quota_used += 1
+            if self._quota_used > self.quota_per_second:
+                return 1
+        return None
+
+    def record(self, outcome: str) -> int:
+        with self._lock:
+            self._counts[outcome] += 1
+            return sum(self._counts.values())
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._counts)
+
+
+def start_standin_server(host: str = '127.0.0.1', port: int = 8765, quota_per_second: int = 0,
+                         **model_options) -> StandInServer:
+    """백그라운드 스레드에서 스탠드인 서버 시작 (벤치마크/테스트용, port=0이면 임의 포트)"""
+    server = StandInServer((host, port), FailureModel(**model_options), quota_per_second=quota_per_second)
+    thread = threading.Thread(target=server.serve_forever, name='fcm-standin', daemon=True)
+    thread.start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='로컬 FCM 스탠드인 서버')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0, help='평균 응답 지연 (ms)')
+    parser.add_argument('--jitter-ms', type=float, default=0, help='응답 지연 편차 (ms)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='일시 오류(503) 비율')
+    parser.add_argument('--unregistered-rate', type=float, default=0.0, help='등록 해제 토큰 비율')
+    parser.add_argument('--quota-per-second', type=int, default=0, help='초당 허용 요청 수 (초과 시 429)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = StandInServer((args.host, args.port), FailureModel(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate, unregistered_rate=args.unregistered_rate
+    ), quota_per_second=args.quota_per_second)
+    logger.info(f"FCM stand-in listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -6,25 +6,160 @@ FCM (Firebase Cloud Messaging) 유틸리티
 푸시 알림 전송, 주제 관리, 메시지 구성 등의 FCM 기능을 제공합니다.
 """
 
+import os
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional, Union
-from firebase_admin import messaging
+from firebase_admin import messaging, exceptions
 from fcm_integration.firebase_config import get_firebase_app, is_firebase_available
-from models import User
+from fcm_integration.delivery_backends import DeliveryBackend, create_backend_from_env
+from fcm_integration.message_templates import get_message_template
+from fcm_integration.rate_governor import RateGovernor, fcm_rate_governor
+from sqlalchemy import select
+from models import User, UserDevice
 from database import db
 
 # 로깅 설정
 logger = logging.getLogger(__name__)
 
+# send_each와 같은 크기로 잘라서 전송 (진행 중인 Future 수 제한)
+MULTICAST_CHUNK_SIZE = 500
+
 class FCMService:
     """FCM 서비스 클래스"""
     
-    def __init__(self):
-        self.app = get_firebase_app()
-        self.available = is_firebase_available()
+    def __init__(self, backend: Optional[DeliveryBackend] = None, governor: Optional[RateGovernor] = None):
+        # 전송 백엔드 (기본: FCM_BACKEND 환경변수, 운영은 실제 Firebase)
+        self.backend = backend or create_backend_from_env()
+        # 전송 속도 조절기 (기본: 프로세스 공유 조절기)
+        self.governor = governor or fcm_rate_governor
+        if self.backend.requires_firebase:
+            self.app = get_firebase_app()
+            self.available = is_firebase_available()
+        else:
+            self.app = None
+            self.available = True
+        self.send_workers = int(os.environ.get('FCM_SEND_WORKERS', '32'))
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        # 전송 중 무효로 판명된 토큰 (prune_invalid_tokens에서 일괄 정리)
+        self._invalid_tokens = set()
+        self._invalid_tokens_lock = threading.Lock()
         
         if not self.available:
             logger.warning("Firebase is not available. FCM notifications will be disabled.")
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """토큰별 전송에 쓰는 공유 스레드 풀 (프로세스 전체의 동시 FCM 요청 수 제한)"""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=max(1, self.send_workers),
+                        thread_name_prefix='fcm-send'
+                    )
+        return self._executor
+
+    def _send(self, message: messaging.Message, dry_run: bool = False) -> str:
+        """속도 조절기를 거쳐 메시지 1건 전송 (할당량 오류는 Retry-After 후 재시도)"""
+        return self.governor.call(self.backend.send, message, dry_run=dry_run)
+
+    def validate_token(self, token: str) -> str:
+        """
+        FCM dry-run 전송으로 토큰 유효성 확인 (기기에는 전달되지 않음)
+
+        무효 토큰은 prune_invalid_tokens 정리 대상으로 기록합니다.
+
+        Returns:
+            str: 'valid' | 'invalid' | 'error' (일시 오류 등으로 판단 불가)
+        """
+        if not self.available:
+            return 'error'
+
+        try:
+            self._send(messaging.Message(token=token), dry_run=True)
+            return 'valid'
+        except (messaging.UnregisteredError, messaging.SenderIdMismatchError):
+            self._mark_invalid_token(token)
+            return 'invalid'
+        except exceptions.InvalidArgumentError as e:
+            # 형식이 잘못된 토큰도 재시도해도 성공하지 않음
+            logger.debug(f"Invalid FCM token format {token[:20]}...: {e}")
+            self._mark_invalid_token(token)
+            return 'invalid'
+        except Exception as e:
+            logger.debug(f"FCM token validation failed for {token[:20]}...: {type(e).__name__}: {e}")
+            return 'error'
+
+    def get_delivery_stats(self) -> Dict:
+        """전송 속도 조절/백엔드 결과 통계"""
+        return {
+            'backend': self.backend.name,
+            'backend_outcomes': self.backend.stats(),
+            'rate_governor': self.governor.metrics(),
+            'pending_invalid_tokens': self.pending_invalid_tokens
+        }
+
+    def _mark_invalid_token(self, token: str):
+        """UnregisteredError/SenderIdMismatchError가 발생한 토큰 기록"""
+        with self._invalid_tokens_lock:
+            self._invalid_tokens.add(token)
+
+    @property
+    def pending_invalid_tokens(self) -> int:
+        """정리 대기 중인 무효 토큰 수"""
+        with self._invalid_tokens_lock:
+            return len(self._invalid_tokens)
+
+    def prune_invalid_tokens(self, chunk_size: int = 1000) -> int:
+        """
+        수집된 무효 토큰을 사용자 기기/사용자 정보에서 일괄 제거
+
+        토큰별로 사용자를 조회/수정하지 않고 DELETE FROM user_devices WHERE token IN (...)과
+        UPDATE users ... WHERE fcm_token IN (...)으로 한 번에 정리하므로 이후 알림 실행에서
+        죽은 토큰을 다시 시도하지 않습니다. 대표 토큰(User.fcm_token)이 무효가 된 사용자는
+        남은 기기 중 가장 최근 기기 토큰으로 바뀝니다 (없으면 NULL).
+        애플리케이션 컨텍스트 안에서 호출해야 합니다.
+
+        Returns:
+            int: 정리된 기기 수 + 대표 토큰이 바뀐 사용자 수
+        """
+        with self._invalid_tokens_lock:
+            tokens = list(self._invalid_tokens)
+            self._invalid_tokens.clear()
+
+        if not tokens:
+            return 0
+
+        try:
+            removed_devices = 0
+            updated_users = 0
+            next_device_token = select(UserDevice.token).where(
+                UserDevice.user_id == User.id
+            ).order_by(UserDevice.last_seen_at.desc()).limit(1).scalar_subquery()
+
+            for start in range(0, len(tokens), chunk_size):
+                chunk = tokens[start:start + chunk_size]
+                removed_devices += UserDevice.query.filter(UserDevice.token.in_(chunk)).delete(
+                    synchronize_session=False
+                )
+                updated_users += User.query.filter(User.fcm_token.in_(chunk)).update(
+                    {User.fcm_token: next_device_token}, synchronize_session=False
+                )
+            db.session.commit()
+            logger.info(
+                f"Pruned invalid FCM tokens: {removed_devices} devices removed, "
+                f"{updated_users} users updated ({len(tokens)} tokens)"
+            )
+            return removed_devices + updated_users
+        except Exception as e:
+            db.session.rollback()
+            # 다음 실행에서 다시 시도
+            with self._invalid_tokens_lock:
+                self._invalid_tokens.update(tokens)
+            logger.error(f"Failed to prune invalid FCM tokens: {e}")
+            return 0
     
     def send_notification(self, 
                          token: str, 
@@ -50,57 +185,21 @@ class FCMService:
             return False
         
         try:
-            # 알림 메시지 구성
-            notification = messaging.Notification(
-                title=title,
-                body=body,
-                image=image_url
-            )
-            
-            # Android 설정
-            android_config = messaging.AndroidConfig(
-                priority='high',
-                notification=messaging.AndroidNotification(
-                    icon='ic_notification',
-                    color='#FF6B35',
-                    sound='default',
-                    click_action='FLUTTER_NOTIFICATION_CLICK'
-                )
-            )
-            
-            # iOS 설정
-            apns_config = messaging.APNSConfig(
-                payload=messaging.APNSPayload(
-                    aps=messaging.Aps(
-                        alert=messaging.ApsAlert(
-                            title=title,
-                            body=body
-                        ),
-                        sound='default',
-                        badge=1
-                    )
-                )
-            )
-            
-            # 메시지 생성
-            message = messaging.Message(
-                notification=notification,
-                data=data or {},
-                token=token,
-                android=android_config,
-                apns=apns_config
-            )
+            # 같은 payload의 플랫폼 설정은 템플릿에서 재사용
+            message = get_message_template(title, body, data, image_url).for_token(token)
             
             # 메시지 전송
-            response = messaging.send(message)
+            response = self._send(message)
             logger.info(f"FCM notification sent successfully: {response}")
             return True
             
         except messaging.UnregisteredError:
             logger.warning(f"FCM token is unregistered: {token}")
+            self._mark_invalid_token(token)
             return False
         except messaging.SenderIdMismatchError:
             logger.error(f"FCM sender ID mismatch: {token}")
+            self._mark_invalid_token(token)
             return False
         except Exception as e:
             logger.error(f"Failed to send FCM notification: {e}")
@@ -131,74 +230,62 @@ class FCMService:
             return {"success_count": 0, "failure_count": 0}
         
         try:
-            # 알림 메시지 구성
-            notification = messaging.Notification(title=title, body=body)
-
-            # Android 설정
-            android_config = messaging.AndroidConfig(
-                priority='high',
-                notification=messaging.AndroidNotification(
-                    icon='ic_notification',
-                    color='#FF6B35',
-                    sound='default',
-                    click_action='FLUTTER_NOTIFICATION_CLICK'
-                )
-            )
-
-            # iOS 설정
-            apns_config = messaging.APNSConfig(
-                payload=messaging.APNSPayload(
-                    aps=messaging.Aps(
-                        alert=messaging.ApsAlert(
-                            title=title,
-                            body=body
-                        ),
-                        sound='default',
-                        badge=1
-                    )
-                )
-            )
+            # 플랫폼 설정은 payload당 한 번만 구성하고 토큰별로는 Message만 생성
+            template = get_message_template(title, body, data)
 
             # 개별 전송 (batch API 404 오류 회피)
-            # firebase-admin 6.5.0에서 send_all()도 /batch를 사용하므로 개별 전송 필요
+            # firebase-admin 6.5.0에서 send_all()도 /batch를 사용하므로 토큰별 백엔드 send를
+            # 공유 스레드 풀로 동시에 호출하고, MULTICAST_CHUNK_SIZE 단위로 나눠 제출합니다.
             success_count = 0
             failure_count = 0
             failed_tokens = []
+            invalid_tokens = []
 
-            for token in tokens:
+            def _send_to_token(token):
                 try:
-                    message = messaging.Message(
-                        notification=notification,
-                        data=data or {},
-                        token=token,
-                        android=android_config,
-                        apns=apns_config
-                    )
-
                     # 개별 전송
-                    response = messaging.send(message)
-                    success_count += 1
+                    self._send(template.for_token(token))
                     logger.debug(f"Successfully sent to token: {token[:20]}...")
+                    return 'sent'
 
                 except messaging.UnregisteredError:
-                    failure_count += 1
-                    failed_tokens.append(token)
                     logger.warning(f"FCM token is unregistered: {token[:20]}...")
+                    self._mark_invalid_token(token)
+                    return 'invalid'
                 except messaging.SenderIdMismatchError:
-                    failure_count += 1
-                    failed_tokens.append(token)
                     logger.error(f"FCM sender ID mismatch: {token[:20]}...")
+                    self._mark_invalid_token(token)
+                    return 'invalid'
+                except messaging.QuotaExceededError:
+                    logger.warning(f"FCM quota still exceeded after retries: {token[:20]}...")
                 except Exception as e:
-                    failure_count += 1
-                    failed_tokens.append(token)
                     logger.warning(f"Failed to send to token {token[:20]}...: {type(e).__name__}: {e}")
+                return 'failed'
+
+            for start in range(0, len(tokens), MULTICAST_CHUNK_SIZE):
+                chunk = tokens[start:start + MULTICAST_CHUNK_SIZE]
+                if len(chunk) == 1:
+                    outcomes = [_send_to_token(chunk[0])]
+                else:
+                    outcomes = self._get_executor().map(_send_to_token, chunk)
+
+                # map은 입력 순서대로 결과를 돌려주므로 실패 토큰 순서도 기존과 동일
+                for token, outcome in zip(chunk, outcomes):
+                    if outcome == 'sent':
+                        success_count += 1
+                    else:
+                        failure_count += 1
+                        failed_tokens.append(token)
+                        if outcome == 'invalid':
+                            invalid_tokens.append(token)
 
             logger.info(f"Multicast notification sent individually: {success_count} success, {failure_count} failure out of {len(tokens)} tokens")
 
             return {
                 "success_count": success_count,
                 "failure_count": failure_count,
-                "failed_tokens": failed_tokens
+                "failed_tokens": failed_tokens,
+                "invalid_tokens": invalid_tokens
             }
 
         except Exception as e:
@@ -229,18 +316,11 @@ class FCMService:
             return False
         
         try:
-            # 알림 메시지 구성
-            notification = messaging.Notification(title=title, body=body)
-            
             # 주제 메시지 생성
-            message = messaging.Message(
-                notification=notification,
-                data=data or {},
-                topic=topic
-            )
+            message = get_message_template(title, body, data).for_topic(topic)
             
             # 메시지 전송
-            response = messaging.send(message)
+            response = self._send(message)
             logger.info(f"Topic notification sent successfully to '{topic}': {response}")
             return True
             
@@ -264,7 +344,7 @@ class FCMService:
             return {"success_count": 0, "failure_count": len(tokens)}
         
         try:
-            response = messaging.subscribe_to_topic(tokens, topic)
+            response = self.governor.call(self.backend.subscribe_to_topic, tokens, topic)
             logger.info(f"Subscribed {response.success_count} tokens to topic '{topic}'")
             return {
                 "success_count": response.success_count,
@@ -290,7 +370,7 @@ class FCMService:
             return {"success_count": 0, "failure_count": len(tokens)}
         
         try:
-            response = messaging.unsubscribe_from_topic(tokens, topic)
+            response = self.governor.call(self.backend.unsubscribe_from_topic, tokens, topic)
             logger.info(f"Unsubscribed {response.success_count} tokens from topic '{topic}'")
             return {
                 "success_count": response.success_count,
@@ -328,8 +408,9 @@ class WeatherNotificationService:
             logger.info("No users available for FCM notifications")
             return {"success_count": 0, "failure_count": 0}
         
-        # 토큰 수집
-        tokens = [user.fcm_token for user in fcm_users]
+        # 토큰 수집 (사용자별 전체 기기, 중복 제거)
+        from user_devices import collect_tokens
+        tokens = collect_tokens(fcm_users)
         
         # 알림 메시지 구성
         title, body = self._create_weather_message(weather_data, alert_type)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+FCM 메시지 구성 비용 마이크로벤치마크
+
+토큰마다 Notification/AndroidConfig/APNSConfig를 새로 만드는 기존 방식과
+MessageTemplate으로 플랫폼 설정을 공유하는 방식의 메시지 구성 시간을 비교합니다.
+--encode를 주면 FCM v1 JSON 직렬화(실제 전송 시 토큰마다 수행)까지 포함해 측정합니다.
+네트워크 전송은 하지 않습니다.
+
+사용법:
+    python -m fcm_integration.message_template_benchmark --tokens 10000 --repeat 5
+"""
+
+import json
+import time
+import argparse
+
+from firebase_admin import messaging
+
+from fcm_integration.message_templates import MessageTemplate, collapse_key_for
+
+TITLE = '🌧️ 망원시장 날씨 알림'
+BODY = '3시간 이내 강수 확률 80% (비)'
+DATA = {'type': 'weather_alert', 'market_id': '1', 'market_name': '망원시장',
+        'alerts': json.dumps({'rain': {'probability': 80}}, ensure_ascii=False)}
+COLLAPSE_KEY = collapse_key_for(DATA)
+
+
+def build_per_token(token: str) -> messaging.Message:
+    """기존 방식: 토큰마다 모든 설정 객체를 새로 구성"""
+    return messaging.Message(
+        notification=messaging.Notification(title=TITLE, body=BODY),
+        data=DATA,
+        token=token,
+        android=messaging.AndroidConfig(
+            priority='high',
+            collapse_key=COLLAPSE_KEY,
+            notification=messaging.AndroidNotification(
+                icon='ic_notification',
+                color='#FF6B35',
+                sound='default',
+                click_action='FLUTTER_NOTIFICATION_CLICK',
+                tag=COLLAPSE_KEY
+            )
+        ),
+        apns=messaging.APNSConfig(
+            headers={'apns-collapse-id': COLLAPSE_KEY},
+            payload=messaging.APNSPayload(
+                aps=messaging.Aps(
+                    alert=messaging.ApsAlert(title=TITLE, body=BODY),
+                    sound='default',
+                    badge=1,
+                    thread_id=COLLAPSE_KEY
+                )
+            )
+        )
+    )
+
+
+def run(tokens: int, repeat: int, encode: bool) -> dict:
+    token_list = [f'benchmark-token-{i:07d}' for i in range(tokens)]
+    encode_message = messaging._MessagingService.encode_message
+
+    def per_token():
+        for token in token_list:
+            message = build_per_token(token)
+            if encode:
+                encode_message(message)
+
+    def templated():
+        template = MessageTemplate(TITLE, BODY, DATA)
+        for token in token_list:
+            message = template.for_token(token)
+            if encode:
+                encode_message(message)
+
+    # 두 방식이 같은 메시지를 만드는지 확인
+    assert encode_message(build_per_token('t')) == encode_message(MessageTemplate(TITLE, BODY, DATA).for_token('t'))
+
+    results = {}
+    for name, func in (('per_token', per_token), ('template', templated)):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        best = min(timings)
+        results[name] = {
+            'best_ms': round(best * 1000, 2),
+            'per_message_us': round(best / tokens * 1e6, 2)
+        }
+
+    results['speedup'] = round(results['per_token']['best_ms'] / results['template']['best_ms'], 2)
+    return {'tokens': tokens, 'repeat': repeat, 'encode': encode, 'results': results}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='FCM 메시지 구성 비용 마이크로벤치마크')
+    parser.add_argument('--tokens', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--encode', action='store_true', help='FCM v1 JSON 직렬화 비용 포함')
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.tokens, args.repeat, args.encode), ensure_ascii=False, indent=2))
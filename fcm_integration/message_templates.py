@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+FCM 메시지 템플릿
+
+알림 내용(제목/본문/데이터/이미지)이 같으면 Notification, AndroidConfig, APNSConfig는
+토큰과 무관하게 동일합니다. MessageTemplate은 이 객체들을 payload당 한 번만 만들고,
+토큰마다 messaging.Message 하나만 찍어 냅니다 (플랫폼 설정 객체는 읽기 전용으로 공유).
+
+시장 알림은 시장별 collapse key(Android collapse_key/tag, APNs apns-collapse-id)와
+thread id를 붙여 같은 시장의 새 알림이 이전 알림을 대체하고 시장별로 묶여 표시되게 합니다.
+
+사용법:
+    template = get_message_template(title, body, data)
+    for token in tokens:
+        backend.send(template.for_token(token))
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from firebase_admin import messaging
+
+# Android 알림 공통 설정
+ANDROID_NOTIFICATION_ICON = 'ic_notification'
+ANDROID_NOTIFICATION_COLOR = '#FF6B35'
+ANDROID_CLICK_ACTION = 'FLUTTER_NOTIFICATION_CLICK'
+
+# 여러 시장을 묶은 요약 알림의 collapse key / thread id
+SUMMARY_COLLAPSE_KEY = 'weather_summary'
+
+# 최근 사용한 템플릿 캐시 크기 (알림 실행 1회의 서로 다른 payload 수보다 충분히 크게)
+TEMPLATE_CACHE_SIZE = 256
+
+
+def collapse_key_for(data: Optional[Dict]) -> Optional[str]:
+    """알림 데이터에 맞는 collapse key (시장 알림은 시장별, 요약 알림은 공통, 그 외 없음)"""
+    if not data:
+        return None
+    if data.get('market_id'):
+        return f"market_{data['market_id']}"
+    if data.get('type') == 'weather_summary_alert':
+        return SUMMARY_COLLAPSE_KEY
+    return None
+
+
+class MessageTemplate:
+    """payload당 한 번 구성한 플랫폼 설정으로 토큰별 메시지를 만드는 템플릿"""
+
+    __slots__ = ('title', 'body', 'data', 'image_url', 'collapse_key', 'notification', 'android', 'apns')
+
+    def __init__(self, title: str, body: str, data: Optional[Dict] = None, image_url: Optional[str] = None):
+        self.title = title
+        self.body = body
+        self.data = dict(data or {})
+        self.image_url = image_url
+        self.collapse_key = collapse_key_for(self.data)
+
+        self.notification = messaging.Notification(title=title, body=body, image=image_url)
+
+        # Android 설정 (collapse_key: 미전달 메시지 대체, tag: 알림 트레이에서 대체)
+        self.android = messaging.AndroidConfig(
+            priority='high',
+            collapse_key=self.collapse_key,
+            notification=messaging.AndroidNotification(
+                icon=ANDROID_NOTIFICATION_ICON,
+                color=ANDROID_NOTIFICATION_COLOR,
+                sound='default',
+                click_action=ANDROID_CLICK_ACTION,
+                tag=self.collapse_key
+            )
+        )
+
+        # iOS 설정 (apns-collapse-id: 표시된 알림 대체, thread_id: 알림 센터 그룹)
+        self.apns = messaging.APNSConfig(
+            headers={'apns-collapse-id': self.collapse_key} if self.collapse_key else None,
+            payload=messaging.APNSPayload(
+                aps=messaging.Aps(
+                    alert=messaging.ApsAlert(title=title, body=body),
+                    sound='default',
+                    badge=1,
+                    thread_id=self.collapse_key
+                )
+            )
+        )
+
+    def for_token(self, token: str) -> messaging.Message:
+        """개별 기기용 메시지"""
+        return messaging.Message(
+            notification=self.notification,
+            data=self.data,
+            token=token,
+            android=self.android,
+            apns=self.apns
+        )
+
+    def for_topic(self, topic: str) -> messaging.Message:
+        """주제 메시지 (시장 알림이면 collapse 설정 포함, 그 외는 공통 알림/데이터만)"""
+        return messaging.Message(
+            notification=self.notification,
+            data=self.data,
+            topic=topic,
+            android=self.android if self.collapse_key else None,
+            apns=self.apns if self.collapse_key else None
+        )
+
+
+_template_cache = OrderedDict()
+_template_cache_lock = threading.Lock()
+
+
+def _template_key(title: str, body: str, data: Optional[Dict], image_url: Optional[str]) -> tuple:
+    return title, body, json.dumps(data or {}, sort_keys=True, ensure_ascii=False, default=str), image_url
+
+
+def get_message_template(title: str, body: str, data: Optional[Dict] = None,
+                         image_url: Optional[str] = None) -> MessageTemplate:
+    """
+    payload에 해당하는 템플릿 반환 (최근 사용한 템플릿은 재사용)
+
+    같은 시장 알림을 여러 사용자에게 send_notification으로 보낼 때도
+    플랫폼 설정을 다시 만들지 않도록 LRU로 보관합니다.
+    """
+    key = _template_key(title, body, data, image_url)
+    with _template_cache_lock:
+        template = _template_cache.get(key)
+        if template is not None:
+            _template_cache.move_to_end(key)
+            return template
+
+    template = MessageTemplate(title, body, data, image_url)
+    with _template_cache_lock:
+        _template_cache[key] = template
+        if len(_template_cache) > TEMPLATE_CACHE_SIZE:
+            _template_cache.popitem(last=False)
+    return template
+
+
+def clear_template_cache() -> None:
+    with _template_cache_lock:
+        _template_cache.clear()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+FCM 전송 속도 조절기
+
+프로세스의 모든 FCMService 요청(개별/멀티캐스트/주제 전송, 주제 구독)이 하나의 토큰 버킷을
+공유해 초당 전송 수를 제한합니다. FCM이 할당량 초과(429 RESOURCE_EXHAUSTED)나
+Retry-After가 붙은 503을 돌려주면 모든 전송 스레드를 그 시간만큼 함께 멈춘 뒤 재시도하므로
+대량 알림 실행이 중간에 실패하지 않고 지속 가능한 최고 속도로 끝납니다.
+
+환경변수:
+    FCM_RATE_LIMIT_PER_SECOND     초당 최대 요청 수 (0이면 제한 없음, Retry-After만 준수)
+    FCM_RATE_BURST                순간 허용 요청 수 (기본: 초당 요청 수)
+    FCM_QUOTA_MAX_RETRIES         할당량 오류 시 재시도 횟수 (기본 3)
+    FCM_MAX_RETRY_AFTER_SECONDS   Retry-After 상한 (기본 60초)
+"""
+
+import os
+import time
+import threading
+import logging
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional
+
+from firebase_admin import exceptions
+
+logger = logging.getLogger(__name__)
+
+# Retry-After 헤더가 없는 할당량 오류의 기본 대기 시간 (초)
+DEFAULT_RETRY_AFTER_SECONDS = 1.0
+
+
+def parse_retry_after(error: Exception) -> Optional[float]:
+    """FirebaseError의 HTTP 응답에서 Retry-After(초 또는 HTTP 날짜)를 초 단위로 추출"""
+    response = getattr(error, 'http_response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+
+    value = headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class RateGovernor:
+    """공유 토큰 버킷 + Retry-After 준수 전송 속도 조절기"""
+
+    def __init__(self, rate_per_second: float = 0, burst: Optional[int] = None, max_retries: int = 3,
+                 max_retry_after: float = 60.0):
+        self.rate_per_second = rate_per_second
+        self.burst = max(1, int(burst if burst is not None else rate_per_second or 1))
+        self.max_retries = max_retries
+        self.max_retry_after = max_retry_after
+
+        self._lock = threading.Lock()
+        # 다음 요청의 이론상 도착 시각 (GCRA 방식 토큰 버킷)
+        self._next_slot = 0.0
+        # Retry-After로 모든 전송을 멈추는 시각
+        self._paused_until = 0.0
+
+        self._waiting = 0
+        self._max_waiting = 0
+        self._acquired = 0
+        self._throttled = 0
+        self._wait_seconds = 0.0
+        self._quota_errors = 0
+        self._retries = 0
+        self._pauses = 0
+
+    @classmethod
+    def from_env(cls) -> 'RateGovernor':
+        burst = os.environ.get('FCM_RATE_BURST')
+        return cls(
+            rate_per_second=float(os.environ.get('FCM_RATE_LIMIT_PER_SECOND', '0')),
+            burst=int(burst) if burst else None,
+            max_retries=int(os.environ.get('FCM_QUOTA_MAX_RETRIES', '3')),
+            max_retry_after=float(os.environ.get('FCM_MAX_RETRY_AFTER_SECONDS', '60'))
+        )
+
+    def _reserve(self) -> float:
+        """다음 전송 슬롯을 예약하고 전송 가능한 시각을 반환"""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._paused_until)
+            if self.rate_per_second <= 0:
+                return start
+
+            interval = 1.0 / self.rate_per_second
+            slot = max(self._next_slot, start)
+            # burst만큼은 미리 당겨 쓸 수 있음
+            send_at = max(start, slot - (self.burst - 1) * interval)
+            self._next_slot = slot + interval
+            return send_at
+
+    def acquire(self) -> float:
+        """
+        전송 1건 허가를 받을 때까지 대기
+
+        Returns:
+            float: 대기한 시간 (초)
+        """
+        with self._lock:
+            self._waiting += 1
+            self._max_waiting = max(self._max_waiting, self._waiting)
+
+        waited = 0.0
+        try:
+            send_at = self._reserve()
+            while True:
+                delay = send_at - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                    waited += delay
+                # 대기 중 Retry-After로 일시 정지되었으면 정지가 끝날 때까지 추가 대기
+                with self._lock:
+                    send_at = self._paused_until
+                if send_at <= time.monotonic():
+                    break
+        finally:
+            with self._lock:
+                self._waiting -= 1
+                self._acquired += 1
+                if waited > 0:
+                    self._throttled += 1
+                    self._wait_seconds += waited
+        return waited
+
+    def pause(self, seconds: float) -> None:
+        """모든 전송을 seconds초 동안 멈춤 (이미 더 길게 멈춰 있으면 유지)"""
+        seconds = min(max(0.0, seconds), self.max_retry_after)
+        with self._lock:
+            until = time.monotonic() + seconds
+            if until > self._paused_until:
+                self._paused_until = until
+                self._pauses += 1
+        logger.warning(f"FCM quota throttling: pausing sends for {seconds:.1f}s")
+
+    def _retry_delay(self, error: Exception) -> Optional[float]:
+        """재시도 대상 오류면 대기 시간, 아니면 None"""
+        retry_after = parse_retry_after(error)
+        if isinstance(error, exceptions.ResourceExhaustedError):
+            return retry_after if retry_after is not None else DEFAULT_RETRY_AFTER_SECONDS
+        if isinstance(error, exceptions.UnavailableError) and retry_after is not None:
+            return retry_after
+        return None
+
+    def call(self, func: Callable, *args, **kwargs):
+        """
+        허가를 받아 func 실행, 할당량 오류면 Retry-After만큼 전체 전송을 멈추고 재시도
+
+        재시도 횟수를 넘기거나 할당량과 무관한 오류는 그대로 전달합니다.
+        """
+        attempt = 0
+        while True:
+            self.acquire()
+            try:
+                return func(*args, **kwargs)
+            except exceptions.FirebaseError as e:
+                delay = self._retry_delay(e)
+                if delay is None:
+                    raise
+                with self._lock:
+                    self._quota_errors += 1
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                with self._lock:
+                    self._retries += 1
+                self.pause(delay)
+
+    def metrics(self) -> Dict:
+        """대기열 깊이와 속도 제한 통계"""
+        with self._lock:
+            return {
+                'rate_per_second': self.rate_per_second,
+                'burst': self.burst,
+                'queue_depth': self._waiting,
+                'max_queue_depth': self._max_waiting,
+                'acquired': self._acquired,
+                'throttled': self._throttled,
+                'throttle_wait_seconds': round(self._wait_seconds, 3),
+                'quota_errors': self._quota_errors,
+                'retries': self._retries,
+                'pauses': self._pauses,
+                'paused_for_seconds': round(max(0.0, self._paused_until - time.monotonic()), 3)
+            }
+
+
+# 프로세스 전체가 공유하는 조절기 (FCMService 기본값)
+fcm_rate_governor = RateGovernor.from_env()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+조건부 요청(ETag / Last-Modified) 유틸리티
+
+검증자(validator)는 응답 본문을 직렬화해 해시하는 대신 데이터 버전
+(예보 발표 시각, 행 ID, updated_at, 행 수 등)으로 만듭니다. 그래서 클라이언트가 보낸
+If-None-Match / If-Modified-Since가 일치하면 응답 본문을 만들거나 직렬화하지 않고
+본문 없는 304를 바로 돌려줍니다.
+
+모바일 앱이 POST로 조회하는 날씨 API(/api/weather/current, /api/weather/forecast)도
+같은 방식으로 처리합니다.
+"""
+
+import hashlib
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional, Union
+
+from flask import Response, jsonify, request
+
+
+def make_etag(*versions: Any) -> str:
+    """데이터 버전 값들로 ETag 값 생성 (따옴표/약한 검증자 표시 제외)"""
+    raw = '|'.join('' if v is None else (v.isoformat() if isinstance(v, datetime) else str(v)) for v in versions)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:20]
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """DB의 naive UTC 시각을 초 단위로 자른 aware UTC 시각으로 (HTTP 날짜는 초 단위)"""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """to_dict()의 isoformat 문자열을 datetime으로 (실패하면 None)"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _not_modified(etag: str, last_modified: Optional[datetime]) -> bool:
+    if request.if_none_match:
+        # If-None-Match가 있으면 If-Modified-Since는 무시 (RFC 9110)
+        return request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def conditional_response(etag: str, build: Callable[[], Union[Response, dict]],
+                         last_modified: Optional[datetime] = None,
+                         cache_control: str = 'no-cache') -> Response:
+    """
+    검증자가 일치하면 304, 아니면 build()로 응답을 만들어 검증자 헤더를 붙여 반환
+
+    Args:
+        etag: make_etag()로 만든 값
+        build: 본문을 만드는 함수 (dict면 jsonify), 304일 때는 호출하지 않음
+        last_modified: 데이터 최종 수정 시각 (naive면 UTC로 간주)
+        cache_control: Cache-Control 헤더 (인증이 필요한 응답은 'private, no-cache')
+    """
+    last_modified = _as_utc(last_modified)
+
+    if _not_modified(etag, last_modified):
+        response = Response(status=304)
+    else:
+        response = build()
+        if isinstance(response, dict):
+            response = jsonify(response)
+
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = cache_control
+    return response
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+목록 조회용 컬럼 프로젝션 (알림 이력, 신고 내역)
+
+목록 API가 ORM 객체를 불러온 뒤 to_dict()에서 log.market.name, report.user.name을 읽으면
+행마다 관계 조회가 한 번씩 더 나갑니다(N+1). 여기서는 응답에 필요한 컬럼만 조인으로 한 번에
+SELECT하고, ORM 객체를 만들지 않은 결과 행을 공통 직렬화 함수로 바로 dict로 바꿉니다.
+목록 하나당 쿼리 수는 행 수와 관계없이 고정됩니다. (행 조회 1회, page 방식이면 개수 1회)
+
+    query = ALARM_LOG_LIST.query().filter(MarketAlarmLog.alert_type == 'rain')
+    rows = query.order_by(MarketAlarmLog.created_at.desc()).limit(20).all()
+    data = ALARM_LOG_LIST.serialize_all(rows)
+
+결과 행은 컬럼 이름(label)으로 속성 접근이 가능하므로 pagination.keyset_paginate에 그대로
+넘길 수 있습니다. 필터는 filter_by 대신 모델 컬럼으로 지정합니다. (조인 후 filter_by는
+조인한 모델에 적용됨)
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from database import db
+from models import Market, MarketAlarmLog, MarketReport, User
+
+
+class ListingProjection:
+    """목록 응답 한 종류의 SELECT 컬럼/조인과 행 직렬화"""
+
+    def __init__(self, model, columns: Sequence[Any], joins: Sequence[Tuple[Any, Any]] = (),
+                 defaults: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            model: 기준 모델 (FROM)
+            columns: 응답 항목 순서대로의 컬럼 (조인 컬럼은 label로 응답 키 지정)
+            joins: (모델, 조인 조건) 목록, 관계가 없어도 행이 빠지지 않도록 LEFT OUTER JOIN
+            defaults: 값이 None일 때 대신 넣을 값 (조인 대상이 없을 때 등)
+        """
+        self.model = model
+        self.columns = tuple(columns)
+        self.joins = tuple(joins)
+        self.keys = tuple(column.key for column in self.columns)
+        self.defaults = dict(defaults or {})
+        # isoformat으로 바꿀 DateTime 컬럼 위치
+        self._datetime_positions = tuple(
+            position for position, column in enumerate(self.columns)
+            if isinstance(column.type, db.DateTime)
+        )
+
+    def query(self):
+        """필요한 컬럼만 조인으로 조회하는 쿼리 (paginate 가능)"""
+        query = db.session.query(*self.columns).select_from(self.model)
+        for target, onclause in self.joins:
+            query = query.outerjoin(target, onclause)
+        return query
+
+    def serialize(self, row: Sequence[Any]) -> Dict[str, Any]:
+        """결과 행 하나를 응답 dict로"""
+        values = list(row)
+        for position in self._datetime_positions:
+            value = values[position]
+            if value is not None:
+                values[position] = value.isoformat()
+        data = dict(zip(self.keys, values))
+        for key, default in self.defaults.items():
+            if data[key] is None:
+                data[key] = default
+        return data
+
+    def serialize_all(self, rows: Iterable[Sequence[Any]]) -> List[Dict[str, Any]]:
+        return [self.serialize(row) for row in rows]
+
+
+_ALARM_LOG_MARKET_JOIN = ((Market, Market.id == MarketAlarmLog.market_id),)
+
+_ALARM_LOG_RESULT_COLUMNS = (
+    MarketAlarmLog.alert_type,
+    MarketAlarmLog.alert_title,
+    MarketAlarmLog.alert_body,
+    MarketAlarmLog.total_users,
+    MarketAlarmLog.success_count,
+    MarketAlarmLog.failure_count,
+)
+
+_ALARM_LOG_WEATHER_COLUMNS = (
+    MarketAlarmLog.temperature,
+    MarketAlarmLog.rain_probability,
+    MarketAlarmLog.wind_speed,
+    MarketAlarmLog.precipitation_type,
+    MarketAlarmLog.forecast_time,
+    MarketAlarmLog.checked_hours,
+    MarketAlarmLog.created_at,
+)
+
+# /api/alarm-logs 목록 (weather_data 제외)
+ALARM_LOG_LIST = ListingProjection(
+    MarketAlarmLog,
+    (MarketAlarmLog.id, MarketAlarmLog.market_id, Market.name.label('market_name'))
+    + _ALARM_LOG_RESULT_COLUMNS + _ALARM_LOG_WEATHER_COLUMNS,
+    joins=_ALARM_LOG_MARKET_JOIN
+)
+
+# MarketAlarmLog.to_dict()와 같은 항목 (관리자/사용자 알림 이력, 상세 조회)
+ALARM_LOG_DETAIL = ListingProjection(
+    MarketAlarmLog,
+    (MarketAlarmLog.id, MarketAlarmLog.market_id, Market.name.label('market_name'))
+    + _ALARM_LOG_RESULT_COLUMNS + (MarketAlarmLog.weather_data,) + _ALARM_LOG_WEATHER_COLUMNS,
+    joins=_ALARM_LOG_MARKET_JOIN
+)
+
+# 특정 시장의 알림 이력 (시장 정보는 응답 상단에 한 번만)
+MARKET_ALARM_LOG_LIST = ListingProjection(
+    MarketAlarmLog,
+    (MarketAlarmLog.id,) + _ALARM_LOG_RESULT_COLUMNS + _ALARM_LOG_WEATHER_COLUMNS
+)
+
+# 신고 내역 (MarketReport.to_dict()와 같은 항목)
+REPORT_LIST = ListingProjection(
+    MarketReport,
+    (
+        MarketReport.id,
+        MarketReport.user_id,
+        User.name.label('user_name'),
+        MarketReport.market_id,
+        Market.name.label('market_name'),
+        MarketReport.report_type,
+        MarketReport.description,
+        MarketReport.image_path,
+        MarketReport.status,
+        MarketReport.created_at,
+        MarketReport.resolved_at,
+    ),
+    joins=(
+        (User, User.id == MarketReport.user_id),
+        (Market, Market.id == MarketReport.market_id),
+    ),
+    defaults={'user_name': 'Unknown', 'market_name': '알 수 없음'}
+)
@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+시장 위치 인덱스 (가까운 시장 조회)
+
+활성 시장 중 위경도가 있는 시장을 위경도 격자 칸(MARKET_GEO_CELL_DEGREES)별로 묶은
+격자 해시를 메모리에 두고, 가까운 시장은 조회 지점의 칸부터 한 바퀴씩 넓혀 가며 후보를 모아
+numpy로 한 번에 하버사인 거리를 계산합니다. 찾은 k번째 거리보다 아직 보지 않은 칸까지의
+최소 거리가 멀면 더 넓히지 않습니다.
+
+인덱스 구성과 시장 변경 반영은 market_index를 따릅니다. 커밋된 변경은 좌표 목록에 바로
+반영하고, 배열/격자 해시는 다음 조회 때 다시 만듭니다. (DB 조회 없이 메모리에서 재구성)
+
+환경변수:
+    MARKET_GEO_CELL_DEGREES  격자 칸 크기 (기본 0.1도, 약 11km)
+"""
+
+import os
+import math
+import logging
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from database import db
+from market_index import MarketChange, MarketIndex, register_market_index
+from models import Market
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+
+MARKET_GEO_CELL_DEGREES = float(os.environ.get('MARKET_GEO_CELL_DEGREES', '0.1'))
+
+# 이보다 많은 바퀴를 넓혀야 하면 전체 시장을 한 번에 계산
+MAX_SEARCH_RINGS = 30
+
+
+def haversine_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """한 지점에서 여러 지점까지의 하버사인 거리 (km, 위경도는 도 단위)"""
+    lat1 = math.radians(lat)
+    lats2 = np.radians(lats)
+    dlat = lats2 - lat1
+    dlon = np.radians(lons) - math.radians(lon)
+    a = np.sin(dlat * 0.5) ** 2 + math.cos(lat1) * np.cos(lats2) * np.sin(dlon * 0.5) ** 2
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class NearbyMarket(NamedTuple):
+    market_id: int
+    distance_km: float
+
+
+class _GeoData(NamedTuple):
+    ids: np.ndarray
+    lats: np.ndarray
+    lons: np.ndarray
+    # (위도 칸, 경도 칸) -> 배열 위치
+    cells: Dict[Tuple[int, int], np.ndarray]
+
+
+def _empty_data() -> _GeoData:
+    return _GeoData(np.empty(0, dtype=np.int64), np.empty(0), np.empty(0), {})
+
+
+class MarketGeoIndex(MarketIndex):
+    """활성 시장 위경도 격자 해시"""
+
+    name = '시장 위치'
+
+    def __init__(self, cell_degrees: float = 0.1, **kwargs):
+        """
+        Args:
+            cell_degrees: 격자 칸 크기 (도)
+        """
+        super().__init__(**kwargs)
+        self.cell_degrees = cell_degrees
+        # 시장 ID -> (위도, 경도), 커밋된 변경을 바로 반영하는 원본
+        self._points: Dict[int, Tuple[float, float]] = {}
+        self._data = _empty_data()
+        self._dirty = False
+
+    @property
+    def size(self) -> int:
+        return len(self._points)
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return int(math.floor(lat / self.cell_degrees)), int(math.floor(lon / self.cell_degrees))
+
+    def _load_rows(self):
+        # 좌표 컬럼만 조회
+        return db.session.query(Market.id, Market.latitude, Market.longitude).filter(
+            Market.is_active == True,
+            Market.latitude.isnot(None),
+            Market.longitude.isnot(None)
+        ).all()
+
+    def _build(self, rows) -> Dict[int, Tuple[float, float]]:
+        return {market_id: (float(lat), float(lon)) for market_id, lat, lon in rows}
+
+    def _install(self, points: Dict[int, Tuple[float, float]]):
+        self._points = points
+        self._data = self._build_arrays(points)
+        self._dirty = False
+
+    def _apply(self, changes: List[MarketChange], deleted_ids: List[int]):
+        for change in changes:
+            if change.is_active and change.latitude is not None and change.longitude is not None:
+                self._points[change.id] = (float(change.latitude), float(change.longitude))
+            else:
+                self._points.pop(change.id, None)
+        for market_id in deleted_ids:
+            self._points.pop(market_id, None)
+        self._dirty = True
+
+    def _build_arrays(self, points: Dict[int, Tuple[float, float]]) -> _GeoData:
+        """좌표 목록으로 배열과 격자 해시 생성 (칸 순서로 정렬해 칸마다 연속 구간)"""
+        if not points:
+            return _empty_data()
+
+        ids = np.fromiter(points.keys(), dtype=np.int64, count=len(points))
+        coords = np.array(list(points.values()), dtype=np.float64)
+        lats, lons = coords[:, 0], coords[:, 1]
+
+        cell_lat = np.floor(lats / self.cell_degrees).astype(np.int64)
+        cell_lon = np.floor(lons / self.cell_degrees).astype(np.int64)
+        order = np.lexsort((cell_lon, cell_lat))
+        ids, lats, lons = ids[order], lats[order], lons[order]
+        cell_lat, cell_lon = cell_lat[order], cell_lon[order]
+
+        # 칸이 바뀌는 위치로 구간 나누기
+        boundaries = np.flatnonzero((np.diff(cell_lat) != 0) | (np.diff(cell_lon) != 0)) + 1
+        starts = np.concatenate(([0], boundaries))
+        ends = np.concatenate((boundaries, [len(ids)]))
+        cells = {
+            (int(cell_lat[start]), int(cell_lon[start])): np.arange(start, end)
+            for start, end in zip(starts, ends)
+        }
+        return _GeoData(ids, lats, lons, cells)
+
+    def _snapshot(self) -> _GeoData:
+        """조회용 배열 (구성/변경 확인 후, 커밋된 변경이 있으면 메모리에서 재구성)"""
+        self.ensure_built()
+        with self._lock:
+            if self._dirty:
+                self._data = self._build_arrays(self._points)
+                self._dirty = False
+            return self._data
+
+    def _ring_positions(self, data: _GeoData, center: Tuple[int, int], ring: int) -> List[np.ndarray]:
+        """중심 칸에서 ring번째 바퀴에 있는 칸들의 배열 위치"""
+        lat_cell, lon_cell = center
+        found = []
+        for d_lat in range(-ring, ring + 1):
+            step = 1 if abs(d_lat) == ring else 2 * ring
+            for d_lon in range(-ring, ring + 1, max(1, step)):
+                positions = data.cells.get((lat_cell + d_lat, lon_cell + d_lon))
+                if positions is not None:
+                    found.append(positions)
+        return found
+
+    def _searched_radius_km(self, lat: float, ring: int) -> float:
+        """ring번째 바퀴까지 확인했을 때 확인하지 않은 칸까지의 최소 거리 (km, 보수적으로)"""
+        margin = ring * self.cell_degrees
+        edge_lat = min(90.0, abs(lat) + margin + self.cell_degrees)
+        # 경도 방향이 더 가까우므로 가장 높은 위도에서 경도 margin만큼 떨어진 자오선까지의 거리
+        sin_distance = math.cos(math.radians(edge_lat)) * math.sin(math.radians(min(margin, 90.0)))
+        return EARTH_RADIUS_KM * math.asin(max(0.0, min(1.0, sin_distance)))
+
+    def nearest(self, lat: float, lon: float, k: int = 5,
+                radius_km: Optional[float] = None) -> List[NearbyMarket]:
+        """
+        가까운 순으로 최대 k개 시장
+
+        Args:
+            lat, lon: 조회 지점 (도)
+            k: 최대 개수
+            radius_km: 이 거리 안의 시장만 (None이면 제한 없음)
+        """
+        data = self._snapshot()
+        if k <= 0 or len(data.ids) == 0:
+            return []
+
+        center = self._cell(lat, lon)
+        chunks: List[np.ndarray] = []
+        candidates = 0
+        ring = 0
+        while True:
+            found = self._ring_positions(data, center, ring)
+            chunks.extend(found)
+            candidates += sum(len(positions) for positions in found)
+
+            searched_km = self._searched_radius_km(lat, ring)
+            if radius_km is not None and searched_km >= radius_km:
+                break
+            if candidates >= k:
+                positions = np.concatenate(chunks)
+                distances = haversine_km(lat, lon, data.lats[positions], data.lons[positions])
+                if np.partition(distances, k - 1)[k - 1] <= searched_km:
+                    break
+            if ring >= MAX_SEARCH_RINGS or candidates == len(data.ids):
+                # 주변이 비어 있으면 전체 시장으로 계산
+                chunks = [np.arange(len(data.ids))]
+                break
+            ring += 1
+
+        positions = np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int64)
+        if len(positions) == 0:
+            return []
+        distances = haversine_km(lat, lon, data.lats[positions], data.lons[positions])
+        if radius_km is not None:
+            within = distances <= radius_km
+            positions, distances = positions[within], distances[within]
+
+        count = min(k, len(positions))
+        if count == 0:
+            return []
+        top = np.argpartition(distances, count - 1)[:count] if count < len(positions) else np.arange(count)
+        top = top[np.lexsort((data.ids[positions[top]], distances[top]))]
+        return [NearbyMarket(int(data.ids[positions[i]]), float(distances[i])) for i in top]
+
+
+# 프로세스 전체가 공유하는 시장 위치 인덱스
+market_geo_index = register_market_index(MarketGeoIndex(cell_degrees=MARKET_GEO_CELL_DEGREES))
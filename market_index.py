@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+시장 메모리 인덱스 공통 (검색 인덱스, 위치 인덱스)
+
+시장 테이블은 자주 바뀌지 않으므로 검색/위치 조회용 인덱스를 프로세스 메모리에 두고,
+다음 경우에 갱신합니다.
+
+- 첫 사용(또는 앱 시작) 때 DB에서 구성
+- 세션 커밋 시 변경된 시장만 등록된 모든 인덱스에 반영 (flush 때 모아 두었다가 커밋 후 적용)
+  변경된 시장의 이전/새 격자는 날씨 조회 캐시도 무효화 (시장명/활성 여부가 응답에 들어가므로)
+- 세션을 거치지 않는 대량 변경(query.update)은 mark_stale() 후 다음 사용 때 재구성
+- 다른 프로세스의 데이터 적재는 MARKET_INDEX_REFRESH_SECONDS마다 시장 수/최대 ID/최종 수정
+  시각을 확인해 바뀌었으면 재구성
+
+환경변수:
+    MARKET_INDEX_REFRESH_SECONDS  DB 변경 확인 주기 (기본 60초, 0이면 확인 안 함)
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Any, Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import event, func, inspect
+
+from database import db
+from models import Market
+from weather_cache import weather_response_cache
+
+logger = logging.getLogger(__name__)
+
+MARKET_INDEX_REFRESH_SECONDS = float(os.environ.get('MARKET_INDEX_REFRESH_SECONDS', '60'))
+
+
+class MarketChange(NamedTuple):
+    """커밋된 시장 행 값 (인덱스 반영용)"""
+    id: int
+    name: Optional[str]
+    location: Optional[str]
+    latitude: Optional[float]
+    longitude: Optional[float]
+    nx: Optional[int]
+    ny: Optional[int]
+    is_active: bool
+
+    @classmethod
+    def from_market(cls, market: Market) -> 'MarketChange':
+        return cls(market.id, market.name, market.location, market.latitude, market.longitude,
+                   market.nx, market.ny, bool(market.is_active))
+
+
+class MarketIndex:
+    """시장 메모리 인덱스 기본 클래스 (구성/무효화/변경 확인)"""
+
+    name = 'market'
+
+    def __init__(self, refresh_seconds: float = MARKET_INDEX_REFRESH_SECONDS):
+        """
+        Args:
+            refresh_seconds: DB 변경 확인 주기 (시장 수/최종 수정 시각이 바뀌었을 때만 재구성)
+        """
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.RLock()
+        self._signature = None
+        self._checked_at: Optional[float] = None
+        self._stale = True
+
+    @property
+    def built(self) -> bool:
+        return not self._stale and self._checked_at is not None
+
+    def mark_stale(self):
+        """다음 사용 때 DB에서 다시 만들도록 표시 (query.update 같은 대량 변경 후 호출)"""
+        with self._lock:
+            self._stale = True
+
+    @staticmethod
+    def _db_signature():
+        """시장 테이블 변경 확인용 (행 수, 최대 ID, 최종 수정 시각) 집계 1회"""
+        return tuple(db.session.query(
+            func.count(Market.id), func.max(Market.id), func.max(Market.updated_at)
+        ).one())
+
+    def ensure_built(self):
+        """처음이거나 무효화됐으면 구성, 확인 주기가 지났으면 DB 변경이 있을 때만 재구성"""
+        if not self.built:
+            self.rebuild()
+            return
+        if self.refresh_seconds <= 0 or time.monotonic() - self._checked_at < self.refresh_seconds:
+            return
+
+        # 다른 프로세스의 적재 등 세션 이벤트로 반영되지 않은 변경 확인
+        signature = self._db_signature()
+        if signature != self._signature:
+            self.rebuild(signature)
+        else:
+            self._checked_at = time.monotonic()
+
+    def rebuild(self, signature=None) -> int:
+        """DB에서 새 인덱스를 만든 뒤 교체"""
+        if signature is None:
+            signature = self._db_signature()
+        rows = self._load_rows()
+        data = self._build(rows)
+
+        with self._lock:
+            self._install(data)
+            self._signature = signature
+            self._checked_at = time.monotonic()
+            self._stale = False
+        logger.info(f"{self.name} 인덱스 구성: {len(rows)}개 시장")
+        return len(rows)
+
+    def apply_changes(self, changes: Iterable[MarketChange], deleted_ids: Iterable[int]):
+        """
+        커밋된 시장 변경 반영 (아직 구성되지 않았으면 첫 사용 때 전체 구성)
+
+        Args:
+            changes: 추가/수정된 시장 값 (비활성 시장은 인덱스에서 제거)
+            deleted_ids: 삭제된 시장 ID 목록
+        """
+        with self._lock:
+            if not self.built:
+                return
+            self._apply(list(changes), list(deleted_ids))
+
+    def _load_rows(self) -> List[Any]:
+        """인덱스에 넣을 시장 행 조회"""
+        raise NotImplementedError
+
+    def _build(self, rows: List[Any]) -> Any:
+        """조회한 행으로 새 인덱스 데이터 생성 (잠금 밖에서 실행)"""
+        raise NotImplementedError
+
+    def _install(self, data: Any):
+        """새 인덱스 데이터로 교체 (잠금 안에서 실행)"""
+        raise NotImplementedError
+
+    def _apply(self, changes: List[MarketChange], deleted_ids: List[int]):
+        """변경된 시장 반영 (잠금 안에서 실행)"""
+        raise NotImplementedError
+
+
+# 커밋 시 변경을 반영할 인덱스
+_market_indexes: List[MarketIndex] = []
+
+
+def _market_grids(market: Market) -> List[tuple]:
+    """시장의 현재 격자와 이번 flush 전 격자 (좌표가 바뀐 경우)"""
+    state = inspect(market)
+    nx_history = state.attrs.nx.history
+    ny_history = state.attrs.ny.history
+    grids = {(market.nx, market.ny)}
+    if nx_history.deleted or ny_history.deleted:
+        grids.add(((nx_history.deleted or [market.nx])[0], (ny_history.deleted or [market.ny])[0]))
+    return [grid for grid in grids if None not in grid]
+
+
+def invalidate_market_weather(grids: Iterable[tuple]):
+    """시장 격자의 날씨 조회 캐시 무효화 (세션을 거치지 않는 시장 대량 변경 후 호출)"""
+    for nx, ny in set(grids):
+        if nx is not None and ny is not None:
+            weather_response_cache.invalidate(nx, ny)
+
+
+def _collect_market_changes(session, flush_context):
+    """flush된 시장 변경을 세션에 모아 둠 (커밋 후 인덱스와 날씨 조회 캐시에 반영)"""
+    changes = session.info.setdefault('market_index_changes', {'changes': {}, 'deleted': set(), 'grids': set()})
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Market) and obj.id is not None:
+            changes['changes'][obj.id] = MarketChange.from_market(obj)
+            changes['deleted'].discard(obj.id)
+            changes['grids'].update(_market_grids(obj))
+    for obj in session.deleted:
+        if isinstance(obj, Market) and obj.id is not None:
+            changes['changes'].pop(obj.id, None)
+            changes['deleted'].add(obj.id)
+            changes['grids'].update(_market_grids(obj))
+
+
+def _apply_market_changes(session):
+    changes = session.info.pop('market_index_changes', None)
+    if not changes or not (changes['changes'] or changes['deleted']):
+        return
+    # 캐시된 응답에 이전 시장명/비활성 시장이 남지 않도록
+    invalidate_market_weather(changes['grids'])
+    for index in _market_indexes:
+        try:
+            index.apply_changes(changes['changes'].values(), changes['deleted'])
+        except Exception as e:
+            logger.error(f"{index.name} 인덱스 갱신 실패, 다음 사용 때 재구성: {e}")
+            index.mark_stale()
+
+
+def _discard_market_changes(session):
+    # 세이브포인트 롤백이면 바깥 트랜잭션의 변경까지 버려지므로 다음 사용 때 전체 재구성
+    if session.info.pop('market_index_changes', None):
+        for index in _market_indexes:
+            index.mark_stale()
+
+
+def register_market_index(index: MarketIndex) -> MarketIndex:
+    """커밋 시 시장 변경을 반영할 인덱스 등록 (세션 이벤트는 한 번만 등록)"""
+    if not event.contains(db.session, 'after_flush', _collect_market_changes):
+        event.listen(db.session, 'after_flush', _collect_market_changes)
+        event.listen(db.session, 'after_commit', _apply_market_changes)
+        event.listen(db.session, 'after_rollback', _discard_market_changes)
+    if index not in _market_indexes:
+        _market_indexes.append(index)
+    return index
+
+
+def mark_market_indexes_stale():
+    """등록된 모든 시장 인덱스 무효화 (query.update 같은 대량 변경 후 호출)"""
+    for index in _market_indexes:
+        index.mark_stale()
@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+지도용 시장 위치/알림 상태와 확대 수준별 군집
+
+지도 화면은 보이는 영역(bounding box) 안의 시장을 알림 상태와 함께 한 번에 받아야 하므로
+페이지 단위의 /api/markets로는 만들 수 없습니다. 좌표가 있는 활성 시장과 최근 알림 상태를
+위도 순으로 정렬한 배열로 메모리에 두고, 영역 조회는 위도 구간을 이분 탐색한 뒤 경도만
+걸러냅니다.
+
+군집은 웹 메르카토르 좌표에서 확대 수준(zoom)마다 MARKET_MAP_CLUSTER_PIXELS 픽셀 격자로
+미리 계산해 두므로, 시장이 밀집한 도시 화면도 수천 개의 표식 대신 몇 개의 군집으로 응답합니다.
+MARKET_MAP_MAX_CLUSTER_ZOOM보다 확대하면 군집 없이 시장별 표식을 반환합니다.
+
+알림 상태는 알림 실행(check_all_markets_with_all_conditions)이 끝날 때마다 다시 계산하며,
+시장 변경은 market_index를 따라 다음 조회 때 반영됩니다.
+
+환경변수:
+    MARKET_MAP_ALERT_HOURS       최근 알림으로 보는 시간 (기본 24시간)
+    MARKET_MAP_CLUSTER_PIXELS    군집 격자 크기 (기본 64픽셀)
+    MARKET_MAP_MIN_ZOOM          군집을 계산하는 최소 확대 수준 (기본 5, 그보다 작으면 5로 계산)
+    MARKET_MAP_MAX_CLUSTER_ZOOM  군집을 계산하는 최대 확대 수준 (기본 14)
+    MARKET_MAP_MAX_MARKERS       한 번에 반환하는 최대 시장 표식 수 (기본 2000)
+"""
+
+import os
+import math
+import logging
+import itertools
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func
+
+from database import db
+from market_index import MarketChange, MarketIndex, register_market_index
+from models import Market, MarketAlarmLog
+
+logger = logging.getLogger(__name__)
+
+MARKET_MAP_ALERT_HOURS = float(os.environ.get('MARKET_MAP_ALERT_HOURS', '24'))
+MARKET_MAP_CLUSTER_PIXELS = int(os.environ.get('MARKET_MAP_CLUSTER_PIXELS', '64'))
+MARKET_MAP_MIN_ZOOM = int(os.environ.get('MARKET_MAP_MIN_ZOOM', '5'))
+MARKET_MAP_MAX_CLUSTER_ZOOM = int(os.environ.get('MARKET_MAP_MAX_CLUSTER_ZOOM', '14'))
+MARKET_MAP_MAX_MARKERS = int(os.environ.get('MARKET_MAP_MAX_MARKERS', '2000'))
+
+# 웹 메르카토르가 표현하는 최대 위도
+MAX_MERCATOR_LAT = 85.05112878
+TILE_SIZE = 256
+
+
+def mercator_xy(lats: np.ndarray, lons: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """위경도를 0~1 범위의 웹 메르카토르 좌표로"""
+    lat_rad = np.radians(np.clip(lats, -MAX_MERCATOR_LAT, MAX_MERCATOR_LAT))
+    x = (lons + 180.0) / 360.0
+    y = (1.0 - np.log(np.tan(lat_rad) + 1.0 / np.cos(lat_rad)) / math.pi) / 2.0
+    return x, y
+
+
+class MapBounds(NamedTuple):
+    south: float
+    west: float
+    north: float
+    east: float
+
+
+class _ZoomClusters(NamedTuple):
+    """한 확대 수준의 군집 (중심 위도 순)"""
+    lats: np.ndarray
+    lons: np.ndarray
+    counts: np.ndarray
+    alert_counts: np.ndarray
+    # 알림 유형 -> 군집별 해당 유형 알림 시장 수
+    type_counts: Dict[str, np.ndarray]
+    # 시장이 1개인 군집의 시장 배열 위치 (아니면 -1)
+    single: np.ndarray
+
+
+class _MapData(NamedTuple):
+    """지도 스냅숏 (시장 배열은 위도 순)"""
+    version: int
+    built_at: datetime
+    ids: np.ndarray
+    names: List[str]
+    lats: np.ndarray
+    lons: np.ndarray
+    alert_types: List[Tuple[str, ...]]
+    last_alert_at: List[Optional[datetime]]
+    zooms: Dict[int, _ZoomClusters]
+
+
+_versions = itertools.count(1)
+
+
+def _empty_data() -> _MapData:
+    return _MapData(0, datetime.utcnow(), np.empty(0, dtype=np.int64), [], np.empty(0), np.empty(0), [], [], {})
+
+
+def _lat_slice(lats: np.ndarray, bounds: MapBounds) -> slice:
+    """위도 순 배열에서 영역의 위도 구간 (이분 탐색)"""
+    return slice(int(np.searchsorted(lats, bounds.south, side='left')),
+                 int(np.searchsorted(lats, bounds.north, side='right')))
+
+
+def _lon_mask(lons: np.ndarray, bounds: MapBounds) -> np.ndarray:
+    if bounds.west <= bounds.east:
+        return (lons >= bounds.west) & (lons <= bounds.east)
+    # 날짜 변경선을 넘는 영역
+    return (lons >= bounds.west) | (lons <= bounds.east)
+
+
+class MarketMapIndex(MarketIndex):
+    """지도용 시장 배열과 확대 수준별 군집"""
+
+    name = '시장 지도'
+
+    def __init__(self, alert_hours: float = 24, cluster_pixels: int = 64,
+                 min_zoom: int = 5, max_cluster_zoom: int = 14, **kwargs):
+        """
+        Args:
+            alert_hours: 최근 알림으로 보는 시간
+            cluster_pixels: 군집 격자 크기 (픽셀)
+            min_zoom, max_cluster_zoom: 군집을 미리 계산하는 확대 수준 범위
+        """
+        super().__init__(**kwargs)
+        self.alert_hours = alert_hours
+        self.cluster_pixels = cluster_pixels
+        self.min_zoom = min_zoom
+        self.max_cluster_zoom = max_cluster_zoom
+        self._data = _empty_data()
+
+    @property
+    def size(self) -> int:
+        return len(self._data.ids)
+
+    def _load_rows(self):
+        """좌표가 있는 활성 시장과 최근 알림 유형 (시장 1회, 알림 집계 1회)"""
+        markets = db.session.query(Market.id, Market.name, Market.latitude, Market.longitude).filter(
+            Market.is_active == True,
+            Market.latitude.isnot(None),
+            Market.longitude.isnot(None)
+        ).all()
+
+        cutoff = datetime.utcnow() - timedelta(hours=self.alert_hours)
+        alerts: Dict[int, Dict[str, datetime]] = {}
+        for market_id, alert_type, created_at in db.session.query(
+            MarketAlarmLog.market_id, MarketAlarmLog.alert_type, func.max(MarketAlarmLog.created_at)
+        ).filter(
+            MarketAlarmLog.created_at >= cutoff
+        ).group_by(MarketAlarmLog.market_id, MarketAlarmLog.alert_type):
+            alerts.setdefault(market_id, {})[alert_type] = created_at
+
+        return [(market_id, name, float(lat), float(lon), alerts.get(market_id, {}))
+                for market_id, name, lat, lon in markets]
+
+    def _build(self, rows) -> _MapData:
+        if not rows:
+            return _empty_data()
+
+        rows = sorted(rows, key=lambda row: (row[2], row[0]))
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        lats = np.array([row[2] for row in rows], dtype=np.float64)
+        lons = np.array([row[3] for row in rows], dtype=np.float64)
+        alert_types = [tuple(sorted(row[4])) for row in rows]
+        last_alert_at = [max(row[4].values()) if row[4] else None for row in rows]
+
+        type_masks = {
+            alert_type: np.array([alert_type in types for types in alert_types], dtype=np.float64)
+            for alert_type in sorted({t for types in alert_types for t in types})
+        }
+        alerted = np.array([bool(types) for types in alert_types], dtype=np.float64)
+
+        x, y = mercator_xy(lats, lons)
+        zooms = {}
+        for zoom in range(self.min_zoom, self.max_cluster_zoom + 1):
+            zooms[zoom] = self._cluster(zoom, x, y, lats, lons, alerted, type_masks)
+
+        return _MapData(next(_versions), datetime.utcnow(), ids, [row[1] for row in rows],
+                        lats, lons, alert_types, last_alert_at, zooms)
+
+    def _cluster(self, zoom: int, x: np.ndarray, y: np.ndarray, lats: np.ndarray, lons: np.ndarray,
+                 alerted: np.ndarray, type_masks: Dict[str, np.ndarray]) -> _ZoomClusters:
+        """확대 수준 하나의 픽셀 격자 군집 (격자 칸별 시장 수, 평균 위치, 알림 수)"""
+        cells_per_side = max(1, (TILE_SIZE << zoom) // self.cluster_pixels)
+        cell_x = np.minimum((x * cells_per_side).astype(np.int64), cells_per_side - 1)
+        cell_y = np.minimum((y * cells_per_side).astype(np.int64), cells_per_side - 1)
+        _, members = np.unique(cell_y * cells_per_side + cell_x, return_inverse=True)
+        members = members.ravel()
+
+        counts = np.bincount(members)
+        cluster_lats = np.bincount(members, weights=lats) / counts
+        cluster_lons = np.bincount(members, weights=lons) / counts
+        alert_counts = np.bincount(members, weights=alerted).astype(np.int64)
+        type_counts = {alert_type: np.bincount(members, weights=mask).astype(np.int64)
+                       for alert_type, mask in type_masks.items()}
+
+        single = np.full(len(counts), -1, dtype=np.int64)
+        single[members] = np.arange(len(members))
+        single[counts != 1] = -1
+
+        order = np.argsort(cluster_lats, kind='stable')
+        return _ZoomClusters(cluster_lats[order], cluster_lons[order], counts[order], alert_counts[order],
+                             {alert_type: values[order] for alert_type, values in type_counts.items()},
+                             single[order])
+
+    def _install(self, data: _MapData):
+        self._data = data
+
+    def _apply(self, changes: List[MarketChange], deleted_ids: List[int]):
+        # 군집을 다시 계산해야 하므로 다음 조회 때 전체 재구성
+        self._stale = True
+
+    def snapshot(self) -> _MapData:
+        self.ensure_built()
+        return self._data
+
+    def _marker(self, data: _MapData, position: int) -> Dict[str, Any]:
+        last_alert_at = data.last_alert_at[position]
+        return {
+            'type': 'market',
+            'id': int(data.ids[position]),
+            'name': data.names[position],
+            'lat': float(data.lats[position]),
+            'lon': float(data.lons[position]),
+            'alert_types': list(data.alert_types[position]),
+            'last_alert_at': last_alert_at.isoformat() if last_alert_at else None
+        }
+
+    def query(self, bounds: MapBounds, zoom: int, max_markers: int = 2000) -> Dict[str, Any]:
+        """
+        영역 안의 군집 또는 시장 표식
+
+        Args:
+            bounds: 지도 영역
+            zoom: 확대 수준 (max_cluster_zoom보다 크면 시장별 표식)
+            max_markers: 시장별 표식 최대 개수
+        """
+        data = self.snapshot()
+        clusters = data.zooms.get(max(zoom, self.min_zoom)) if zoom <= self.max_cluster_zoom else None
+
+        items = []
+        truncated = False
+        if clusters is not None:
+            window = _lat_slice(clusters.lats, bounds)
+            positions = np.flatnonzero(_lon_mask(clusters.lons[window], bounds)) + window.start
+            for position in positions:
+                if clusters.single[position] >= 0:
+                    items.append(self._marker(data, int(clusters.single[position])))
+                    continue
+                items.append({
+                    'type': 'cluster',
+                    'lat': round(float(clusters.lats[position]), 6),
+                    'lon': round(float(clusters.lons[position]), 6),
+                    'count': int(clusters.counts[position]),
+                    'alert_count': int(clusters.alert_counts[position]),
+                    'alert_types': {alert_type: int(values[position])
+                                    for alert_type, values in clusters.type_counts.items() if values[position]}
+                })
+        else:
+            window = _lat_slice(data.lats, bounds)
+            positions = np.flatnonzero(_lon_mask(data.lons[window], bounds)) + window.start
+            truncated = len(positions) > max_markers
+            items = [self._marker(data, int(position)) for position in positions[:max_markers]]
+
+        return {
+            'status': 'success',
+            'zoom': zoom,
+            'bounds': bounds._asdict(),
+            'clustered': clusters is not None,
+            'count': len(items),
+            'market_count': sum(item.get('count', 1) for item in items),
+            'truncated': truncated,
+            'items': items,
+            'generated_at': data.built_at.isoformat()
+        }
+
+
+def refresh_market_map() -> int:
+    """알림 상태와 군집 다시 계산 (알림 실행이 끝난 뒤 호출, 실패해도 예외를 던지지 않음)"""
+    try:
+        return market_map_index.rebuild()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"시장 지도 갱신 실패: {e}")
+        market_map_index.mark_stale()
+        return 0
+
+
+# 프로세스 전체가 공유하는 시장 지도
+market_map_index = register_market_index(MarketMapIndex(
+    alert_hours=MARKET_MAP_ALERT_HOURS,
+    cluster_pixels=MARKET_MAP_CLUSTER_PIXELS,
+    min_zoom=MARKET_MAP_MIN_ZOOM,
+    max_cluster_zoom=MARKET_MAP_MAX_CLUSTER_ZOOM
+))
@@ -0,0 +1,346 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+시장 이름/위치 검색 인덱스
+
+Market.search_by_name은 name LIKE '%검색어%'로 시장 테이블 전체를 훑고 순위도 없었습니다.
+활성 시장의 이름/위치를 메모리의 n-gram 역색인(1·2글자 → 시장 ID 집합)으로 만들어 두고,
+검색어의 n-gram 목록을 교집합해 후보를 좁힌 뒤 순위를 매깁니다.
+
+- 공백/대소문자를 무시합니다. ('동대문 시장' == '동대문시장')
+- 초성 검색을 지원합니다. ('ㄷㄷㅁ', 'ㄷ대ㅁ' → 동대문시장)
+- 순위: 이름 일치 > 이름 접두어 > 이름 포함(앞쪽일수록) > 초성 접두어 > 초성 포함 > 위치 포함,
+  같은 순위에서는 이름이 짧은 시장이 먼저입니다.
+
+인덱스 구성과 시장 변경 반영은 market_index를 따릅니다.
+
+환경변수:
+    MARKET_SEARCH_CACHE_SIZE  검색 결과 캐시 항목 수 (기본 512)
+"""
+
+import os
+import heapq
+import logging
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from database import db
+from market_index import MarketChange, MarketIndex, register_market_index
+from models import Market
+
+logger = logging.getLogger(__name__)
+
+MARKET_SEARCH_CACHE_SIZE = int(os.environ.get('MARKET_SEARCH_CACHE_SIZE', '512'))
+
+# 한글 음절의 초성 (유니코드 순서), 검색어 입력에 쓰이는 호환용 자모
+CHOSEONG = 'ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ'
+_CHOSEONG_SET = frozenset(CHOSEONG)
+_HANGUL_BASE = 0xAC00
+_HANGUL_LAST = 0xD7A3
+_SYLLABLES_PER_CHOSEONG = 21 * 28
+
+# 순위 구간 (작을수록 먼저)
+RANK_EXACT = 0
+RANK_NAME_PREFIX = 1
+RANK_NAME = 2
+RANK_CHOSEONG_PREFIX = 3
+RANK_CHOSEONG = 4
+RANK_LOCATION = 5
+
+MATCH_TYPES = {
+    RANK_EXACT: 'exact',
+    RANK_NAME_PREFIX: 'prefix',
+    RANK_NAME: 'name',
+    RANK_CHOSEONG_PREFIX: 'choseong',
+    RANK_CHOSEONG: 'choseong',
+    RANK_LOCATION: 'location'
+}
+
+
+def normalize(text: Optional[str]) -> str:
+    """검색용 정규화 (NFC 결합, 소문자, 공백 제거)"""
+    if not text:
+        return ''
+    return ''.join(unicodedata.normalize('NFC', text).lower().split())
+
+
+def to_choseong(text: str) -> str:
+    """한글 음절을 초성으로 바꾼 문자열 (그 외 문자는 그대로, 길이 유지)"""
+    chars = []
+    for char in text:
+        code = ord(char)
+        if _HANGUL_BASE <= code <= _HANGUL_LAST:
+            chars.append(CHOSEONG[(code - _HANGUL_BASE) // _SYLLABLES_PER_CHOSEONG])
+        else:
+            chars.append(char)
+    return ''.join(chars)
+
+
+def has_choseong(text: str) -> bool:
+    return any(char in _CHOSEONG_SET for char in text)
+
+
+def _grams(text: str) -> Set[str]:
+    """1글자, 2글자 n-gram"""
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+def _query_grams(text: str) -> Set[str]:
+    """후보를 좁힐 검색어 n-gram (2글자 이상이면 2글자 n-gram만)"""
+    if len(text) < 2:
+        return set(text)
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def _find_mixed(query: str, name: str, name_choseong: str) -> int:
+    """
+    초성이 섞인 검색어의 위치 (없으면 -1)
+
+    검색어의 초성 글자는 이름 글자의 초성과, 나머지 글자는 이름 글자와 같아야 합니다.
+    """
+    query_choseong = to_choseong(query)
+    start = name_choseong.find(query_choseong)
+    while start != -1:
+        if all(q in _CHOSEONG_SET or q == name[start + i] for i, q in enumerate(query)):
+            return start
+        start = name_choseong.find(query_choseong, start + 1)
+    return -1
+
+
+class SearchResult(NamedTuple):
+    market_id: int
+    match_type: str
+    rank: Tuple[int, int, int, int]
+
+
+class _Entry(NamedTuple):
+    market_id: int
+    name_key: str
+    name_choseong: str
+    location_key: str
+
+
+# 색인하는 필드 (역색인 이름 -> 항목 필드)
+FIELDS = ('name_key', 'name_choseong', 'location_key')
+
+
+def _match_position(field: str, query: str, entry: _Entry) -> int:
+    """항목 필드에서 검색어 위치 (없으면 -1)"""
+    if field == 'name_choseong':
+        return _find_mixed(query, entry.name_key, entry.name_choseong)
+    return getattr(entry, field).find(query)
+
+
+class _IndexData(NamedTuple):
+    entries: Dict[int, _Entry]
+    # 필드 -> n-gram -> 시장 ID 집합
+    grams: Dict[str, Dict[str, Set[int]]]
+
+
+class MarketSearchIndex(MarketIndex):
+    """활성 시장 이름/위치 n-gram 역색인 (초성 포함)"""
+
+    name = '시장 검색'
+
+    def __init__(self, cache_size: int = 512, **kwargs):
+        """
+        Args:
+            cache_size: 검색 결과 캐시 항목 수
+        """
+        super().__init__(**kwargs)
+        self.cache_size = max(0, cache_size)
+        self._data = _IndexData({}, {field: {} for field in FIELDS})
+        # (필드, n-gram) -> [(n-gram 첫 위치, 이름 길이, 시장 ID), ...] 정렬 목록 (필요할 때 생성)
+        self._sorted_postings: Dict[Tuple[str, str], List[Tuple[int, int, int]]] = {}
+        self._results: 'OrderedDict[Tuple[str, int], List[SearchResult]]' = OrderedDict()
+
+    @property
+    def size(self) -> int:
+        return len(self._data.entries)
+
+    def _load_rows(self):
+        # 이름/위치 컬럼만 조회
+        return db.session.query(Market.id, Market.name, Market.location).filter(Market.is_active == True).all()
+
+    def _build(self, rows) -> _IndexData:
+        data = _IndexData({}, {field: {} for field in FIELDS})
+        for market_id, name, location in rows:
+            self._add(data, market_id, name, location)
+        return data
+
+    def _install(self, data: _IndexData):
+        self._data = data
+        self._sorted_postings.clear()
+        self._results.clear()
+
+    def _add(self, data: _IndexData, market_id: int, name: str, location: Optional[str]):
+        name_key = normalize(name)
+        entry = _Entry(market_id, name_key, to_choseong(name_key), normalize(location))
+        data.entries[market_id] = entry
+        for field in FIELDS:
+            grams_map = data.grams[field]
+            for gram in _grams(getattr(entry, field)):
+                grams_map.setdefault(gram, set()).add(market_id)
+                self._sorted_postings.pop((field, gram), None)
+
+    def _remove(self, data: _IndexData, market_id: int):
+        entry = data.entries.pop(market_id, None)
+        if entry is None:
+            return
+        for field in FIELDS:
+            grams_map = data.grams[field]
+            for gram in _grams(getattr(entry, field)):
+                ids = grams_map.get(gram)
+                if ids is not None:
+                    ids.discard(market_id)
+                    if not ids:
+                        del grams_map[gram]
+                self._sorted_postings.pop((field, gram), None)
+
+    def _apply(self, changes: List[MarketChange], deleted_ids: List[int]):
+        for change in changes:
+            self._remove(self._data, change.id)
+            if change.is_active and change.name:
+                self._add(self._data, change.id, change.name, change.location)
+        for market_id in deleted_ids:
+            self._remove(self._data, market_id)
+        self._results.clear()
+
+    def _candidates(self, field: str, query: str) -> Set[int]:
+        """검색어 n-gram 역색인 목록의 교집합 (작은 목록부터)"""
+        grams_map = self._data.grams[field]
+        postings = []
+        for gram in _query_grams(query):
+            ids = grams_map.get(gram)
+            if not ids:
+                return set()
+            postings.append(ids)
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for ids in postings[1:]:
+            candidates &= ids
+            if not candidates:
+                break
+        return candidates
+
+    def _sorted_posting(self, field: str, gram: str) -> List[Tuple[int, int, int]]:
+        """n-gram 역색인 목록을 (n-gram 첫 위치, 이름 길이, 시장 ID) 순으로 정렬한 목록"""
+        key = (field, gram)
+        posting = self._sorted_postings.get(key)
+        if posting is None:
+            entries = self._data.entries
+            posting = sorted(
+                (getattr(entries[market_id], field).find(gram), len(entries[market_id].name_key), market_id)
+                for market_id in self._data.grams[field].get(gram, ())
+            )
+            self._sorted_postings[key] = posting
+        return posting
+
+    def _top_matches(self, field: str, query: str, limit: int, exclude: Set[int]) -> List[Tuple[int, int, int]]:
+        """
+        필드에서 검색어와 맞는 상위 limit개 (위치, 이름 길이, 시장 ID)
+
+        1~2글자 검색어는 n-gram 정렬 목록을 앞에서부터 훑고, n-gram 첫 위치가 이미 찾은
+        상위 limit개보다 뒤이면 멈춥니다. ('시장'처럼 흔한 검색어도 앞쪽 몇 개만 확인)
+        더 긴 검색어는 n-gram 교집합으로 후보를 좁힌 뒤 모두 확인합니다.
+        """
+        entries = self._data.entries
+        gram = to_choseong(query) if field == 'name_choseong' else query
+
+        if len(gram) <= 2:
+            top: List[Tuple[int, int, int]] = []  # 최대 힙 (부호 반전)
+            for lower_bound in self._sorted_posting(field, gram):
+                if len(top) >= limit and lower_bound > tuple(-v for v in top[0]):
+                    break
+                market_id = lower_bound[2]
+                if market_id in exclude:
+                    continue
+                position = _match_position(field, query, entries[market_id])
+                if position < 0:
+                    continue
+                key = (position, lower_bound[1], market_id)
+                if len(top) < limit:
+                    heapq.heappush(top, tuple(-v for v in key))
+                elif key < tuple(-v for v in top[0]):
+                    heapq.heapreplace(top, tuple(-v for v in key))
+            return sorted(tuple(-v for v in item) for item in top)
+
+        matches = []
+        for market_id in self._candidates(field, gram):
+            if market_id in exclude:
+                continue
+            entry = entries[market_id]
+            position = _match_position(field, query, entry)
+            if position >= 0:
+                matches.append((position, len(entry.name_key), market_id))
+        return heapq.nsmallest(limit, matches)
+
+    def _rank(self, query: str, limit: int) -> List[Tuple[int, int, int, int]]:
+        """순위 키 (순위 구간, 위치, 이름 길이, 시장 ID) 상위 limit개"""
+        if has_choseong(query):
+            # 초성이 섞인 검색어는 초성 문자열에서 찾고 글자별로 확인
+            return [(RANK_CHOSEONG_PREFIX if position == 0 else RANK_CHOSEONG, position, length, market_id)
+                    for position, length, market_id in self._top_matches('name_choseong', query, limit, set())]
+
+        ranked = []
+        for position, length, market_id in self._top_matches('name_key', query, limit, set()):
+            if position == 0:
+                tier = RANK_EXACT if length == len(query) else RANK_NAME_PREFIX
+            else:
+                tier = RANK_NAME
+            ranked.append((tier, position, length, market_id))
+
+        if len(ranked) < limit:
+            name_ids = {rank[3] for rank in ranked}
+            ranked.extend((RANK_LOCATION, position, length, market_id) for position, length, market_id
+                          in self._top_matches('location_key', query, limit - len(ranked), name_ids))
+        return ranked
+
+    def search(self, query: str, limit: int = 20) -> List[SearchResult]:
+        """
+        순위순 검색 결과 (인덱스가 없거나 오래됐으면 먼저 DB에서 구성)
+
+        Returns:
+            list: SearchResult(시장 ID, 일치 종류, 순위 키) 목록
+        """
+        query = normalize(query)
+        if not query or limit <= 0:
+            return []
+
+        self.ensure_built()
+        with self._lock:
+            cache_key = (query, limit)
+            cached = self._results.get(cache_key)
+            if cached is not None:
+                self._results.move_to_end(cache_key)
+                return cached
+
+            results = [SearchResult(rank[3], MATCH_TYPES[rank[0]], rank) for rank in self._rank(query, limit)]
+
+            if self.cache_size:
+                self._results[cache_key] = results
+                while len(self._results) > self.cache_size:
+                    self._results.popitem(last=False)
+            return results
+
+
+def search_markets(query: str, limit: int = 20) -> List[Tuple[Market, str]]:
+    """
+    검색 순위대로 (시장, 일치 종류) 목록 반환 (시장 행은 기본키로 한 번에 조회)
+    """
+    results = market_search_index.search(query, limit)
+    if not results:
+        return []
+
+    markets = {market.id: market for market in Market.query.filter(
+        Market.id.in_([result.market_id for result in results]),
+        Market.is_active == True
+    ).all()}
+    return [(markets[result.market_id], result.match_type) for result in results if result.market_id in markets]
+
+
+# 프로세스 전체가 공유하는 시장 검색 인덱스
+market_search_index = register_market_index(MarketSearchIndex(cache_size=MARKET_SEARCH_CACHE_SIZE))
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+시장별 FCM 주제(topic) 구독 관리
+
+주제 기반 전송 모드(ALERT_DELIVERY_MODE=topic)에서는 시장마다 FCM 주제를 하나 두고,
+관심 시장 추가/제거·알림 설정 변경 시 사용자 토큰을 해당 주제에 구독/해제합니다.
+실제 FCM 구독에 성공한 주제만 User.fcm_topics에 기록하므로 알림 엔진은 이 기록으로
+주제 전송이 가능한 시장인지 판단합니다.
+"""
+
+import os
+import logging
+from typing import Dict, Iterable, Set
+
+from database import db
+from models import User, UserMarketInterest
+from fcm_integration.fcm_utils import fcm_service
+
+logger = logging.getLogger(__name__)
+
+MARKET_TOPIC_PREFIX = 'market_'
+
+# FCM 주제 구독 API 1회 호출당 최대 토큰 수
+TOPIC_BATCH_SIZE = 1000
+
+
+def topic_delivery_enabled() -> bool:
+    """주제 기반 전송 모드 여부"""
+    return os.environ.get('ALERT_DELIVERY_MODE', 'token').lower() == 'topic'
+
+
+def market_topic_name(market_id: int) -> str:
+    """시장의 FCM 주제명"""
+    return f"{MARKET_TOPIC_PREFIX}{market_id}"
+
+
+def _recorded_market_topics(user: User) -> Set[str]:
+    return {t for t in (user.fcm_topics or []) if t.startswith(MARKET_TOPIC_PREFIX)}
+
+
+def _desired_market_topics(user: User) -> Set[str]:
+    """사용자 토큰이 구독해야 하는 시장 주제 (알림 켜진 활성 관심 시장)"""
+    if not user.can_receive_fcm():
+        return set()
+
+    market_ids = db.session.query(UserMarketInterest.market_id).filter(
+        UserMarketInterest.user_id == user.id,
+        UserMarketInterest.is_active == True,
+        UserMarketInterest.notification_enabled == True
+    ).all()
+    return {market_topic_name(market_id) for (market_id,) in market_ids}
+
+
+def unsubscribe_token_from_market_topics(user: User, token: str = None) -> int:
+    """
+    사용자 토큰을 기록된 모든 시장 주제에서 해제 (토큰 변경/탈퇴 시)
+
+    Returns:
+        int: 해제된 주제 수
+    """
+    token = token or user.fcm_token
+    recorded = _recorded_market_topics(user)
+    if not token or not recorded:
+        return 0
+
+    for topic in recorded:
+        fcm_service.unsubscribe_from_topic([token], topic)
+        user.unsubscribe_from_topic(topic)
+    return len(recorded)
+
+
+def sync_user_market_topics(user: User) -> Dict[str, int]:
+    """
+    사용자의 시장 주제 구독을 관심 시장 설정과 일치시킴
+
+    주제 기반 전송 모드가 아니면 아무 것도 하지 않습니다. 커밋은 호출하는 쪽에서 합니다.
+
+    Returns:
+        dict: {'subscribed': 구독한 주제 수, 'unsubscribed': 해제한 주제 수}
+    """
+    result = {'subscribed': 0, 'unsubscribed': 0}
+    if not topic_delivery_enabled() or not user.fcm_token:
+        return result
+
+    try:
+        recorded = _recorded_market_topics(user)
+        desired = _desired_market_topics(user)
+
+        for topic in desired - recorded:
+            response = fcm_service.subscribe_to_topic([user.fcm_token], topic)
+            if response.get('success_count'):
+                user.subscribe_to_topic(topic)
+                result['subscribed'] += 1
+
+        for topic in recorded - desired:
+            fcm_service.unsubscribe_from_topic([user.fcm_token], topic)
+            user.unsubscribe_from_topic(topic)
+            result['unsubscribed'] += 1
+
+    except Exception as e:
+        # 주제 동기화 실패는 관심 목록 변경 자체를 막지 않음 (엔진이 개별 전송으로 대체)
+        logger.error(f"사용자 {user.id} 시장 주제 동기화 실패: {e}")
+
+    return result
+
+
+def resync_all_market_topics(market_ids: Iterable[int] = None) -> Dict[str, int]:
+    """
+    시장별 주제 구독을 일괄 재구성 (주제 모드 전환 시 백필용)
+
+    시장마다 구독 대상 토큰을 TOPIC_BATCH_SIZE 단위로 묶어 구독하고,
+    성공한 사용자에게만 주제를 기록합니다. 애플리케이션 컨텍스트 안에서 호출해야 합니다.
+
+    Returns:
+        dict: 처리한 시장 수와 구독 성공/실패 토큰 수
+    """
+    query = db.session.query(UserMarketInterest.market_id, User).join(
+        User, User.id == UserMarketInterest.user_id
+    ).filter(
+        UserMarketInterest.is_active == True,
+        UserMarketInterest.notification_enabled == True,
+        User.is_active == True,
+        User.fcm_enabled == True,
+        User.fcm_token.isnot(None)
+    )
+    if market_ids is not None:
+        query = query.filter(UserMarketInterest.market_id.in_(list(market_ids)))
+
+    users_by_market = {}
+    for market_id, user in query.all():
+        users_by_market.setdefault(market_id, []).append(user)
+
+    stats = {'markets': len(users_by_market), 'subscribed': 0, 'failed': 0}
+    for market_id, users in users_by_market.items():
+        topic = market_topic_name(market_id)
+        pending = [u for u in users if topic not in (u.fcm_topics or [])]
+
+        for start in range(0, len(pending), TOPIC_BATCH_SIZE):
+            batch = pending[start:start + TOPIC_BATCH_SIZE]
+            response = fcm_service.subscribe_to_topic([u.fcm_token for u in batch], topic)
+            # 토큰별 결과를 알 수 없으므로 배치 전체가 성공했을 때만 기록
+            if response.get('success_count') == len(batch):
+                for user in batch:
+                    user.subscribe_to_topic(topic)
+                stats['subscribed'] += len(batch)
+            else:
+                stats['failed'] += len(batch)
+
+        db.session.commit()
+
+    logger.info(f"시장 주제 재동기화 완료: {stats}")
+    return stats
@@ -102,16 +102,23 @@ class User(db.Model):
     
     def subscribe_to_topic(self, topic):
         """FCM 주제 구독"""
+        from sqlalchemy.orm.attributes import flag_modified
+
         if not self.fcm_topics:
             self.fcm_topics = []
         if topic not in self.fcm_topics:
             self.fcm_topics.append(topic)
+            # SQLAlchemy가 JSON 변경을 감지하도록 플래그 설정
+            flag_modified(self, 'fcm_topics')
             self.updated_at = datetime.utcnow()
     
     def unsubscribe_from_topic(self, topic):
         """FCM 주제 구독 해제"""
+        from sqlalchemy.orm.attributes import flag_modified
+
         if self.fcm_topics and topic in self.fcm_topics:
             self.fcm_topics.remove(topic)
+            flag_modified(self, 'fcm_topics')
             self.updated_at = datetime.utcnow()
     
     def enable_fcm(self):
@@ -239,6 +246,33 @@ class User(db.Model):
         admin.set_password(password)
         return admin
 
+class UserDevice(db.Model):
+    """사용자 기기별 FCM 토큰 (한 사용자가 여러 기기 등록 가능, 토큰은 전체에서 유일)"""
+    __tablename__ = 'user_devices'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    token = db.Column(db.String(512), nullable=False)  # FCM 등록 토큰
+    platform = db.Column(db.String(20))  # 'android', 'ios', 'web'
+    device_info = db.Column(db.JSON)  # 기기 정보 (모델, OS 버전 등)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_seen_at = db.Column(db.DateTime, default=datetime.utcnow)  # 마지막 토큰 등록/갱신 시각
+
+    # 토큰 기준 upsert/중복 제거용 유일 인덱스
+    __table_args__ = (db.Index('idx_user_devices_token', 'token', unique=True),)
+
+    user = db.relationship('User', backref=db.backref('devices', lazy='dynamic', passive_deletes=True))
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'token': self.token,
+            'platform': self.platform,
+            'device_info': self.device_info,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'last_seen_at': self.last_seen_at.isoformat() if self.last_seen_at else None
+        }
+
 class UserMarketInterest(db.Model):
     """사용자-시장 관심목록 연결 테이블"""
     __tablename__ = 'user_market_interests'
@@ -247,6 +281,8 @@ class UserMarketInterest(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     market_id = db.Column(db.Integer, db.ForeignKey('markets.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # 추가/해제/알림 설정 변경 시각 (관심 목록 조건부 조회 검증자)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
     notification_enabled = db.Column(db.Boolean, default=True)  # 해당 시장 알림 활성화 여부
     
@@ -326,6 +362,9 @@ class Market(db.Model):
         'wind_enabled': True  # 강풍 알림 활성화
     })
 
+    # 이름순 커서 페이지네이션 (name, id)용 인덱스
+    __table_args__ = (db.Index('idx_markets_name_id', 'name', 'id'),)
+
     # Relationship with damage status
     damage_statuses = db.relationship('DamageStatus', backref='market', lazy=True)
     
@@ -375,11 +414,9 @@ class Market(db.Model):
     
     @classmethod
     def search_by_name(cls, query, limit=20):
-        """시장 이름으로 검색"""
-        return cls.query.filter(
-            cls.name.contains(query),
-            cls.is_active == True
-        ).limit(limit).all()
+        """시장 이름/위치/초성으로 검색 (검색 인덱스 순위순)"""
+        from market_search import search_markets
+        return [market for market, _ in search_markets(query, limit)]
     
     def get_interested_users(self):
         """이 시장에 관심을 가진 활성 사용자들 반환"""
@@ -481,6 +518,153 @@ class Weather(db.Model):
         }
 
 
+class WeatherLatest(db.Model):
+    """격자·종류(current/forecast)별 최신 발표 포인터 (수집 시 갱신, 최신 조회는 기본키 조회)"""
+    __tablename__ = 'weather_latest'
+
+    nx = db.Column(db.Integer, primary_key=True)  # 격자 X 좌표
+    ny = db.Column(db.Integer, primary_key=True)  # 격자 Y 좌표
+    api_type = db.Column(db.String(20), primary_key=True)  # 'current' 또는 'forecast'
+    base_date = db.Column(db.String(8), nullable=False)  # 최신 발표 일자 (YYYYMMDD)
+    base_time = db.Column(db.String(4), nullable=False)  # 최신 발표 시각 (HHMM)
+    weather_id = db.Column(db.Integer)  # 최신 발표로 마지막에 저장된 weather 행 ID
+    collected_at = db.Column(db.DateTime, default=datetime.utcnow)  # 최신 발표 행 저장 시각
+
+    def to_dict(self):
+        return {
+            'nx': self.nx,
+            'ny': self.ny,
+            'api_type': self.api_type,
+            'base_date': self.base_date,
+            'base_time': self.base_time,
+            'weather_id': self.weather_id,
+            'collected_at': self.collected_at.isoformat() if self.collected_at else None
+        }
+
+
+class ForecastFingerprint(db.Model):
+    """격자·발표시각(issuance)별 예보 내용 해시 (수집 시 기록)"""
+    __tablename__ = 'forecast_fingerprints'
+
+    id = db.Column(db.Integer, primary_key=True)
+    nx = db.Column(db.Integer, nullable=False)  # 격자 X 좌표
+    ny = db.Column(db.Integer, nullable=False)  # 격자 Y 좌표
+    base_date = db.Column(db.String(8), nullable=False)  # 발표 일자 (YYYYMMDD)
+    base_time = db.Column(db.String(4), nullable=False)  # 발표 시각 (HHMM)
+    content_hash = db.Column(db.String(64), nullable=False)  # 예보 내용 SHA-256
+    row_count = db.Column(db.Integer, default=0)  # 해시에 포함된 예보 시간 수
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('nx', 'ny', 'base_date', 'base_time', name='unique_forecast_issuance'),
+        db.Index('idx_forecast_fingerprint_created_at', 'created_at'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'nx': self.nx,
+            'ny': self.ny,
+            'base_date': self.base_date,
+            'base_time': self.base_time,
+            'content_hash': self.content_hash,
+            'row_count': self.row_count,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class MarketEvaluationMemo(db.Model):
+    """시장별 마지막 알림 평가 결과 (입력이 바뀌지 않은 시장 재평가 생략용)"""
+    __tablename__ = 'market_evaluation_memos'
+
+    market_id = db.Column(db.Integer, db.ForeignKey('markets.id'), primary_key=True)
+    forecast_hash = db.Column(db.String(64), nullable=False)  # 평가에 사용된 예보 지문
+    config_version = db.Column(db.String(64), nullable=False)  # 알림 임계값 설정 버전
+    has_alerts = db.Column(db.Boolean, default=False)  # 평가 결과 알림 필요 여부
+    alert_types = db.Column(db.JSON)  # 평가 결과 알림 유형 목록
+    evaluated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def matches(self, forecast_hash, config_version):
+        """동일한 입력으로 평가된 결과인지 확인"""
+        return self.forecast_hash == forecast_hash and self.config_version == config_version
+
+    def to_dict(self):
+        return {
+            'market_id': self.market_id,
+            'forecast_hash': self.forecast_hash,
+            'config_version': self.config_version,
+            'has_alerts': self.has_alerts,
+            'alert_types': self.alert_types or [],
+            'evaluated_at': self.evaluated_at.isoformat() if self.evaluated_at else None
+        }
+
+
+class NotificationOutbox(db.Model):
+    """FCM 전송 대기열 (생산자는 적재만 하고 전송 워커가 재시도/데드레터 처리)"""
+    __tablename__ = 'notification_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    idempotency_key = db.Column(db.String(128), unique=True, nullable=False)  # 중복 적재 방지 키
+
+    # 전송 대상 (tokens 또는 topic 중 하나)
+    tokens = db.Column(db.JSON)  # FCM 등록 토큰 리스트
+    topic = db.Column(db.String(200))  # FCM 주제명
+
+    # 메시지 내용
+    title = db.Column(db.String(200), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    data = db.Column(db.JSON)
+
+    # 전송 상태: 'pending', 'sending', 'sent', 'dead'
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, default=0)  # 전송 시도 횟수
+    max_attempts = db.Column(db.Integer, default=5)  # 데드레터 전 최대 시도 횟수
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)  # 다음 시도 가능 시각
+    locked_at = db.Column(db.DateTime)  # 워커가 가져간 시각 (중단된 전송 회수용)
+    last_error = db.Column(db.Text)
+    result = db.Column(db.JSON)  # 마지막 전송 결과
+
+    # 전송 결과를 반영할 알림 이력 (market_alarm_logs.id 목록)과 이 메시지가 대표하는 사용자 수
+    alarm_log_ids = db.Column(db.JSON)
+    recipient_count = db.Column(db.Integer, default=1)
+    # 병합 대상 알림의 수신자 키 (같은 키의 대기 메시지에 이후 알림을 병합)
+    coalesce_key = db.Column(db.String(128))
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('idx_notification_outbox_due', 'status', 'next_attempt_at'),
+        db.Index('idx_notification_outbox_coalesce', 'coalesce_key', 'status'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'idempotency_key': self.idempotency_key,
+            'token_count': len(self.tokens or []),
+            'topic': self.topic,
+            'title': self.title,
+            'body': self.body,
+            'data': self.data or {},
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'last_error': self.last_error,
+            'result': self.result,
+            'alarm_log_ids': self.alarm_log_ids or [],
+            'recipient_count': self.recipient_count,
+            'coalesce_key': self.coalesce_key,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None
+        }
+
+
 class MarketAlarmLog(db.Model):
     """시장별 날씨 알림 전송 이력"""
     __tablename__ = 'market_alarm_logs'
@@ -510,6 +694,12 @@ class MarketAlarmLog(db.Model):
     checked_hours = db.Column(db.Integer, default=24)  # 확인한 예보 시간 범위
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # 시장별 최근 알림 조회, 커서 페이지네이션 (created_at, id)용 인덱스
+    __table_args__ = (
+        db.Index('idx_market_alarm_logs_market_created', 'market_id', 'created_at'),
+        db.Index('idx_market_alarm_logs_created_id', 'created_at', 'id'),
+    )
+
     # 관계
     market = db.relationship('Market', backref=db.backref('alarm_logs', lazy='dynamic'))
 
@@ -644,6 +834,9 @@ class MarketReport(db.Model):
     status = db.Column(db.String(20), default='pending')  # pending, resolved
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     resolved_at = db.Column(db.DateTime)
+
+    # 커서 페이지네이션 (created_at, id)용 인덱스
+    __table_args__ = (db.Index('idx_market_reports_created_id', 'created_at', 'id'),)
     
     # 관계
     user = db.relationship('User', backref=db.backref('reports', lazy=True))
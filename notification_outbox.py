@@ -0,0 +1,707 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+알림 전송 아웃박스
+
+알림 엔진과 관리자 API는 FCM을 직접 호출하지 않고 notification_outbox 테이블에
+메시지를 적재만 합니다. 전송 워커 풀이 대기열을 비우면서 FCM으로 전송하고,
+실패 시 지수 백오프로 재시도하며 최대 시도 횟수를 넘기면 데드레터('dead')로 남깁니다.
+같은 idempotency_key는 한 번만 적재되므로 재실행/중복 요청이 중복 전송으로 이어지지 않습니다.
+
+적재 시점에는 전송 결과를 알 수 없으므로, 알림 이력(market_alarm_logs)과 연결된 메시지는
+전송이 끝났을 때(성공 또는 데드레터) 전송 워커가 이력의 성공/실패 사용자 수에 반영합니다.
+
+사용자별 알림 병합도 아웃박스 안에서 처리합니다. 병합 대상 알림(COALESCE_TYPES)은 병합 대기
+시간만큼 늦게 전송 가능해지고, 그 사이 같은 수신자(coalesce_key)에게 적재되는 알림은 아직
+전송 워커가 가져가지 않은 대기 메시지에 합쳐집니다. (같은 시장은 최신 알림으로 대체,
+다른 시장은 merge 함수로 요약) 대기 중인 메시지는 DB에 있으므로 프로세스가 종료되어도 유실되지 않습니다.
+"""
+
+import os
+import json
+import time
+import uuid
+import random
+import hashlib
+import logging
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import has_app_context
+from sqlalchemy import bindparam, func, insert, or_, update
+from sqlalchemy.exc import IntegrityError
+
+from database import db
+from models import MarketAlarmLog, NotificationOutbox
+from fcm_integration.fcm_utils import fcm_service
+from fcm_integration.message_templates import collapse_key_for
+from weather_cache import weather_response_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', '5'))
+
+# 병합 대상 알림 종류 (data['type'])
+COALESCE_TYPES = ('weather_alert', 'rain_alert', 'weather_summary_alert')
+
+
+def make_idempotency_key(prefix: str, *parts: Any) -> str:
+    """전송 대상/내용으로부터 결정적인 idempotency key 생성"""
+    digest = hashlib.sha256(
+        json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
+    ).hexdigest()
+    return f"{prefix}:{digest}"
+
+
+def _build_row(title: str, body: str, tokens: Optional[List[str]] = None, topic: Optional[str] = None,
+               data: Optional[Dict] = None, idempotency_key: Optional[str] = None,
+               max_attempts: Optional[int] = None, alarm_log_ids: Optional[List[int]] = None,
+               recipient_count: Optional[int] = None, coalesce_key: Optional[str] = None,
+               hold_seconds: float = 0) -> Dict[str, Any]:
+    if not tokens and not topic:
+        raise ValueError('tokens 또는 topic 중 하나는 필요합니다.')
+
+    now = datetime.utcnow()
+    return {
+        'idempotency_key': idempotency_key or f"adhoc:{uuid.uuid4().hex}",
+        'tokens': list(tokens) if tokens else None,
+        'topic': topic,
+        'title': title,
+        'body': body,
+        # FCM data 값은 모두 문자열이어야 함
+        'data': {k: str(v) for k, v in (data or {}).items()},
+        'status': 'pending',
+        'attempts': 0,
+        'max_attempts': max_attempts or DEFAULT_MAX_ATTEMPTS,
+        'alarm_log_ids': list(alarm_log_ids) if alarm_log_ids else None,
+        'recipient_count': recipient_count or 1,
+        'coalesce_key': coalesce_key,
+        # 병합 대상은 병합 대기 시간이 지난 뒤 전송
+        'next_attempt_at': now + timedelta(seconds=hold_seconds) if hold_seconds else now,
+        'created_at': now,
+        'updated_at': now
+    }
+
+
+def enqueue_notification(title: str, body: str, tokens: Optional[List[str]] = None,
+                         topic: Optional[str] = None, data: Optional[Dict] = None,
+                         idempotency_key: Optional[str] = None,
+                         max_attempts: Optional[int] = None,
+                         alarm_log_ids: Optional[List[int]] = None,
+                         recipient_count: Optional[int] = None,
+                         coalesce_key: Optional[str] = None,
+                         hold_seconds: float = 0) -> Tuple[NotificationOutbox, bool]:
+    """
+    메시지 1건을 아웃박스에 적재 (애플리케이션 컨텍스트 필요)
+
+    Returns:
+        tuple: (아웃박스 레코드, 새로 적재되었는지 여부). 같은 키가 이미 있으면 기존 레코드 반환
+    """
+    row = _build_row(title, body, tokens, topic, data, idempotency_key, max_attempts,
+                     alarm_log_ids, recipient_count, coalesce_key, hold_seconds)
+
+    existing = NotificationOutbox.query.filter_by(idempotency_key=row['idempotency_key']).first()
+    if existing:
+        return existing, False
+
+    entry = NotificationOutbox(**row)
+    db.session.add(entry)
+    try:
+        db.session.commit()
+        return entry, True
+    except IntegrityError:
+        # 동시에 같은 키가 적재된 경우
+        db.session.rollback()
+        return NotificationOutbox.query.filter_by(idempotency_key=row['idempotency_key']).first(), False
+
+
+def _merged_fields(current: Dict[str, Any], incoming: Dict[str, Any], merge) -> Dict[str, Any]:
+    """같은 수신자에게 대기 중인 메시지(current)에 새 메시지(incoming)를 합친 내용과 연결 이력"""
+    current_key = collapse_key_for(current['data'])
+    if current_key and current_key == collapse_key_for(incoming['data']):
+        # 같은 시장의 이전 알림은 최신 알림으로 대체
+        title, body, data = incoming['title'], incoming['body'], incoming['data']
+    else:
+        title, body, data = merge([current, incoming])
+
+    alarm_log_ids = list(dict.fromkeys((current.get('alarm_log_ids') or []) + (incoming.get('alarm_log_ids') or [])))
+    return {
+        'title': title,
+        'body': body,
+        'data': {k: str(v) for k, v in (data or {}).items()},
+        'alarm_log_ids': alarm_log_ids or None,
+        'recipient_count': max(current.get('recipient_count') or 1, incoming.get('recipient_count') or 1)
+    }
+
+
+def _coalesce_pending(payloads: List[Dict[str, Any]], merge, stats: Dict[str, int]) -> List[Dict[str, Any]]:
+    """
+    병합 대상 메시지를 같은 수신자의 대기 메시지에 합치고, 새로 넣을 메시지만 반환 (커밋은 호출하는 쪽에서)
+
+    아직 한 번도 시도하지 않은 'pending' 메시지에만 합칩니다. 잠금을 잡고 갱신하며,
+    전송 워커는 잠긴 행을 건너뛰므로 이미 가져간 메시지와 합쳐지지 않습니다.
+    """
+    coalesce_keys = {p['coalesce_key'] for p in payloads if p.get('coalesce_key')}
+    if not coalesce_keys:
+        return payloads
+
+    pending = {
+        entry.coalesce_key: entry for entry in NotificationOutbox.query.filter(
+            NotificationOutbox.coalesce_key.in_(coalesce_keys),
+            NotificationOutbox.status == 'pending',
+            NotificationOutbox.attempts == 0
+        ).order_by(NotificationOutbox.id).with_for_update(skip_locked=True)
+    }
+
+    remaining = []
+    planned: Dict[str, Dict[str, Any]] = {}
+    for payload in payloads:
+        key = payload.get('coalesce_key')
+        if not key:
+            remaining.append(payload)
+            continue
+
+        entry = pending.get(key)
+        target = planned.get(key)
+        if entry is not None:
+            current = {'title': entry.title, 'body': entry.body, 'data': entry.data or {},
+                       'alarm_log_ids': entry.alarm_log_ids, 'recipient_count': entry.recipient_count}
+            for field, value in _merged_fields(current, payload, merge).items():
+                setattr(entry, field, value)
+        elif target is not None:
+            target.update(_merged_fields(target, payload, merge))
+        else:
+            planned[key] = payload
+            remaining.append(payload)
+            continue
+
+        stats['coalesced'] = stats.get('coalesced', 0) + 1
+
+    return remaining
+
+
+def enqueue_many(messages: List[Dict[str, Any]], chunk_size: int = 500, merge=None,
+                 stats: Optional[Dict[str, int]] = None) -> int:
+    """
+    여러 메시지를 한 번에 적재 (이미 있는 idempotency_key는 건너뜀)
+
+    Args:
+        messages: _build_row 인자(title, body, tokens/topic, data, idempotency_key 등)를 담은 dict 리스트
+        merge: 주어지면 coalesce_key가 있는 메시지를 같은 수신자의 대기 메시지에 병합
+               (여러 알림 item({'title', 'body', 'data'}) 리스트를 (title, body, data)로 합치는 함수)
+        stats: 병합된 메시지 수('coalesced')를 더할 dict
+
+    Returns:
+        int: 새로 적재되었거나 대기 메시지에 병합된 메시지 수
+    """
+    rows = {}
+    sources = {}
+    for message in messages:
+        row = _build_row(**message)
+        if row['idempotency_key'] not in rows:
+            rows[row['idempotency_key']] = row
+            sources[row['idempotency_key']] = message
+
+    if not rows:
+        return 0
+
+    stats = stats if stats is not None else {}
+    created = 0
+    keys = list(rows.keys())
+    for start in range(0, len(keys), chunk_size):
+        chunk_keys = keys[start:start + chunk_size]
+        existing = {
+            key for (key,) in db.session.query(NotificationOutbox.idempotency_key)
+            .filter(NotificationOutbox.idempotency_key.in_(chunk_keys))
+        }
+        payloads = [rows[key] for key in chunk_keys if key not in existing]
+        if not payloads:
+            continue
+
+        if merge is not None:
+            before = stats.get('coalesced', 0)
+            payloads = _coalesce_pending(payloads, merge, stats)
+            # 대기 메시지 병합은 새 메시지 적재와 별도로 확정
+            db.session.commit()
+            created += stats.get('coalesced', 0) - before
+            if not payloads:
+                continue
+
+        try:
+            db.session.execute(insert(NotificationOutbox), payloads)
+            db.session.commit()
+            created += len(payloads)
+        except IntegrityError:
+            # 동시에 적재된 키가 섞인 경우 건별로 다시 적재 (병합된 내용 유지)
+            db.session.rollback()
+            for payload in payloads:
+                message = dict(sources[payload['idempotency_key']])
+                message.update({k: payload[k] for k in ('title', 'body', 'data', 'alarm_log_ids', 'recipient_count')})
+                _, is_new = enqueue_notification(**message)
+                created += int(is_new)
+
+    return created
+
+
+class OutboxSender:
+    """
+    FCMService와 같은 인터페이스로 메시지를 아웃박스에 적재하는 발송기
+
+    반환값은 전송 결과가 아니라 적재 결과입니다. send_multicast는 enqueued_count를 돌려주고
+    success_count는 항상 0이며, 실제 성공/실패는 전송 워커가 alarm_log_ids로 연결된 알림 이력에
+    반영합니다. (queued = True로 구분)
+
+    메시지는 batch() 범위가 끝날 때 한 번에 적재하고(알림 엔진은 사용자 배치마다),
+    범위 밖에서는 애플리케이션 컨텍스트가 있으면 바로 적재합니다. 둘 다 아니면 flush()까지
+    메모리에 둡니다. idempotency_key는 대상·내용과 시간 구간(key_window_seconds)으로 만들어
+    같은 구간의 재실행이 중복 적재되지 않습니다.
+
+    merge와 coalesce_window_seconds가 주어지면 병합 대상 알림을 같은 수신자의 대기 메시지에
+    병합합니다. (모듈 설명 참고) 병합 대상 멀티캐스트는 사용자별 토큰 묶음(token_groups, 없으면 토큰)마다
+    나눠 적재해 사용자별 전송과 같은 수신자 키로 병합되게 합니다.
+    """
+
+    queued = True
+
+    def __init__(self, key_window_seconds: int = 3600, coalesce_window_seconds: float = 0,
+                 merge=None, coalesce_types=COALESCE_TYPES):
+        """
+        Args:
+            key_window_seconds: idempotency_key 시간 구간
+            coalesce_window_seconds: 병합 대상 알림을 전송 전에 대기 메시지로 두는 시간 (0이면 병합 안 함)
+            merge: 여러 알림 item 리스트를 (title, body, data)로 합치는 함수
+            coalesce_types: 병합 대상 data['type'] 목록
+        """
+        self.key_window_seconds = key_window_seconds
+        self.coalesce_window_seconds = coalesce_window_seconds if merge is not None else 0
+        self.merge = merge
+        self.coalesce_types = set(coalesce_types)
+        self._pending: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._stats = {'received': 0, 'coalesced': 0}
+        # batch() 범위의 스레드별 적재 대기 메시지
+        self._local = threading.local()
+
+    def _append(self, title: str, body: str, data: Optional[Dict],
+                tokens: Optional[List[str]] = None, topic: Optional[str] = None,
+                alarm_log_ids: Optional[List[int]] = None, recipient_count: Optional[int] = None):
+        window = int(time.time() // self.key_window_seconds)
+        key = make_idempotency_key('fcm', window, sorted(tokens) if tokens else None, topic, title, body, data)
+        message = {
+            'title': title,
+            'body': body,
+            'tokens': tokens,
+            'topic': topic,
+            'data': data,
+            'idempotency_key': key,
+            'alarm_log_ids': alarm_log_ids,
+            'recipient_count': recipient_count
+        }
+        if tokens and self._is_coalescable(data):
+            # 같은 기기 토큰 묶음(사용자)으로 가는 알림끼리 병합
+            message['coalesce_key'] = make_idempotency_key('recipient', sorted(tokens))
+            message['hold_seconds'] = self.coalesce_window_seconds
+            with self._lock:
+                self._stats['received'] += 1
+
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is not None:
+            buffer.append(message)
+        elif has_app_context():
+            self._enqueue([message])
+        else:
+            with self._lock:
+                self._pending.append(message)
+
+    def _enqueue_many(self, messages: List[Dict[str, Any]]) -> int:
+        stats = {}
+        created = enqueue_many(messages, merge=self.merge, stats=stats)
+        with self._lock:
+            self._stats['coalesced'] += stats.get('coalesced', 0)
+        return created
+
+    def _enqueue(self, messages: List[Dict[str, Any]]) -> int:
+        """메시지 적재 (실패하면 다음 flush에서 다시 시도하도록 보관)"""
+        try:
+            return self._enqueue_many(messages)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"아웃박스 적재 실패, 다음 flush에서 재시도: {e}")
+            with self._lock:
+                self._pending.extend(messages)
+            return 0
+
+    @contextmanager
+    def batch(self):
+        """범위 안에서 보낸 메시지를 범위가 끝날 때 한 번에 적재 (애플리케이션 컨텍스트 필요)"""
+        if getattr(self._local, 'buffer', None) is not None:
+            # 이미 바깥 범위가 모으고 있음
+            yield
+            return
+
+        self._local.buffer = []
+        try:
+            yield
+        finally:
+            buffer, self._local.buffer = self._local.buffer, None
+            if buffer:
+                self._enqueue(buffer)
+
+    def send_notification(self, token: str, title: str, body: str,
+                          data: Optional[Dict] = None, image_url: Optional[str] = None,
+                          alarm_log_ids: Optional[List[int]] = None, recipient_count: Optional[int] = None) -> bool:
+        """적재 여부 반환 (전송 성공 여부 아님)"""
+        if not token:
+            return False
+        self._append(title, body, data, tokens=[token],
+                     alarm_log_ids=alarm_log_ids, recipient_count=recipient_count)
+        return True
+
+    def _is_coalescable(self, data: Optional[Dict]) -> bool:
+        return self.coalesce_window_seconds > 0 and (data or {}).get('type') in self.coalesce_types
+
+    def send_multicast(self, tokens: List[str], title: str, body: str, data: Optional[Dict] = None,
+                       alarm_log_ids: Optional[List[int]] = None, recipient_count: Optional[int] = None,
+                       token_groups: Optional[List[List[str]]] = None) -> Dict:
+        """
+        Args:
+            token_groups: 사용자별 기기 토큰 묶음. 병합 대상 알림은 묶음(없으면 토큰)마다 한 건씩 적재해
+                          사용자별 전송으로 적재된 알림과 같은 수신자로 병합되게 함
+        """
+        tokens = [t for t in tokens or [] if t]
+        if not tokens:
+            return {"success_count": 0, "failure_count": 0, "enqueued_count": 0}
+
+        if self._is_coalescable(data) and len(tokens) > 1:
+            groups = [[t for t in group if t] for group in token_groups] if token_groups else [[t] for t in tokens]
+            for group in groups:
+                if group:
+                    # 묶음 하나가 수신자 한 명
+                    self._append(title, body, data, tokens=group, alarm_log_ids=alarm_log_ids, recipient_count=1)
+        else:
+            self._append(title, body, data, tokens=tokens,
+                         alarm_log_ids=alarm_log_ids, recipient_count=recipient_count)
+        return {"success_count": 0, "failure_count": 0, "enqueued_count": len(tokens),
+                "failed_tokens": [], "invalid_tokens": []}
+
+    def send_to_topic(self, topic: str, title: str, body: str, data: Optional[Dict] = None,
+                      alarm_log_ids: Optional[List[int]] = None, recipient_count: Optional[int] = None) -> bool:
+        """적재 여부 반환 (전송 성공 여부 아님)"""
+        self._append(title, body, data, topic=topic,
+                     alarm_log_ids=alarm_log_ids, recipient_count=recipient_count)
+        return True
+
+    def flush(self) -> int:
+        """범위 밖에서 모아 둔 메시지를 아웃박스에 적재 (애플리케이션 컨텍스트 필요)"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+
+        if not pending:
+            return 0
+
+        try:
+            created = self._enqueue_many(pending)
+            logger.info(f"아웃박스 적재: {created}건 (요청 {len(pending)}건)")
+            return created
+        except Exception:
+            db.session.rollback()
+            # 다음 flush에서 다시 시도
+            with self._lock:
+                self._pending = pending + self._pending
+            raise
+
+    def metrics(self) -> Dict[str, int]:
+        """병합 대상으로 받은 알림 수, 대기 메시지에 병합된 수, 아직 적재하지 않은 메시지 수"""
+        with self._lock:
+            return dict(self._stats, unflushed=len(self._pending))
+
+
+def _delivered_count(result: Optional[Dict[str, Any]]) -> int:
+    """전송 결과 1회에서 전달된 수 (토큰 전송은 성공 토큰 수, 주제 전송은 성공 여부)"""
+    if not result:
+        return 0
+    if 'success_count' in result:
+        return result.get('success_count') or 0
+    return 1 if result.get('success') else 0
+
+
+def _is_delivered(entry: NotificationOutbox) -> bool:
+    """지금까지 한 번이라도 전달된 적이 있는지 (일부 토큰만 성공한 뒤 데드레터가 된 경우 포함)"""
+    return (entry.result or {}).get('delivered_count', 0) > 0
+
+
+def apply_alarm_log_outcomes(deltas: Dict[int, List[int]]):
+    """
+    알림 이력의 성공/실패 사용자 수에 전송 결과 반영 (커밋은 호출하는 쪽에서)
+
+    Args:
+        deltas: {market_alarm_logs.id: [성공 증가분, 실패 증가분]}
+    """
+    deltas = {log_id: counts for log_id, counts in deltas.items() if counts[0] or counts[1]}
+    if not deltas:
+        return
+
+    table = MarketAlarmLog.__table__
+    db.session.execute(
+        update(table).where(table.c.id == bindparam('log_id')).values(
+            success_count=func.coalesce(table.c.success_count, 0) + bindparam('delivered'),
+            failure_count=func.coalesce(table.c.failure_count, 0) + bindparam('undelivered')
+        ),
+        [{'log_id': log_id, 'delivered': counts[0], 'undelivered': counts[1]}
+         for log_id, counts in deltas.items()]
+    )
+
+
+def _add_outcome(deltas: Dict[int, List[int]], entry: NotificationOutbox, sign: int = 1):
+    """전송이 끝난 메시지의 결과를 연결된 알림 이력별 증가분에 더함"""
+    if not entry.alarm_log_ids:
+        return
+    position = 0 if _is_delivered(entry) else 1
+    for log_id in entry.alarm_log_ids:
+        deltas[log_id][position] += sign * (entry.recipient_count or 1)
+
+
+class OutboxDispatcher:
+    """아웃박스를 비우는 전송 워커 풀"""
+
+    def __init__(self, sender=None):
+        self.sender = sender or fcm_service
+        self.workers = int(os.environ.get('OUTBOX_WORKERS', '4'))
+        self.batch_size = int(os.environ.get('OUTBOX_BATCH_SIZE', '100'))
+        self.poll_interval = float(os.environ.get('OUTBOX_POLL_INTERVAL', '2'))
+        self.base_backoff = float(os.environ.get('OUTBOX_BASE_BACKOFF_SECONDS', '30'))
+        self.max_backoff = float(os.environ.get('OUTBOX_MAX_BACKOFF_SECONDS', '3600'))
+        # 'sending' 상태로 이 시간 이상 남은 메시지는 중단된 전송으로 보고 다시 가져감
+        self.lease_seconds = int(os.environ.get('OUTBOX_LEASE_SECONDS', '300'))
+
+        self._app = None
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._executor = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, app):
+        """백그라운드 전송 루프 시작"""
+        if self.running:
+            return
+        self._app = app
+        self._stop_event.clear()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, self.workers), thread_name_prefix='outbox-worker')
+        self._thread = threading.Thread(target=self._loop, name='outbox-dispatcher', daemon=True)
+        self._thread.start()
+        logger.info(f"알림 아웃박스 전송 워커 시작 (워커 {self.workers}개)")
+
+    def stop(self, timeout: float = 10):
+        """전송 루프 정지 (진행 중인 배치는 마저 처리)"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        logger.info("알림 아웃박스 전송 워커 정지")
+
+    def _loop(self):
+        while not self._stop_event.is_set():
+            try:
+                with self._app.app_context():
+                    processed = self.run_once()
+            except Exception as e:
+                logger.error(f"아웃박스 전송 루프 오류: {e}")
+                processed = 0
+            if not processed:
+                self._stop_event.wait(self.poll_interval)
+
+    def _claim_due(self) -> List[Dict[str, Any]]:
+        """전송할 메시지를 가져와 'sending'으로 표시"""
+        now = datetime.utcnow()
+        lease_expired = now - timedelta(seconds=self.lease_seconds)
+
+        entries = NotificationOutbox.query.filter(
+            or_(
+                (NotificationOutbox.status == 'pending') & (NotificationOutbox.next_attempt_at <= now),
+                (NotificationOutbox.status == 'sending') & (NotificationOutbox.locked_at < lease_expired)
+            )
+        ).order_by(NotificationOutbox.next_attempt_at, NotificationOutbox.id) \
+            .limit(self.batch_size).with_for_update(skip_locked=True).all()
+
+        claimed = []
+        for entry in entries:
+            entry.status = 'sending'
+            entry.locked_at = now
+            claimed.append({
+                'id': entry.id,
+                'tokens': list(entry.tokens or []),
+                'topic': entry.topic,
+                'title': entry.title,
+                'body': entry.body,
+                'data': entry.data or {}
+            })
+        db.session.commit()
+        return claimed
+
+    def _deliver(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """메시지 1건 전송 (DB 접근 없음, 워커 스레드에서 실행)"""
+        try:
+            if message['topic']:
+                success = self.sender.send_to_topic(message['topic'], message['title'],
+                                                    message['body'], message['data'])
+                return {'id': message['id'], 'retry_tokens': None, 'success': success,
+                        'result': {'success': success}, 'error': None if success else 'topic send failed'}
+
+            result = self.sender.send_multicast(message['tokens'], message['title'],
+                                                message['body'], message['data']) or {}
+            # 무효 토큰은 재시도해도 성공하지 않으므로 제외
+            invalid = set(result.get('invalid_tokens') or [])
+            retry_tokens = [t for t in result.get('failed_tokens') or [] if t not in invalid]
+            if result.get('failure_count') and not result.get('failed_tokens'):
+                # 전송 자체가 실패한 경우 (토큰별 결과 없음)
+                retry_tokens = message['tokens']
+
+            return {
+                'id': message['id'],
+                'retry_tokens': retry_tokens,
+                'success': not retry_tokens,
+                'result': {k: result.get(k, 0) for k in ('success_count', 'failure_count')},
+                'error': f"{len(retry_tokens)} tokens failed" if retry_tokens else None
+            }
+        except Exception as e:
+            return {'id': message['id'], 'retry_tokens': None, 'success': False,
+                    'result': None, 'error': f"{type(e).__name__}: {e}"}
+
+    def _backoff_seconds(self, attempts: int) -> float:
+        """지수 백오프 (±20% 지터)"""
+        delay = min(self.max_backoff, self.base_backoff * (2 ** max(0, attempts - 1)))
+        return delay * random.uniform(0.8, 1.2)
+
+    def _record_outcomes(self, outcomes: List[Dict[str, Any]]) -> Dict[str, int]:
+        counts = {'sent': 0, 'retry': 0, 'dead': 0}
+        if not outcomes:
+            return counts
+
+        now = datetime.utcnow()
+        entries = {e.id: e for e in NotificationOutbox.query.filter(
+            NotificationOutbox.id.in_([o['id'] for o in outcomes])
+        )}
+        # 전송이 끝난 메시지의 알림 이력별 [성공, 실패] 사용자 수
+        log_deltas = defaultdict(lambda: [0, 0])
+
+        for outcome in outcomes:
+            entry = entries.get(outcome['id'])
+            if entry is None:
+                continue
+
+            entry.attempts = (entry.attempts or 0) + 1
+            # 재시도 사이에 일부 토큰이 이미 전달된 경우를 위해 전달 수 누적
+            delivered = (entry.result or {}).get('delivered_count', 0) + _delivered_count(outcome['result'])
+            entry.result = dict(outcome['result'] or {}, delivered_count=delivered)
+            entry.locked_at = None
+
+            if outcome['success']:
+                entry.status = 'sent'
+                entry.sent_at = now
+                entry.last_error = None
+                counts['sent'] += 1
+                _add_outcome(log_deltas, entry)
+                continue
+
+            entry.last_error = outcome['error']
+            if outcome['retry_tokens']:
+                # 실패한 토큰만 다시 전송
+                entry.tokens = outcome['retry_tokens']
+
+            if entry.attempts >= (entry.max_attempts or DEFAULT_MAX_ATTEMPTS):
+                entry.status = 'dead'
+                counts['dead'] += 1
+                _add_outcome(log_deltas, entry)
+                logger.warning(f"아웃박스 메시지 {entry.id} 데드레터 처리: {entry.last_error}")
+            else:
+                entry.status = 'pending'
+                entry.next_attempt_at = now + timedelta(seconds=self._backoff_seconds(entry.attempts))
+                counts['retry'] += 1
+
+        # 같은 트랜잭션에서 알림 이력에 실제 전송 결과 반영
+        apply_alarm_log_outcomes(log_deltas)
+        db.session.commit()
+        if log_deltas:
+            weather_response_cache.invalidate_dashboards()
+        return counts
+
+    def run_once(self) -> int:
+        """
+        전송 가능한 메시지 한 배치 처리 (애플리케이션 컨텍스트 필요)
+
+        Returns:
+            int: 처리한 메시지 수
+        """
+        claimed = self._claim_due()
+        if not claimed:
+            return 0
+
+        if self._executor is not None:
+            outcomes = list(self._executor.map(self._deliver, claimed))
+        else:
+            outcomes = [self._deliver(message) for message in claimed]
+
+        counts = self._record_outcomes(outcomes)
+        logger.info(
+            f"아웃박스 전송: {len(claimed)}건 처리 "
+            f"(성공 {counts['sent']}, 재시도 예정 {counts['retry']}, 데드레터 {counts['dead']})"
+        )
+
+        prune = getattr(self.sender, 'prune_invalid_tokens', None)
+        if prune is not None:
+            prune()
+
+        return len(claimed)
+
+
+def get_outbox_stats() -> Dict[str, Any]:
+    """상태별 아웃박스 메시지 수와 가장 오래된 대기 메시지 시각"""
+    counts = dict(
+        db.session.query(NotificationOutbox.status, func.count(NotificationOutbox.id))
+        .group_by(NotificationOutbox.status).all()
+    )
+    oldest_pending = db.session.query(func.min(NotificationOutbox.created_at)).filter(
+        NotificationOutbox.status == 'pending'
+    ).scalar()
+
+    return {
+        'pending': counts.get('pending', 0),
+        'sending': counts.get('sending', 0),
+        'sent': counts.get('sent', 0),
+        'dead': counts.get('dead', 0),
+        'oldest_pending_at': oldest_pending.isoformat() if oldest_pending else None,
+        'dispatcher_running': outbox_dispatcher.running
+    }
+
+
+def requeue_dead_letter(outbox_id: int) -> Optional[NotificationOutbox]:
+    """데드레터 메시지를 다시 대기열로 (시도 횟수 초기화)"""
+    entry = db.session.get(NotificationOutbox, outbox_id)
+    if entry is None or entry.status != 'dead':
+        return None
+
+    # 데드레터 때 알림 이력에 반영한 결과는 다시 전송이 끝날 때 새로 반영되므로 되돌림
+    log_deltas = defaultdict(lambda: [0, 0])
+    _add_outcome(log_deltas, entry, sign=-1)
+    apply_alarm_log_outcomes(log_deltas)
+
+    entry.status = 'pending'
+    entry.attempts = 0
+    entry.result = None
+    entry.next_attempt_at = datetime.utcnow()
+    db.session.commit()
+    return entry
+
+
+# 전역 전송 워커
+outbox_dispatcher = OutboxDispatcher()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+커서(keyset) 페이지네이션
+
+query.paginate()는 페이지마다 COUNT(*)를 실행하고 OFFSET만큼 행을 읽고 버리므로,
+market_alarm_logs처럼 계속 늘어나는 테이블을 깊이 넘길수록 느려집니다.
+커서 방식은 이전 페이지 마지막 행의 정렬 키((created_at, id) 또는 (name, id)) 다음부터
+인덱스로 바로 읽고, 다음 페이지가 있는지는 한 행을 더 읽어 판단합니다.
+
+- 요청에 cursor 파라미터가 있으면(첫 페이지는 빈 값) 커서 방식, 없으면 기존 page 방식
+- 커서는 정렬 종류와 마지막 행의 정렬 키를 담은 불투명 문자열 (base64)
+- total=approx|exact일 때만 전체 개수를 함께 반환 (approx는 PostgreSQL 실행 계획 추정치)
+"""
+
+import json
+import base64
+import logging
+import binascii
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from flask import request
+from sqlalchemy import literal, text, tuple_
+
+from database import db
+from models import Market, MarketAlarmLog, MarketReport
+
+logger = logging.getLogger(__name__)
+
+# 커서 방식 한 페이지 최대 행 수
+MAX_PER_PAGE = 100
+
+
+class CursorError(ValueError):
+    """커서 형식 오류 (400)"""
+
+
+class KeysetOrder(NamedTuple):
+    """정렬 키 (이름은 커서에 기록되어 다른 정렬의 커서를 거부하는 데 쓰임)"""
+    name: str
+    columns: Tuple[Any, ...]
+    descending: bool = False
+    # 커서에서 복원할 때 datetime으로 바꿀 키 위치
+    datetime_positions: Tuple[int, ...] = ()
+
+    def order_by(self):
+        return [column.desc() if self.descending else column.asc() for column in self.columns]
+
+
+# 목록별 정렬 키 (각각 같은 순서의 복합 인덱스 사용)
+ALARM_LOG_ORDER = KeysetOrder('alarm_logs', (MarketAlarmLog.created_at, MarketAlarmLog.id),
+                              descending=True, datetime_positions=(0,))
+MARKET_NAME_ORDER = KeysetOrder('markets', (Market.name, Market.id))
+REPORT_ORDER = KeysetOrder('reports', (MarketReport.created_at, MarketReport.id),
+                           descending=True, datetime_positions=(0,))
+
+
+class KeysetPage(NamedTuple):
+    items: List[Any]
+    next_cursor: Optional[str]
+    has_next: bool
+    total: Optional[int]
+
+
+def encode_cursor(order: KeysetOrder, values: Sequence[Any]) -> str:
+    payload = [order.name] + [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(order: KeysetOrder, cursor: str) -> Tuple[Any, ...]:
+    """커서를 정렬 키 값으로 (형식이 다르거나 다른 정렬의 커서면 CursorError)"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw.decode('utf-8'))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise CursorError('cursor 형식이 올바르지 않습니다.')
+
+    if not isinstance(payload, list) or len(payload) != len(order.columns) + 1 or payload[0] != order.name:
+        raise CursorError('cursor가 이 목록의 정렬과 맞지 않습니다.')
+
+    values = payload[1:]
+    try:
+        for position in order.datetime_positions:
+            values[position] = datetime.fromisoformat(values[position])
+    except (TypeError, ValueError):
+        raise CursorError('cursor 형식이 올바르지 않습니다.')
+    return tuple(values)
+
+
+def cursor_requested() -> bool:
+    """요청이 커서 방식인지 (cursor 파라미터가 있으면, 첫 페이지는 빈 값)"""
+    return 'cursor' in request.args
+
+
+def requested_total_mode() -> Optional[str]:
+    """total 파라미터 (approx | exact, 그 외는 개수 생략)"""
+    mode = (request.args.get('total') or '').lower()
+    return mode if mode in ('approx', 'exact') else None
+
+
+def approximate_count(query) -> int:
+    """
+    조건에 맞는 행 수 추정치
+
+    PostgreSQL은 실행 계획의 행 수 추정치(EXPLAIN)를 써서 COUNT(*) 없이 구하고,
+    그 외 DB는 정확한 개수를 셉니다.
+    """
+    bind = db.session.get_bind()
+    if bind.dialect.name == 'postgresql':
+        try:
+            statement = query.order_by(None).statement.compile(bind, compile_kwargs={'literal_binds': True})
+            # 실패해도 트랜잭션이 중단되지 않도록 세이브포인트 안에서 실행
+            with db.session.begin_nested():
+                plan = db.session.execute(text(f'EXPLAIN (FORMAT JSON) {statement}')).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]['Plan']['Plan Rows'])
+        except Exception as e:
+            logger.warning(f"행 수 추정 실패, 정확한 개수로 대체: {e}")
+    return query.order_by(None).count()
+
+
+def keyset_paginate(query, order: KeysetOrder, per_page: int, cursor: Optional[str] = None,
+                    key_of=None, total_mode: Optional[str] = None) -> KeysetPage:
+    """
+    커서 다음 페이지 조회 (per_page + 1행을 읽어 다음 페이지 여부 판단)
+
+    Args:
+        query: 필터를 적용한 쿼리 (정렬은 여기서 지정)
+        order: 정렬 키
+        per_page: 페이지 크기 (1~MAX_PER_PAGE로 제한)
+        cursor: 이전 응답의 next_cursor (없거나 빈 값이면 첫 페이지)
+        key_of: 행에서 정렬 키 값 튜플을 꺼내는 함수 (기본: 정렬 컬럼 이름의 속성)
+        total_mode: 'approx' | 'exact' | None
+
+    Raises:
+        CursorError: 커서 형식 오류
+    """
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+    if key_of is None:
+        names = [column.key for column in order.columns]
+        key_of = lambda row: tuple(getattr(row, name) for name in names)
+
+    total = None
+    if total_mode == 'approx':
+        total = approximate_count(query)
+    elif total_mode == 'exact':
+        total = query.order_by(None).count()
+
+    if cursor:
+        values = decode_cursor(order, cursor)
+        keys = tuple_(*order.columns)
+        bounds = tuple_(*(literal(value, column.type) for column, value in zip(order.columns, values)))
+        query = query.filter(keys < bounds if order.descending else keys > bounds)
+
+    rows = query.order_by(None).order_by(*order.order_by()).limit(per_page + 1).all()
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    next_cursor = encode_cursor(order, key_of(rows[-1])) if has_next else None
+    return KeysetPage(rows, next_cursor, has_next, total)
+
+
+def cursor_pagination_info(page: KeysetPage, per_page: int) -> Dict[str, Any]:
+    """응답의 pagination 항목 (커서 방식)"""
+    info = {
+        'mode': 'cursor',
+        'per_page': max(1, min(per_page, MAX_PER_PAGE)),
+        'next_cursor': page.next_cursor,
+        'has_next': page.has_next
+    }
+    if page.total is not None:
+        info['total'] = page.total
+    return info
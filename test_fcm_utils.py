@@ -0,0 +1,93 @@
+import unittest
+from unittest.mock import patch
+
+from firebase_admin import messaging
+
+try:
+    from fcm_integration.fcm_utils import FCMService
+except ImportError:
+    # If run from parent directory
+    import sys
+    import os
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from fcm_integration.fcm_utils import FCMService
+
+
+class TestFCMService(unittest.TestCase):
+    def setUp(self):
+        self.service = FCMService()
+        self.service.available = True
+        self.service.send_workers = 8
+
+    def test_send_multicast_concurrent_accounting(self):
+        """동시 전송에서도 성공/실패 집계와 실패 토큰 순서가 유지되는지 확인"""
+        tokens = [f"token-{i:05d}" for i in range(1200)]
+
+        def fake_send(message):
+            index = int(message.token.split('-')[1])
+            if index % 100 == 0:
+                raise messaging.UnregisteredError('unregistered')
+            if index % 250 == 1:
+                raise messaging.SenderIdMismatchError('mismatch')
+            if index % 333 == 2:
+                raise RuntimeError('network')
+            return f"projects/test/messages/{index}"
+
+        with patch.object(messaging, 'send', side_effect=fake_send):
+            result = self.service.send_multicast(tokens, "title", "body", {"type": "test"})
+
+        expected_failed = [
+            t for i, t in enumerate(tokens)
+            if i % 100 == 0 or i % 250 == 1 or i % 333 == 2
+        ]
+        self.assertEqual(result['failed_tokens'], expected_failed)
+        self.assertEqual(result['failure_count'], len(expected_failed))
+        self.assertEqual(result['success_count'], len(tokens) - len(expected_failed))
+
+        # 네트워크 오류가 아닌 무효 토큰만 정리 대상으로 수집
+        expected_invalid = {t for i, t in enumerate(tokens) if i % 100 == 0 or i % 250 == 1}
+        self.assertEqual(self.service._invalid_tokens, expected_invalid)
+
+    def test_send_multicast_shares_platform_config(self):
+        """토큰별 메시지가 payload당 한 번 만든 플랫폼 설정을 공유하는지 확인"""
+        sent = []
+
+        def fake_send(message):
+            sent.append(message)
+            return "projects/test/messages/1"
+
+        with patch.object(messaging, 'send', side_effect=fake_send):
+            self.service.send_multicast([f"token-{i}" for i in range(20)], "title", "body", {"type": "test"})
+
+        self.assertEqual(len(sent), 20)
+        self.assertEqual(len({id(m.android) for m in sent}), 1)
+        self.assertEqual(len({id(m.apns) for m in sent}), 1)
+        self.assertEqual(sorted(m.token for m in sent), sorted(f"token-{i}" for i in range(20)))
+
+    def test_send_retries_after_quota_error(self):
+        """할당량 오류는 Retry-After만큼 멈춘 뒤 재시도해 전송에 성공하는지 확인"""
+        from types import SimpleNamespace
+        from fcm_integration.rate_governor import RateGovernor
+
+        self.service.governor = RateGovernor(max_retries=2)
+        quota_response = SimpleNamespace(headers={'Retry-After': '0.05'})
+        calls = []
+
+        def fake_send(message):
+            calls.append(message.token)
+            if len(calls) == 1:
+                raise messaging.QuotaExceededError('quota', http_response=quota_response)
+            return "projects/test/messages/1"
+
+        with patch.object(messaging, 'send', side_effect=fake_send):
+            self.assertTrue(self.service.send_notification("token-1", "title", "body"))
+
+        metrics = self.service.governor.metrics()
+        self.assertEqual(calls, ["token-1", "token-1"])
+        self.assertEqual(metrics['quota_errors'], 1)
+        self.assertEqual(metrics['retries'], 1)
+        self.assertGreater(metrics['throttle_wait_seconds'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
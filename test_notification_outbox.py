@@ -0,0 +1,268 @@
+
+import json
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+from flask import Flask
+
+try:
+    from database import db
+except ImportError:
+    import sys
+    import os
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from database import db
+
+from models import MarketAlarmLog, NotificationOutbox
+from notification_outbox import (OutboxDispatcher, OutboxSender, enqueue_many, enqueue_notification,
+                                 requeue_dead_letter)
+
+
+class TestNotificationOutbox(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        self.fcm = MagicMock()
+        self.dispatcher = OutboxDispatcher(sender=self.fcm)
+        self.dispatcher.base_backoff = 30
+        self.dispatcher.max_backoff = 3600
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def _alarm_log(self, total_users):
+        log = MarketAlarmLog(market_id=1, alert_type='rain', alert_title='rain', alert_body='body',
+                             total_users=total_users, success_count=0, failure_count=0)
+        db.session.add(log)
+        db.session.commit()
+        return log
+
+    def test_idempotency_key_enqueues_once(self):
+        """같은 idempotency_key는 단건/일괄 적재 모두 한 번만 적재"""
+        entry, created = enqueue_notification('title', 'body', tokens=['t1'], idempotency_key='key-1')
+        again, created_again = enqueue_notification('title', 'body', tokens=['t1'], idempotency_key='key-1')
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(entry.id, again.id)
+
+        messages = [
+            {'title': 'a', 'body': 'a', 'tokens': ['t2'], 'idempotency_key': 'key-1'},
+            {'title': 'b', 'body': 'b', 'tokens': ['t3'], 'idempotency_key': 'key-2'},
+            {'title': 'b', 'body': 'b', 'tokens': ['t3'], 'idempotency_key': 'key-2'},
+        ]
+        self.assertEqual(enqueue_many(messages), 1)
+        self.assertEqual(NotificationOutbox.query.count(), 2)
+
+    def test_backoff_grows_exponentially_with_cap(self):
+        for attempts, base in ((1, 30), (2, 60), (3, 120)):
+            delay = self.dispatcher._backoff_seconds(attempts)
+            self.assertGreaterEqual(delay, base * 0.8)
+            self.assertLessEqual(delay, base * 1.2)
+        self.assertLessEqual(self.dispatcher._backoff_seconds(20), 3600 * 1.2)
+
+    def test_failed_tokens_retry_then_dead_letter(self):
+        """실패 토큰만 백오프 후 재시도, 최대 시도 횟수를 넘기면 데드레터"""
+        entry, _ = enqueue_notification('title', 'body', tokens=['ok', 'bad', 'gone'],
+                                        idempotency_key='retry', max_attempts=2)
+        self.fcm.send_multicast.return_value = {
+            'success_count': 1, 'failure_count': 2,
+            'failed_tokens': ['bad', 'gone'], 'invalid_tokens': ['gone']
+        }
+
+        self.assertEqual(self.dispatcher.run_once(), 1)
+        entry = db.session.get(NotificationOutbox, entry.id)
+        self.assertEqual(entry.status, 'pending')
+        self.assertEqual(entry.tokens, ['bad'])
+        self.assertGreater(entry.next_attempt_at, datetime.utcnow() + timedelta(seconds=20))
+
+        # 백오프 전에는 가져가지 않음
+        self.assertEqual(self.dispatcher.run_once(), 0)
+
+        entry.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+        self.fcm.send_multicast.return_value = {
+            'success_count': 0, 'failure_count': 1, 'failed_tokens': ['bad'], 'invalid_tokens': []
+        }
+        self.assertEqual(self.dispatcher.run_once(), 1)
+        self.assertEqual(self.fcm.send_multicast.call_args.args[0], ['bad'])
+
+        entry = db.session.get(NotificationOutbox, entry.id)
+        self.assertEqual(entry.status, 'dead')
+        self.assertEqual(entry.attempts, 2)
+
+    def test_expired_lease_is_reclaimed(self):
+        """'sending'으로 남은 메시지는 임대 시간이 지난 것만 다시 가져감"""
+        stale, _ = enqueue_notification('stale', 'body', tokens=['t1'], idempotency_key='stale')
+        fresh, _ = enqueue_notification('fresh', 'body', tokens=['t2'], idempotency_key='fresh')
+        stale.status = fresh.status = 'sending'
+        stale.locked_at = datetime.utcnow() - timedelta(seconds=self.dispatcher.lease_seconds + 60)
+        fresh.locked_at = datetime.utcnow()
+        db.session.commit()
+
+        claimed = self.dispatcher._claim_due()
+        self.assertEqual([message['id'] for message in claimed], [stale.id])
+
+    def test_outcome_written_back_to_alarm_log(self):
+        """전송이 끝난 메시지의 결과를 연결된 알림 이력의 성공/실패 사용자 수에 반영"""
+        log = self._alarm_log(total_users=4)
+        sender = OutboxSender()
+        with sender.batch():
+            sender.send_notification('t1', 'title', 'body', alarm_log_ids=[log.id])
+            sender.send_multicast(['t2', 't3'], 'title', 'body', alarm_log_ids=[log.id])
+            self.assertEqual(NotificationOutbox.query.count(), 0)
+        # 범위가 끝날 때 한 번에 적재
+        self.assertEqual(NotificationOutbox.query.count(), 2)
+        topic = sender.send_to_topic('market_1', 'title', 'body', alarm_log_ids=[log.id], recipient_count=2)
+        self.assertTrue(topic)
+        self.assertEqual(NotificationOutbox.query.count(), 3)
+
+        # 단건 전송 실패 -> 데드레터, 멀티캐스트는 한 대만 성공, 주제 전송 성공
+        self.fcm.send_multicast.side_effect = lambda tokens, *args: (
+            {'success_count': 0, 'failure_count': 1, 'failed_tokens': tokens, 'invalid_tokens': []}
+            if tokens == ['t1'] else
+            {'success_count': 1, 'failure_count': 1, 'failed_tokens': ['t3'], 'invalid_tokens': ['t3']}
+        )
+        self.fcm.send_to_topic.return_value = True
+        NotificationOutbox.query.update({'max_attempts': 1})
+        db.session.commit()
+
+        self.dispatcher.run_once()
+
+        log = db.session.get(MarketAlarmLog, log.id)
+        self.assertEqual((log.success_count, log.failure_count), (3, 1))
+
+        # 데드레터 재시도 시 반영했던 실패를 되돌림
+        dead = NotificationOutbox.query.filter_by(status='dead').one()
+        requeue_dead_letter(dead.id)
+        log = db.session.get(MarketAlarmLog, log.id)
+        self.assertEqual((log.success_count, log.failure_count), (3, 0))
+
+    def test_alerts_coalesce_into_pending_message(self):
+        """같은 사용자에게 적재되는 알림은 전송 전 대기 메시지에 병합 (같은 시장은 최신으로 대체)"""
+        from weather_alerts import merge_pending_alerts
+
+        sender = OutboxSender(coalesce_window_seconds=60, merge=merge_pending_alerts)
+        rain = {'type': 'rain_alert', 'market_id': '1', 'market_name': 'MarketA', 'alerts': json.dumps([{'pop': 80}])}
+        heat = {'type': 'weather_alert', 'market_id': '2', 'market_name': 'MarketB',
+                'alerts': json.dumps({'high_temp': [{'temperature': 35}]})}
+        rain_update = dict(rain, alerts=json.dumps([{'pop': 90}]))
+
+        sender.send_notification('token-a', 'rain', 'rain body', rain, alarm_log_ids=[1])
+        sender.send_notification('token-b', 'rain', 'rain body', rain, alarm_log_ids=[1])
+        with sender.batch():
+            sender.send_notification('token-a', 'heat', 'heat body', heat, alarm_log_ids=[2])
+        sender.send_notification('token-b', 'rain 2', 'rain body 2', rain_update, alarm_log_ids=[3])
+        # 병합 대상이 아닌 알림은 그대로 적재
+        sender.send_notification('token-a', 'notice', 'body', {'type': 'admin_notice'})
+
+        self.assertEqual(NotificationOutbox.query.count(), 3)
+        merged = NotificationOutbox.query.filter(NotificationOutbox.tokens == ['token-a'],
+                                                 NotificationOutbox.coalesce_key.isnot(None)).one()
+        self.assertEqual(merged.title, '2개 시장 날씨 알림')
+        self.assertEqual(merged.data['type'], 'weather_summary_alert')
+        self.assertEqual(merged.alarm_log_ids, [1, 2])
+
+        replaced = NotificationOutbox.query.filter(NotificationOutbox.tokens == ['token-b']).one()
+        self.assertEqual((replaced.title, replaced.data['alerts']), ('rain 2', rain_update['alerts']))
+        self.assertEqual(replaced.alarm_log_ids, [1, 3])
+        self.assertEqual(sender.metrics()['coalesced'], 2)
+
+        # 병합 대기 시간 동안은 전송 워커가 가져가지 않음
+        self.assertEqual([m['title'] for m in self.dispatcher._claim_due()], ['notice'])
+
+    def test_multicast_coalesces_with_per_user_send(self):
+        """여러 사용자 멀티캐스트는 사용자별로 나눠 적재되어 다른 경로의 사용자별 알림과 병합"""
+        from weather_alerts import merge_pending_alerts
+
+        sender = OutboxSender(coalesce_window_seconds=60, merge=merge_pending_alerts)
+        rain = {'type': 'rain_alert', 'market_id': '1', 'market_name': 'MarketA', 'alerts': json.dumps([{'pop': 80}])}
+        heat = {'type': 'weather_alert', 'market_id': '2', 'market_name': 'MarketB',
+                'alerts': json.dumps({'high_temp': [{'temperature': 35}]})}
+
+        # 시장 단위 멀티캐스트 (b는 기기 2대)
+        result = sender.send_multicast(['tok-a', 'tok-b1', 'tok-b2'], 'rain', 'rain body', rain,
+                                       alarm_log_ids=[1], recipient_count=2,
+                                       token_groups=[['tok-a'], ['tok-b1', 'tok-b2']])
+        self.assertEqual(result['enqueued_count'], 3)
+        self.assertEqual(NotificationOutbox.query.count(), 2)
+
+        # 사용자별 전송 경로의 알림이 같은 수신자의 대기 메시지에 병합
+        sender.send_notification('tok-a', 'heat', 'heat body', heat, alarm_log_ids=[2])
+        sender.send_multicast(['tok-b1', 'tok-b2'], 'heat', 'heat body', heat, alarm_log_ids=[2],
+                              token_groups=[['tok-b1', 'tok-b2']])
+
+        self.assertEqual(sender.metrics()['coalesced'], 2)
+        entries = NotificationOutbox.query.order_by(NotificationOutbox.id).all()
+        self.assertEqual([entry.tokens for entry in entries], [['tok-a'], ['tok-b1', 'tok-b2']])
+        for entry in entries:
+            self.assertEqual(entry.data['type'], 'weather_summary_alert')
+            self.assertEqual(entry.alarm_log_ids, [1, 2])
+            self.assertEqual(entry.recipient_count, 1)
+
+        # 묶음이 없으면 토큰마다 한 건
+        sender.send_multicast(['tok-c', 'tok-d'], 'rain', 'rain body', rain)
+        self.assertEqual(NotificationOutbox.query.count(), 4)
+        sender.send_notification('tok-c', 'heat', 'heat body', heat)
+        self.assertEqual(NotificationOutbox.query.count(), 4)
+        self.assertEqual(sender.metrics()['coalesced'], 3)
+
+    def test_market_weather_alert_links_pending_alarm_log(self):
+        """시장 단위 날씨 알림은 알림 이력을 0건으로 먼저 기록하고 전송 결과를 사용자 수로 반영"""
+        from models import Market, User, UserMarketInterest
+        from user_devices import register_device
+        from weather_alerts import WeatherAlertSystem
+
+        market = Market(name='MarketA', location='Seoul', nx=60, ny=127)
+        db.session.add(market)
+        users = []
+        for name in ('alice', 'bob'):
+            user = User(name=name, email=f'{name}@example.com', password_hash='x', fcm_enabled=True)
+            db.session.add(user)
+            users.append(user)
+        db.session.commit()
+        register_device(users[0], 'alice-phone', None)
+        register_device(users[1], 'bob-phone', None)
+        register_device(users[1], 'bob-tablet', None)
+        for user in users:
+            db.session.add(UserMarketInterest(user_id=user.id, market_id=market.id))
+        db.session.commit()
+
+        engine = WeatherAlertSystem(sender=OutboxSender())
+        weather_info = {'alerts': {'strong_wind': [{'wind_speed': 15, 'time_str': '10월 19일 14시'}]}, 'checked_hours': 24}
+        result = engine.send_weather_alert_to_users(market, weather_info)
+        self.assertEqual((result['sent_count'], result['enqueued_count']), (0, 3))
+
+        log = MarketAlarmLog.query.one()
+        self.assertEqual((log.total_users, log.success_count, log.failure_count), (2, 0, 0))
+        entry = NotificationOutbox.query.one()
+        self.assertEqual((entry.alarm_log_ids, entry.recipient_count), ([log.id], 2))
+
+        self.fcm.send_multicast.return_value = {
+            'success_count': 3, 'failure_count': 0, 'failed_tokens': [], 'invalid_tokens': []
+        }
+        self.dispatcher.run_once()
+        log = db.session.get(MarketAlarmLog, log.id)
+        self.assertEqual((log.success_count, log.failure_count), (2, 0))
+
+    def test_sender_reports_enqueued_not_sent(self):
+        sender = OutboxSender()
+        result = sender.send_multicast(['t1', 't2'], 'title', 'body')
+        self.assertTrue(sender.queued)
+        self.assertEqual(result['success_count'], 0)
+        self.assertEqual(result['enqueued_count'], 2)
+        # 애플리케이션 컨텍스트가 있으면 바로 적재
+        self.assertEqual(NotificationOutbox.query.count(), 1)
+        self.assertEqual(sender.flush(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
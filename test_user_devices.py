@@ -0,0 +1,93 @@
+
+import unittest
+
+from flask import Flask
+
+try:
+    from database import db
+except ImportError:
+    import sys
+    import os
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from database import db
+
+from models import User, UserDevice
+from user_devices import assign_tokens, backfill_user_devices, register_device, user_tokens
+
+
+class TestUserDevices(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        self.alice = self._user('alice')
+        self.bob = self._user('bob')
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def _user(self, name, fcm_token=None):
+        user = User(name=name, email=f'{name}@example.com', password_hash='x',
+                    fcm_token=fcm_token, fcm_enabled=True)
+        db.session.add(user)
+        db.session.commit()
+        return user
+
+    def test_register_device_upserts_by_token(self):
+        """같은 사용자의 재등록은 기기 정보만 갱신하고 행을 늘리지 않음"""
+        self.assertIsNone(register_device(self.alice, 'token-1', {'platform': 'Android'}))
+        db.session.commit()
+        self.assertIsNone(register_device(self.alice, 'token-1', {'platform': 'iOS'}))
+        db.session.commit()
+
+        device = UserDevice.query.filter_by(token='token-1').one()
+        self.assertEqual(device.user_id, self.alice.id)
+        self.assertEqual(device.platform, 'ios')
+        self.assertEqual(self.alice.fcm_token, 'token-1')
+
+    def test_register_device_transfers_ownership(self):
+        """다른 사용자의 토큰을 등록하면 현재 사용자에게 이동하고 이전 소유자를 반환"""
+        register_device(self.alice, 'alice-tablet', None)
+        register_device(self.alice, 'shared', None)
+        db.session.commit()
+
+        self.assertEqual(register_device(self.bob, 'shared', None), self.alice.id)
+        db.session.commit()
+
+        self.assertEqual(UserDevice.query.filter_by(token='shared').one().user_id, self.bob.id)
+        self.assertEqual(UserDevice.query.count(), 2)
+        self.assertEqual(user_tokens(self.bob), ['shared'])
+        self.assertEqual(self.alice.fcm_token, 'shared')
+        # 정리 전 남은 대표 토큰은 실행 단위 배정에서 현재 소유자에게만
+        self.assertEqual(assign_tokens([self.alice, self.bob]), {self.alice.id: ['alice-tablet'], self.bob.id: ['shared']})
+
+    def test_backfill_clears_token_on_losing_users(self):
+        """같은 대표 토큰을 가진 사용자가 여럿이면 한 명에게만 등록하고 나머지의 대표 토큰은 정리"""
+        carol = self._user('carol', fcm_token='shared')
+        dave = self._user('dave', fcm_token='shared')
+        erin = self._user('erin', fcm_token='erin-phone')
+
+        self.assertEqual(backfill_user_devices(), 2)
+        db.session.expire_all()
+
+        owner = UserDevice.query.filter_by(token='shared').one().user_id
+        loser = carol if owner == dave.id else dave
+        self.assertIsNone(loser.fcm_token)
+        self.assertFalse(loser.fcm_enabled)
+        self.assertEqual(db.session.get(User, owner).fcm_token, 'shared')
+        self.assertEqual(erin.fcm_token, 'erin-phone')
+        self.assertEqual(assign_tokens([carol, dave, erin])[owner], ['shared'])
+
+        # 다시 실행해도 변화 없음
+        self.assertEqual(backfill_user_devices(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
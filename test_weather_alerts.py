@@ -87,5 +87,132 @@ class TestWeatherAlertSystem(unittest.TestCase):
         
         print(f"Generated Weather String: {weather_str}")
 
+    def test_parallel_dispatch_accumulates_results(self):
+        """병렬 전송 단계가 사용자별 결과를 시장별 카운트로 정확히 모으는지 확인"""
+        markets = []
+        for market_id in range(1, 5):
+            market = MagicMock()
+            market.id = market_id
+            market.name = f"Market{market_id}"
+            markets.append(market)
+
+        user_batches = {}
+        for user_id in range(1, 51):
+            user = MagicMock()
+            user.id = user_id
+            # 짝수 사용자는 3개 시장(요약), 홀수 사용자는 1개 시장(개별)
+            watched = markets[:3] if user_id % 2 == 0 else markets[3:]
+            user_batches[user_id] = {
+                'user': user,
+                'alerts': [{'market': m, 'weather_info': {'alerts': {}}} for m in watched]
+            }
+
+        self.alert_system.dispatch_workers = 4
+        self.alert_system.dispatch_max_in_flight = 3
+        self.alert_system.send_summary_alert_to_user = MagicMock(return_value=True)
+        # 개별 알림은 user_id가 5의 배수일 때 실패
+        self.alert_system.send_individual_alert_to_user = MagicMock(
+            side_effect=lambda user, market, info: user.id % 5 != 0
+        )
+
+        accumulator = self.alert_system._dispatch_user_batches(user_batches, [m.id for m in markets])
+
+        # 요약 25건 + 개별 성공 20건 (홀수 25명 중 5의 배수 5명 실패)
+        self.assertEqual(accumulator.messages_sent, 45)
+        for market_id in (1, 2, 3):
+            self.assertEqual(accumulator.market_counts[market_id], {'success': 25, 'failure': 0})
+        self.assertEqual(accumulator.market_counts[4], {'success': 20, 'failure': 5})
+
+    def test_topic_delivery_plan_keeps_exceptions_on_tokens(self):
+        """주제 구독자 전원이 개별 알림 대상일 때만 주제로 전송하고 나머지는 사용자별 전송 유지"""
+        from market_topics import market_topic_name
+
+        markets = {}
+        for market_id in range(1, 7):
+            market = MagicMock()
+            market.id = market_id
+            market.name = f"Market{market_id}"
+            markets[market_id] = market
+
+        def make_user(user_id, market_ids, recorded=True):
+            user = MagicMock()
+            user.id = user_id
+            user.fcm_topics = [market_topic_name(m) for m in market_ids] if recorded else []
+            return user
+
+        # 1: 주제 전송 가능, 2: 방해금지 구독자, 3~5: 요약 대상(3개 시장), 6: 기기 2대 / 주제 미기록
+        plain = make_user(1, [1])
+        dnd = make_user(2, [2])
+        summary = make_user(3, [3, 4, 5])
+        multi_device = make_user(4, [6])
+        unrecorded = make_user(5, [1], recorded=False)
+        subscribers = {
+            1: [plain], 2: [plain, dnd], 3: [summary], 4: [summary], 5: [summary], 6: [multi_device]
+        }
+        recipients = {1: [plain], 2: [plain], 3: [summary], 4: [summary], 5: [summary], 6: [multi_device]}
+
+        user_batches = {
+            plain.id: {'user': plain, 'alerts': [], 'tokens': ['plain-token']},
+            summary.id: {'user': summary, 'alerts': [], 'tokens': ['summary-token']},
+            multi_device.id: {'user': multi_device, 'alerts': [], 'tokens': ['phone', 'tablet']},
+        }
+        for market_id in (1, 2):
+            user_batches[plain.id]['alerts'].append({'market': markets[market_id]})
+        for market_id in (3, 4, 5):
+            user_batches[summary.id]['alerts'].append({'market': markets[market_id]})
+        user_batches[multi_device.id]['alerts'].append({'market': markets[6]})
+
+        active_market_alerts = [
+            {'market': markets[m], 'users': recipients[m], 'subscribers': subscribers[m]}
+            for m in range(1, 7)
+        ]
+
+        topic_alerts = self.alert_system._plan_topic_delivery(active_market_alerts, user_batches)
+        self.assertEqual([a['market'].id for a in topic_alerts], [1])
+        self.assertEqual(topic_alerts[0]['topic'], market_topic_name(1))
+        self.assertEqual([a['market'].id for a in user_batches[plain.id]['alerts']], [2])
+        self.assertEqual(len(user_batches[summary.id]['alerts']), 3)
+        self.assertEqual(len(user_batches[multi_device.id]['alerts']), 1)
+
+        # 주제 구독이 기록되지 않은 구독자가 있으면 개별 전송
+        user_batches[unrecorded.id] = {'user': unrecorded, 'alerts': [{'market': markets[1]}], 'tokens': ['u-token']}
+        user_batches[plain.id]['alerts'].insert(0, {'market': markets[1]})
+        market_1 = dict(active_market_alerts[0], users=[plain, unrecorded], subscribers=[plain, unrecorded])
+        self.assertEqual(self.alert_system._plan_topic_delivery([market_1], user_batches), [])
+        self.assertEqual(len(user_batches[unrecorded.id]['alerts']), 1)
+
+    def test_incremental_memo_reevaluates_new_forecast_hours(self):
+        """같은 발표라도 새 예보 시각이 평가 구간에 들어오면 재평가, 발표 전체가 구간 안이면 생략"""
+        from datetime import datetime
+        from models import MarketEvaluationMemo
+
+        forecast_input = ('issuance-hash', datetime(2026, 10, 19, 14, 0))
+        config_version = 'config'
+
+        def run_at(hour, hours):
+            self.alert_system.reference_time = datetime(2026, 10, 19, hour, 10)
+            return self.alert_system._evaluation_input_hash(forecast_input, hours)
+
+        # 3시간 구간: 09시 실행(~12:10)과 10시 실행(~13:10)은 새 예보 시각이 들어오므로 재평가
+        memo = MarketEvaluationMemo(forecast_hash=run_at(9, 3), config_version=config_version)
+        self.assertFalse(memo.matches(run_at(10, 3), config_version))
+
+        # 11시 실행(~14:10)부터는 마지막 예보(14시)까지 구간 안이므로 다음 실행은 생략
+        memo = MarketEvaluationMemo(forecast_hash=run_at(11, 3), config_version=config_version)
+        self.assertTrue(memo.matches(run_at(12, 3), config_version))
+
+        # 24시간 구간은 처음부터 발표 전체를 포함
+        self.assertEqual(run_at(9, 24), run_at(13, 24))
+
+        # 발표 내용이 바뀌면 재평가
+        changed = self.alert_system._evaluation_input_hash(('other-hash', forecast_input[1]), 24)
+        self.assertNotEqual(run_at(13, 24), changed)
+
+        # 마지막 예보 시각을 모르면 정시마다 재평가
+        self.alert_system.reference_time = datetime(2026, 10, 19, 9, 10)
+        unknown_9 = self.alert_system._evaluation_input_hash(('issuance-hash', None), 24)
+        self.alert_system.reference_time = datetime(2026, 10, 19, 10, 10)
+        self.assertNotEqual(unknown_9, self.alert_system._evaluation_input_hash(('issuance-hash', None), 24))
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+FCM 토큰 사전 검증 작업
+
+저장된 기기 토큰(user_devices)을 한산한 시간대에 FCM dry-run 전송(기기에는 전달되지 않음)으로
+대량 검증합니다. 무효 토큰은 FCMService의 정리 대상으로 모았다가 prune_invalid_tokens로
+한 번에 비우므로, 이후 알림 실행은 죽은 기기에 요청을 보내지 않습니다.
+
+검증은 별도 속도 제한(TOKEN_VALIDATION_RATE_PER_SECOND) 아래에서 진행되고, 실행 시간
+상한을 넘기면 멈춘 뒤 다음 실행에서 이어서 검증합니다 (기기 ID 커서).
+
+환경변수:
+    TOKEN_VALIDATION_ENABLED           스케줄 실행 여부 (기본 true)
+    TOKEN_VALIDATION_CRON_HOUR         실행 시각(시) (기본 4 → 04:30)
+    TOKEN_VALIDATION_RATE_PER_SECOND   초당 dry-run 요청 수 (기본 50)
+    TOKEN_VALIDATION_BATCH_SIZE        한 번에 조회/검증하는 토큰 수 (기본 500)
+    TOKEN_VALIDATION_MAX_TOKENS        1회 실행당 최대 검증 토큰 수 (기본 50000)
+    TOKEN_VALIDATION_MAX_RUNTIME_SECONDS  1회 실행 시간 상한 (기본 1500초, 다음 정각 알림 전에 종료)
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Tuple
+
+from database import db
+from models import UserDevice
+from fcm_integration.fcm_utils import fcm_service
+from fcm_integration.rate_governor import RateGovernor
+
+logger = logging.getLogger(__name__)
+
+
+class TokenValidator:
+    """저장된 FCM 토큰을 배치 단위로 dry-run 검증하고 무효 토큰을 일괄 정리"""
+
+    def __init__(self, sender=None):
+        self.sender = sender or fcm_service
+        self.rate_per_second = float(os.environ.get('TOKEN_VALIDATION_RATE_PER_SECOND', '50'))
+        self.batch_size = int(os.environ.get('TOKEN_VALIDATION_BATCH_SIZE', '500'))
+        self.max_tokens = int(os.environ.get('TOKEN_VALIDATION_MAX_TOKENS', '50000'))
+        self.max_runtime_seconds = float(os.environ.get('TOKEN_VALIDATION_MAX_RUNTIME_SECONDS', '1500'))
+
+        # 알림 전송과 공유하는 FCM 할당량과 별개로, 검증 요청 자체의 속도 제한
+        self.governor = RateGovernor(rate_per_second=self.rate_per_second)
+
+        # 다음 실행에서 이어서 검증할 기기 ID (전체를 한 번 돌면 0으로 초기화)
+        self._cursor = 0
+        self._run_lock = threading.Lock()
+        self.last_result = None
+
+    def _next_batch(self, after_id: int, limit: int) -> List[Tuple[int, str]]:
+        """기기 토큰을 ID 순서로 조회 (키셋 페이지네이션)"""
+        return db.session.query(UserDevice.id, UserDevice.token).filter(
+            UserDevice.id > after_id
+        ).order_by(UserDevice.id).limit(limit).all()
+
+    def _validate(self, token: str) -> str:
+        self.governor.acquire()
+        return self.sender.validate_token(token)
+
+    def _validate_batch(self, tokens: List[str]) -> List[str]:
+        """토큰별 검증 (FCMService 공유 전송 풀에서 동시 실행, 입력 순서대로 결과 반환)"""
+        get_executor = getattr(self.sender, '_get_executor', None)
+        if get_executor is None or len(tokens) == 1:
+            return [self._validate(token) for token in tokens]
+        return list(get_executor().map(self._validate, tokens))
+
+    def run(self) -> Dict[str, Any]:
+        """
+        토큰 검증 1회 실행 (애플리케이션 컨텍스트 필요)
+
+        Returns:
+            dict: 검증/무효/오류 토큰 수, 정리 건수, 다음 커서 등
+        """
+        if not self._run_lock.acquire(blocking=False):
+            return {'success': False, 'error': '토큰 검증이 이미 실행 중입니다.'}
+
+        try:
+            started = time.monotonic()
+            result = {'checked': 0, 'valid': 0, 'invalid': 0, 'error': 0,
+                      'pruned_users': 0, 'completed_cycle': False, 'stopped_early': False}
+            cursor = self._cursor
+
+            while result['checked'] < self.max_tokens:
+                if time.monotonic() - started >= self.max_runtime_seconds:
+                    result['stopped_early'] = True
+                    break
+
+                rows = self._next_batch(cursor, min(self.batch_size, self.max_tokens - result['checked']))
+                if not rows:
+                    # 전체 기기를 한 바퀴 검증함 - 다음 실행은 처음부터
+                    cursor = 0
+                    result['completed_cycle'] = True
+                    break
+
+                cursor = rows[-1][0]
+                # token은 유일하지만 방어적으로 중복 제거
+                tokens = list(dict.fromkeys(token for _, token in rows))
+                db.session.rollback()  # 검증 중 DB 연결/트랜잭션을 붙잡지 않음
+
+                for outcome in self._validate_batch(tokens):
+                    result[outcome] += 1
+                result['checked'] += len(tokens)
+
+                # 배치마다 무효 토큰을 DELETE/UPDATE 한 번으로 정리
+                result['pruned_users'] += self.sender.prune_invalid_tokens()
+
+            self._cursor = cursor
+            result.update({
+                'success': True,
+                'next_cursor': cursor,
+                'elapsed_seconds': round(time.monotonic() - started, 1),
+                'rate_governor': self.governor.metrics()
+            })
+            self.last_result = result
+            logger.info(
+                f"FCM 토큰 검증 완료: {result['checked']}개 확인 "
+                f"(유효 {result['valid']}, 무효 {result['invalid']}, 판단 불가 {result['error']}), "
+                f"정리 {result['pruned_users']}건 (기기 삭제 + 대표 토큰 교체)"
+            )
+            return result
+
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"FCM 토큰 검증 중 오류: {e}")
+            return {'success': False, 'error': str(e)}
+        finally:
+            self._run_lock.release()
+
+
+def token_validation_enabled() -> bool:
+    return os.environ.get('TOKEN_VALIDATION_ENABLED', 'true').lower() in ['true', 'on', '1']
+
+
+token_validator = TokenValidator()
+
+
+def validate_stored_tokens() -> Dict[str, Any]:
+    """저장된 FCM 토큰 검증 (외부에서 호출용, 애플리케이션 컨텍스트 필요)"""
+    return token_validator.run()
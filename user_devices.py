@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+사용자 기기(FCM 토큰) 관리
+
+user_devices 테이블은 기기별 FCM 토큰을 token 유일 인덱스로 보관합니다.
+토큰 등록은 token 기준 upsert 한 번으로 처리되어(다른 계정에 있던 토큰은 현재 사용자에게 이동)
+users 테이블 전체를 훑지 않고, 알림 fan-out은 대상 사용자들의 기기 토큰을 한 번에 조회해
+사용자/기기 간 중복을 제거한 뒤 전송합니다.
+
+User.fcm_token은 기존 코드와의 호환을 위해 가장 최근에 등록한 기기의 토큰으로 유지합니다.
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import case, exists, func, insert, literal, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from database import db
+from models import User, UserDevice
+
+logger = logging.getLogger(__name__)
+
+# IN 절 하나에 넣는 최대 사용자 수
+LOOKUP_CHUNK_SIZE = 1000
+
+PLATFORMS = ('android', 'ios', 'web')
+
+
+def detect_platform(device_info: Optional[Dict]) -> Optional[str]:
+    """클라이언트가 보낸 device_info에서 플랫폼 추출"""
+    if not device_info:
+        return None
+    platform = str(device_info.get('platform') or device_info.get('os') or '').lower()
+    if platform in ('iphone', 'ipad', 'ios'):
+        return 'ios'
+    return platform if platform in PLATFORMS else None
+
+
+def _upsert_statement(values: Dict):
+    """token 기준 upsert 문 (PostgreSQL/SQLite는 ON CONFLICT, 그 외 None)"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        dialect_insert = postgresql.insert
+    elif dialect == 'sqlite':
+        dialect_insert = sqlite.insert
+    else:
+        return None
+
+    statement = dialect_insert(UserDevice).values(**values)
+    return statement.on_conflict_do_update(
+        index_elements=[UserDevice.token],
+        set_={
+            'user_id': statement.excluded.user_id,
+            'platform': statement.excluded.platform,
+            'device_info': statement.excluded.device_info,
+            'last_seen_at': statement.excluded.last_seen_at
+        }
+    )
+
+
+def register_device(user: User, token: str, device_info: Optional[Dict] = None,
+                    platform: Optional[str] = None) -> Optional[int]:
+    """
+    기기 토큰 등록/갱신 (커밋은 호출하는 쪽에서)
+
+    Returns:
+        Optional[int]: 토큰이 다른 사용자에게서 옮겨 왔다면 이전 사용자 ID
+    """
+    # token 유일 인덱스로 이전 소유자 확인
+    previous_owner = db.session.execute(
+        select(UserDevice.user_id).where(UserDevice.token == token)
+    ).scalar()
+
+    now = datetime.utcnow()
+    values = {
+        'user_id': user.id,
+        'token': token,
+        'platform': platform or detect_platform(device_info),
+        'device_info': device_info or None,
+        'created_at': now,
+        'last_seen_at': now
+    }
+
+    statement = _upsert_statement(values)
+    if statement is not None:
+        db.session.execute(statement)
+    else:
+        device = UserDevice.query.filter_by(token=token).first()
+        if device is None:
+            db.session.add(UserDevice(**values))
+        else:
+            device.user_id = user.id
+            device.platform = values['platform']
+            device.device_info = values['device_info']
+            device.last_seen_at = now
+
+    # 기존 코드 호환: 가장 최근 기기 토큰을 User.fcm_token으로
+    user.update_fcm_token(token, device_info)
+
+    if previous_owner is not None and previous_owner != user.id:
+        return previous_owner
+    return None
+
+
+def remove_device(user: User, token: str) -> bool:
+    """사용자의 기기 토큰 삭제 (로그아웃/알림 해제 기기). 대표 토큰이면 다른 기기 토큰으로 교체"""
+    deleted = UserDevice.query.filter_by(user_id=user.id, token=token).delete(synchronize_session=False)
+    if user.fcm_token == token:
+        user.fcm_token = db.session.execute(
+            select(UserDevice.token).where(UserDevice.user_id == user.id)
+            .order_by(UserDevice.last_seen_at.desc()).limit(1)
+        ).scalar()
+    return bool(deleted)
+
+
+def remove_user_devices(user: User) -> int:
+    """사용자의 모든 기기 토큰 삭제 (탈퇴 시)"""
+    return UserDevice.query.filter_by(user_id=user.id).delete(synchronize_session=False)
+
+
+def load_device_tokens(user_ids: Iterable[int]) -> Dict[int, List[str]]:
+    """
+    사용자별 기기 토큰을 한 번에 조회 (최근 기기 순)
+
+    Returns:
+        dict: {user_id: [token, ...]}
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    tokens: Dict[int, List[str]] = {}
+    for start in range(0, len(user_ids), LOOKUP_CHUNK_SIZE):
+        chunk = user_ids[start:start + LOOKUP_CHUNK_SIZE]
+        rows = db.session.query(UserDevice.user_id, UserDevice.token).filter(
+            UserDevice.user_id.in_(chunk)
+        ).order_by(UserDevice.user_id, UserDevice.last_seen_at.desc()).all()
+        for user_id, token in rows:
+            tokens.setdefault(user_id, []).append(token)
+    return tokens
+
+
+def user_tokens(user: User, device_tokens: Optional[Dict[int, List[str]]] = None) -> List[str]:
+    """사용자 1명의 전송 대상 토큰 (대표 토큰 + 기기 토큰, 중복 제거)"""
+    if device_tokens is None:
+        device_tokens = load_device_tokens([user.id])
+    candidates = [user.fcm_token] + device_tokens.get(user.id, [])
+    return list(dict.fromkeys(t for t in candidates if t))
+
+
+def assign_tokens(users: Iterable[User], device_tokens: Optional[Dict[int, List[str]]] = None) -> Dict[int, List[str]]:
+    """
+    여러 사용자의 전송 대상 토큰을 사용자별로 배정하되, 토큰 하나는 한 사용자에게만 배정 (순서 유지)
+
+    User.fcm_token이 기기 목록에 없고 다른 사용자의 기기로 등록되어 있으면(계정을 바꿔 로그인한
+    기기의 남은 대표 토큰) 현재 소유자가 아닌 사용자에게는 배정하지 않습니다. 어느 기기 목록에도
+    없는 토큰은 먼저 나온 사용자에게만 배정합니다.
+
+    Args:
+        device_tokens: load_device_tokens 결과 (없으면 한 번에 조회)
+
+    Returns:
+        dict: {user_id: [token, ...]} (배정된 토큰이 없는 사용자는 빈 리스트)
+    """
+    users = list({user.id: user for user in users}.values())
+    if device_tokens is None:
+        device_tokens = load_device_tokens(user.id for user in users)
+
+    # 기기 목록에 없는 대표 토큰의 현재 소유자
+    loose_tokens = list({
+        user.fcm_token for user in users
+        if user.fcm_token and user.fcm_token not in device_tokens.get(user.id, [])
+    })
+    owners = {}
+    for start in range(0, len(loose_tokens), LOOKUP_CHUNK_SIZE):
+        owners.update(db.session.execute(
+            select(UserDevice.token, UserDevice.user_id)
+            .where(UserDevice.token.in_(loose_tokens[start:start + LOOKUP_CHUNK_SIZE]))
+        ).all())
+
+    assigned = {}
+    seen = set()
+    for user in users:
+        tokens = []
+        for token in user_tokens(user, device_tokens):
+            if token in seen or owners.get(token, user.id) != user.id:
+                continue
+            seen.add(token)
+            tokens.append(token)
+        assigned[user.id] = tokens
+    return assigned
+
+
+def collect_tokens(users: Iterable[User], device_tokens: Optional[Dict[int, List[str]]] = None) -> List[str]:
+    """
+    여러 사용자의 전송 대상 토큰을 모아 사용자/기기 간 중복 제거 (순서 유지)
+
+    Args:
+        device_tokens: load_device_tokens 결과 (없으면 한 번에 조회)
+    """
+    return [token for tokens in assign_tokens(users, device_tokens).values() for token in tokens]
+
+
+def backfill_user_devices() -> int:
+    """
+    User.fcm_token만 있고 user_devices에 없는 토큰을 일괄 등록 (기존 데이터 이전용)
+
+    INSERT ... SELECT 한 번으로 처리하며, 같은 토큰을 가진 사용자가 여럿이면
+    가장 최근에 수정된 사용자에게 배정합니다 (토큰별 row_number).
+    배정받지 못한 사용자의 User.fcm_token은 자신의 최근 기기 토큰으로 바꾸고,
+    남은 기기가 없으면 비우고 알림 수신을 끕니다. (토큰 이동 시 register 경로와 같은 처리)
+
+    Returns:
+        int: 새로 등록된 기기 수
+    """
+    now = datetime.utcnow()
+    ranked = select(
+        User.id, User.fcm_token, User.device_info,
+        func.coalesce(User.updated_at, now).label('last_seen_at'),
+        func.row_number().over(
+            partition_by=User.fcm_token,
+            order_by=(func.coalesce(User.updated_at, datetime(1970, 1, 1)).desc(), User.id.desc())
+        ).label('rn')
+    ).where(User.fcm_token.isnot(None), User.fcm_token != '').subquery()
+
+    source = select(
+        ranked.c.id, ranked.c.fcm_token, ranked.c.device_info, literal(now), ranked.c.last_seen_at
+    ).where(
+        ranked.c.rn == 1,
+        ~exists().where(UserDevice.token == ranked.c.fcm_token)
+    )
+
+    result = db.session.execute(
+        insert(UserDevice).from_select(['user_id', 'token', 'device_info', 'created_at', 'last_seen_at'], source)
+    )
+    db.session.commit()
+
+    created = result.rowcount or 0
+
+    # 다른 사용자의 기기로 등록된 대표 토큰 정리
+    replacement = select(UserDevice.token).where(UserDevice.user_id == User.id) \
+        .order_by(UserDevice.last_seen_at.desc()).limit(1).scalar_subquery()
+    cleared = db.session.execute(
+        update(User).where(
+            User.fcm_token.isnot(None),
+            exists().where(UserDevice.token == User.fcm_token, UserDevice.user_id != User.id)
+        ).values(
+            fcm_token=replacement,
+            fcm_enabled=case((replacement.is_(None), False), else_=User.fcm_enabled)
+        ).execution_options(synchronize_session=False)
+    ).rowcount or 0
+    db.session.commit()
+
+    if created or cleared:
+        logger.info(f"user_devices 백필: {created}개 기기 토큰 등록, 다른 사용자 기기의 대표 토큰 {cleared}건 정리")
+    return created
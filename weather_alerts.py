@@ -8,23 +8,198 @@
 """
 
 import os
+import json
+import time
+import hashlib
 import logging
+import threading
+from collections import defaultdict
+from contextlib import ExitStack, nullcontext
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import List, Dict, Any
+from flask import current_app, has_app_context
+from sqlalchemy import and_, func, insert
 from weather_api import KMAWeatherAPI
-from models import Market, User, UserMarketInterest, MarketAlarmLog
+from models import (Market, User, UserMarketInterest, MarketAlarmLog, ForecastFingerprint, MarketEvaluationMemo,
+                    Weather, WeatherLatest)
 from fcm_integration.fcm_utils import fcm_service
+from notification_outbox import OutboxSender, apply_alarm_log_outcomes
+from weather_cache import weather_response_cache
+from market_map import refresh_market_map
+from market_topics import market_topic_name, topic_delivery_enabled
+from user_devices import assign_tokens, user_tokens
+from weather_latest import get_latest_pointer, latest_forecast_query, load_latest_weather_by_grid
 from database import db
 
 # 로깅 설정
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class AlarmLogBulkWriter:
+    """
+    알림 실행 1회 동안 MarketAlarmLog 레코드를 모아 한 번에 기록
+
+    시장마다 ORM 객체를 만들어 add 하는 대신 payload(dict)를 모아 두었다가
+    flush() 시 단일 INSERT ... executemany 로 기록합니다.
+    """
+
+    def __init__(self):
+        self.payloads: List[Dict[str, Any]] = []
+        self.created_at = datetime.utcnow()
+
+    def add(self, payload: Dict[str, Any]):
+        """기록할 로그 payload 추가 (모든 payload는 동일한 키 구성을 가져야 함)"""
+        payload.setdefault('created_at', self.created_at)
+        self.payloads.append(payload)
+
+    def __len__(self):
+        return len(self.payloads)
+
+    def flush(self) -> int:
+        """모아둔 로그를 한 번에 기록하고 기록된 행 수 반환"""
+        if not self.payloads:
+            return 0
+
+        db.session.execute(insert(MarketAlarmLog), self.payloads)
+        db.session.commit()
+        # 관심 시장 대시보드의 최근 알림 갱신
+        weather_response_cache.invalidate_dashboards()
+
+        written = len(self.payloads)
+        self.payloads = []
+        return written
+
+    def flush_returning_ids(self) -> Dict[int, int]:
+        """모아둔 로그를 한 번에 기록하고 {market_id: 로그 id} 반환 (전송 결과를 나중에 반영할 때 사용)"""
+        if not self.payloads:
+            return {}
+
+        rows = db.session.execute(
+            insert(MarketAlarmLog).returning(MarketAlarmLog.id, MarketAlarmLog.market_id),
+            self.payloads
+        ).all()
+        db.session.commit()
+        weather_response_cache.invalidate_dashboards()
+
+        self.payloads = []
+        return {market_id: log_id for log_id, market_id in rows}
+
+
+class DispatchAccumulator:
+    """병렬 전송 결과를 모으는 스레드 안전 누산기"""
+
+    def __init__(self, market_ids):
+        self._lock = threading.Lock()
+        self.messages_sent = 0
+        self.market_counts = {market_id: {'success': 0, 'failure': 0} for market_id in market_ids}
+
+    def record(self, messages_sent: int, market_results: List[tuple]):
+        """사용자 1명 분량의 전송 결과 반영 (market_results: [(market_id, success), ...])"""
+        with self._lock:
+            self.messages_sent += messages_sent
+            for market_id, success in market_results:
+                counts = self.market_counts.get(market_id)
+                if counts is None:
+                    continue
+                counts['success' if success else 'failure'] += 1
+
+
+# 알림 종류 한글명 (요약 알림 본문 순서: 비, 눈, 폭염, 한파, 강풍)
+ALERT_TYPE_NAMES = {
+    'rain': '비',
+    'snow': '눈',
+    'high_temp': '폭염',
+    'low_temp': '한파',
+    'strong_wind': '강풍'
+}
+
+
+def build_summary_alert_content(summary_entries: List[Dict[str, Any]]) -> tuple:
+    """
+    여러 시장 요약 알림의 제목/본문/데이터 생성
+
+    Args:
+        summary_entries: [{'market_id', 'market_name', 'types': [알림 종류, ...]}, ...]
+
+    Returns:
+        tuple: (title, body, data)
+    """
+    market_names = [entry['market_name'] for entry in summary_entries]
+    count = len(market_names)
+
+    # 제목 생성
+    title = f"{count}개 시장 날씨 알림"
+
+    # 본문 생성 (시장A, 시장B 외 N곳...)
+    if count <= 2:
+        markets_str = ", ".join(market_names)
+    else:
+        markets_str = f"{market_names[0]}, {market_names[1]} 외 {count-2}곳"
+
+    # 실제 알림 종류 수집 후 한글 변환
+    unique_types = set()
+    for entry in summary_entries:
+        unique_types.update(entry['types'])
+
+    sort_order = list(ALERT_TYPE_NAMES.values())
+    type_names = [ALERT_TYPE_NAMES[t] for t in unique_types if t in ALERT_TYPE_NAMES]
+    type_names.sort(key=lambda x: sort_order.index(x))
+
+    if not type_names:
+        weather_str = "기상 특보"
+    else:
+        weather_str = ", ".join(type_names)
+
+    body = f"{markets_str}에 {weather_str} 등 주의할 날씨가 예상됩니다. 앱에서 상세 내용을 확인하세요."
+
+    # 데이터 페이로드 생성 (간소화)
+    notification_data = {
+        'type': 'weather_summary_alert',
+        'count': str(count),
+        'summary': json.dumps(summary_entries, ensure_ascii=False)
+    }
+    return title, body, notification_data
+
+
+def _summary_entries_from_alert_data(data: Dict[str, str]) -> List[Dict[str, Any]]:
+    """전송 대기 중인 알림 데이터에서 요약 항목 복원 (병합용)"""
+    if data.get('type') == 'weather_summary_alert':
+        return json.loads(data.get('summary') or '[]')
+
+    alerts = json.loads(data.get('alerts') or '{}')
+    if data.get('type') == 'rain_alert':
+        # 비 알림의 alerts는 시간대별 리스트
+        types = ['rain'] if alerts else []
+    else:
+        types = list(alerts.keys())
+    return [{'market_id': int(data['market_id']), 'market_name': data.get('market_name', ''), 'types': types}]
+
+
+def merge_pending_alerts(items: List[Dict[str, Any]]) -> tuple:
+    """
+    같은 사용자에게 짧은 시간 안에 쌓인 알림들을 요약 알림 한 건으로 병합 (아웃박스 병합용)
+
+    시장별로 나중에 온 알림의 알림 종류가 앞선 것을 대체합니다.
+    """
+    entries_by_market = {}
+    for item in items:
+        for entry in _summary_entries_from_alert_data(item['data']):
+            entries_by_market.pop(entry['market_id'], None)
+            entries_by_market[entry['market_id']] = entry
+    return build_summary_alert_content(list(entries_by_market.values()))
+
+
 class WeatherAlertSystem:
     """날씨 알림 시스템"""
     
-    def __init__(self):
-        """초기화"""
+    def __init__(self, sender=None):
+        """
+        초기화
+
+        Args:
+            sender: 알림 발송기 (send_notification/send_multicast 제공). None이면 FCM 서비스 사용
+        """
         self.service_key = os.environ.get('KMA_SERVICE_KEY')
         if not self.service_key:
             logger.warning("KMA_SERVICE_KEY가 설정되지 않았습니다. 날씨 알림 기능이 제한됩니다.")
@@ -41,6 +216,42 @@ class WeatherAlertSystem:
         }
         self.forecast_hours = 24  # 향후 24시간 예보 확인
 
+        # 사용자별 알림 병렬 전송 설정
+        self.dispatch_workers = int(os.environ.get('ALERT_DISPATCH_WORKERS', 8))  # 동시 전송 스레드 수
+        self.dispatch_max_in_flight = int(os.environ.get('ALERT_DISPATCH_MAX_IN_FLIGHT', 200))  # 대기 중인 사용자 배치 최대 수
+
+        # 알림 발송기 (드라이런/재생 시 no-op 발송기로 교체)
+        # 기본적으로 FCM을 직접 호출하지 않고 아웃박스에 적재해 전송 워커가 처리
+        # 사용자별 알림 병합 - 짧은 시간 안에 여러 경로에서 같은 사용자에게 적재된 알림을
+        # 아웃박스의 대기 메시지에 합쳐 요약 알림 한 건으로 전달
+        if sender is None and os.environ.get('NOTIFICATION_OUTBOX_ENABLED', 'true').lower() in ['true', 'on', '1']:
+            sender = OutboxSender(
+                coalesce_window_seconds=float(os.environ.get('ALERT_COALESCE_WINDOW_SECONDS', '60')),
+                merge=merge_pending_alerts
+            )
+        self.sender = sender or fcm_service
+
+        # 전송 방식 - 'topic'이면 시장 전체 알림을 시장 주제로 한 번에 전송 (요약/방해금지 예외는 개별 전송)
+        self.delivery_mode = 'topic' if topic_delivery_enabled() else 'token'
+
+        # 재생(replay) 설정 - 과거 시점 기준으로 알림 파이프라인을 다시 실행할 때 사용
+        self.reference_time = None  # 기준 시각 (로컬 시간, None이면 현재 시각)
+        self.forecast_source = None  # get_forecast(nx, ny, since, until) 제공 객체, None이면 DB 조회
+        self.api_fallback_enabled = True  # DB에 예보가 없을 때 기상청 API 호출 여부
+
+        # 증분 평가 - 예보 지문과 임계값 설정이 지난 평가와 같은 시장은 재평가 생략
+        self.incremental_enabled = os.environ.get('ALERT_INCREMENTAL_EVAL', 'true').lower() in ['true', 'on', '1']
+
+    def _now(self) -> datetime:
+        """알림 판단 기준 시각 (로컬 시간)"""
+        return self.reference_time or datetime.now()
+
+    def _utc_now(self) -> datetime:
+        """알림 판단 기준 시각 (UTC, created_at 비교용)"""
+        if self.reference_time is None:
+            return datetime.utcnow()
+        return self.reference_time - (datetime.now() - datetime.utcnow())
+
     def get_market_thresholds(self, market: Market) -> Dict[str, Any]:
         """
         시장의 알림 조건 가져오기
@@ -81,21 +292,34 @@ class WeatherAlertSystem:
         from models import Weather
         
         # 최근 2시간 내에 수집된 데이터만 사용 (스케줄러가 매 시간 수집함)
-        cutoff_time = datetime.utcnow() - timedelta(hours=2)
+        until_time = self._utc_now()
+        cutoff_time = until_time - timedelta(hours=2)
+
+        # 재생 모드에서는 보관된 스냅샷 등 별도 소스에서 조회
+        if self.forecast_source is not None:
+            return self.forecast_source.get_forecast(nx, ny, cutoff_time, until_time)
         
         try:
             with app.app_context():
-                # 최신 예보 데이터 조회 (api_type='forecast')
-                # created_at 기준으로 최근 데이터 필터링
-                forecasts = Weather.query.filter(
-                    Weather.nx == nx,
-                    Weather.ny == ny,
-                    Weather.api_type == 'forecast',
-                    Weather.created_at >= cutoff_time
-                ).order_by(
-                    Weather.fcst_date.asc(), 
-                    Weather.fcst_time.asc()
-                ).all()
+                if self.reference_time is None:
+                    # 최신 발표 포인터(기본키 조회)로 해당 발표의 예보 행만 조회
+                    pointer = get_latest_pointer(nx, ny, 'forecast')
+                    if pointer is None or pointer.collected_at is None or pointer.collected_at < cutoff_time:
+                        forecasts = []
+                    else:
+                        forecasts = latest_forecast_query(nx, ny, pointer).all()
+                else:
+                    # 재생 모드: 포인터는 현재 기준이므로 기준 시각 이전 2시간 내 수집된 이력에서 조회
+                    forecasts = Weather.query.filter(
+                        Weather.nx == nx,
+                        Weather.ny == ny,
+                        Weather.api_type == 'forecast',
+                        Weather.created_at >= cutoff_time,
+                        Weather.created_at <= until_time
+                    ).order_by(
+                        Weather.fcst_date.asc(),
+                        Weather.fcst_time.asc()
+                    ).all()
                 
                 if not forecasts:
                     return {'status': 'empty', 'message': 'No recent forecast data in DB'}
@@ -223,13 +447,13 @@ class WeatherAlertSystem:
                 }
             
             # FCM 토큰 수집 (방해금지 시간 체크 포함)
-            fcm_tokens = []
-            valid_users = []
-
-            for user in interested_users:
-                if user.can_receive_fcm() and not user.is_in_do_not_disturb_time():
-                    fcm_tokens.append(user.fcm_token)
-                    valid_users.append(user)
+            valid_users = [
+                user for user in interested_users
+                if user.can_receive_fcm() and not user.is_in_do_not_disturb_time()
+            ]
+            # 사용자별 기기 토큰을 한 번에 조회해 중복 제거
+            assigned_tokens = assign_tokens(valid_users)
+            fcm_tokens = [token for tokens in assigned_tokens.values() for token in tokens]
             
             if not fcm_tokens:
                 return {
@@ -264,21 +488,29 @@ class WeatherAlertSystem:
                 'alerts': json.dumps(rain_info.get('alerts', []), ensure_ascii=False)  # JSON 문자열로 변환
             }
             
-            result = fcm_service.send_multicast(
+            result = self.sender.send_multicast(
                 tokens=fcm_tokens,
                 title=title,
                 body=body,
-                data=notification_data
+                data=notification_data,
+                **self._token_group_kwargs(assigned_tokens)
             )
+            self._flush_sender()
             
             success_count = result.get('success_count', 0) if result else 0
+            # 아웃박스 발송기면 적재 수 (실제 전송 결과는 전송 워커가 처리)
+            enqueued_count = result.get('enqueued_count', 0) if result else 0
             
-            logger.info(f"{market.name} 비 알림: {len(valid_users)}명 중 {success_count}명에게 전송 성공")
+            if getattr(self.sender, 'queued', False):
+                logger.info(f"{market.name} 비 알림: {len(valid_users)}명 대상 {enqueued_count}개 토큰 적재")
+            else:
+                logger.info(f"{market.name} 비 알림: {len(valid_users)}명 중 {success_count}명에게 전송 성공")
             
             return {
                 'success': True,
                 'message': f'{market.name} 비 알림이 전송되었습니다.',
                 'sent_count': success_count,
+                'enqueued_count': enqueued_count,
                 'total_users': len(valid_users),
                 'fcm_result': result
             }
@@ -323,6 +555,9 @@ class WeatherAlertSystem:
                 
                 checked_count = 0
                 alerts_sent = 0
+                alerts_enqueued = 0
+                # 아웃박스 발송기면 적재 수를 따로 집계 (실제 전송 결과는 전송 워커가 처리)
+                queued = getattr(self.sender, 'queued', False)
                 results = []
                 
                 for market in markets_with_interest:
@@ -337,6 +572,7 @@ class WeatherAlertSystem:
                             
                             if alert_result.get('success'):
                                 alerts_sent += alert_result.get('sent_count', 0)
+                                alerts_enqueued += alert_result.get('enqueued_count', 0)
                             
                             results.append({
                                 'market': market.name,
@@ -357,13 +593,18 @@ class WeatherAlertSystem:
                             'error': str(e)
                         })
                 
-                logger.info(f"비 예보 확인 완료: {checked_count}개 시장 확인, {alerts_sent}건 알림 전송")
+                if queued:
+                    summary = f"{alerts_enqueued}건 알림 적재"
+                else:
+                    summary = f"{alerts_sent}건 알림 전송"
+                logger.info(f"비 예보 확인 완료: {checked_count}개 시장 확인, {summary}")
                 
                 return {
                     'success': True,
-                    'message': f'{checked_count}개 시장 확인 완료, {alerts_sent}건 알림 전송',
+                    'message': f'{checked_count}개 시장 확인 완료, {summary}',
                     'checked_markets': checked_count,
                     'alerts_sent': alerts_sent,
+                    'alerts_enqueued': alerts_enqueued if queued else 0,
                     'results': results
                 }
                 
@@ -378,7 +619,7 @@ class WeatherAlertSystem:
 
     def check_all_weather_conditions_for_market(self, market: Market, hours: int = None) -> Dict[str, Any]:
         """특정 시장의 모든 날씨 조건 확인 (비, 폭염, 한파, 강풍 등) - 시장별 설정 적용"""
-        if not self.weather_api:
+        if not self.weather_api and self.api_fallback_enabled:
             return {'has_alerts': False, 'error': 'Weather API not available'}
 
         hours = hours or self.forecast_hours
@@ -397,7 +638,7 @@ class WeatherAlertSystem:
 
             # Fallback
             if forecast_data.get('status') != 'success':
-                if self.weather_api:
+                if self.weather_api and self.api_fallback_enabled:
                     logger.info(f"DB 데이터 없음, API 호출 시도: {market.name}")
                     forecast_data = self.weather_api.get_forecast_weather(
                         market.nx,
@@ -419,7 +660,7 @@ class WeatherAlertSystem:
                 'snow': []
             }
 
-            current_time = datetime.now()
+            current_time = self._now()
             target_time = current_time + timedelta(hours=hours)
 
             for forecast in forecasts:
@@ -518,13 +759,13 @@ class WeatherAlertSystem:
                 }
 
             # FCM 토큰 수집 (방해금지 시간 체크 포함)
-            fcm_tokens = []
-            valid_users = []
-
-            for user in interested_users:
-                if user.can_receive_fcm() and not user.is_in_do_not_disturb_time():
-                    fcm_tokens.append(user.fcm_token)
-                    valid_users.append(user)
+            valid_users = [
+                user for user in interested_users
+                if user.can_receive_fcm() and not user.is_in_do_not_disturb_time()
+            ]
+            # 사용자별 기기 토큰을 한 번에 조회해 중복 제거
+            assigned_tokens = assign_tokens(valid_users)
+            fcm_tokens = [token for tokens in assigned_tokens.values() for token in tokens]
 
             if not fcm_tokens:
                 return {
@@ -546,91 +787,40 @@ class WeatherAlertSystem:
                 'alerts': json.dumps(alerts, ensure_ascii=False)  # JSON 문자열로 변환
             }
 
-            result = fcm_service.send_multicast(
+            # 아웃박스 발송기면 알림 로그를 성공/실패 0건으로 먼저 기록하고 메시지에 연결
+            # (실제 성공/실패 사용자 수는 전송 워커가 반영)
+            queued = getattr(self.sender, 'queued', False)
+            delivery_kwargs = self._token_group_kwargs(assigned_tokens)
+            if queued:
+                alarm_log_id = self._write_weather_alarm_log(market, title, body, weather_info, len(valid_users), 0, 0)
+                if alarm_log_id:
+                    delivery_kwargs.update(alarm_log_ids=[alarm_log_id], recipient_count=len(valid_users))
+
+            result = self.sender.send_multicast(
                 tokens=fcm_tokens,
                 title=title,
                 body=body,
-                data=notification_data
+                data=notification_data,
+                **delivery_kwargs
             )
+            self._flush_sender()
 
             success_count = result.get('success_count', 0) if result else 0
             failure_count = result.get('failure_count', 0) if result else len(valid_users)
+            enqueued_count = result.get('enqueued_count', 0) if result else 0
 
-            logger.info(f"{market.name} 날씨 알림: {len(valid_users)}명 중 {success_count}명에게 전송 성공")
-
-            # 데이터베이스에 알림 로그 기록
-            try:
-                # 알림 타입 결정 (우선순위: high_temp > low_temp > strong_wind > snow > rain)
-                alert_type = None
-                alert_data = None
-                temperature = None
-                rain_probability = None
-                wind_speed = None
-                precipitation_type = None
-                forecast_time = None
-
-                if alerts.get('high_temp'):
-                    alert_type = 'high_temp'
-                    alert_data = alerts['high_temp'][0]
-                    temperature = alert_data.get('temperature')
-                    forecast_time = alert_data.get('time_str')
-                elif alerts.get('low_temp'):
-                    alert_type = 'low_temp'
-                    alert_data = alerts['low_temp'][0]
-                    temperature = alert_data.get('temperature')
-                    forecast_time = alert_data.get('time_str')
-                elif alerts.get('strong_wind'):
-                    alert_type = 'strong_wind'
-                    alert_data = alerts['strong_wind'][0]
-                    wind_speed = alert_data.get('wind_speed')
-                    forecast_time = alert_data.get('time_str')
-                elif alerts.get('snow'):
-                    alert_type = 'snow'
-                    alert_data = alerts['snow'][0]
-                    precipitation_type = 'snow'
-                    forecast_time = alert_data.get('time_str')
-                elif alerts.get('rain'):
-                    alert_type = 'rain'
-                    alert_data = alerts['rain'][0]
-                    rain_probability = alert_data.get('pop')
-                    precipitation_type = alert_data.get('description')
-                    forecast_time = alert_data.get('time_str')
-
-                # MarketAlarmLog 레코드 생성
-                if alert_type and alert_data:
-                    alarm_log = MarketAlarmLog(
-                        market_id=market.id,
-                        alert_type=alert_type,
-                        alert_title=title,
-                        alert_body=body,
-                        total_users=len(valid_users),
-                        success_count=success_count,
-                        failure_count=failure_count,
-                        weather_data=alerts,  # JSON 필드로 전체 알림 데이터 저장
-                        temperature=temperature,
-                        rain_probability=rain_probability,
-                        wind_speed=wind_speed,
-                        precipitation_type=precipitation_type,
-                        forecast_time=forecast_time,
-                        checked_hours=weather_info.get('checked_hours')
-                    )
-
-                    db.session.add(alarm_log)
-                    db.session.commit()
-
-                    logger.info(f"{market.name} 알림 로그 데이터베이스 기록 완료 (ID: {alarm_log.id})")
-                else:
-                    logger.warning(f"{market.name} 알림 타입을 결정할 수 없어 로그를 기록하지 못했습니다.")
-
-            except Exception as log_error:
-                logger.error(f"{market.name} 알림 로그 데이터베이스 기록 실패: {log_error}")
-                db.session.rollback()
-                # 로그 기록 실패는 전체 프로세스를 중단하지 않음
+            if queued:
+                logger.info(f"{market.name} 날씨 알림: {len(valid_users)}명 대상 {enqueued_count}개 토큰 적재")
+            else:
+                logger.info(f"{market.name} 날씨 알림: {len(valid_users)}명 중 {success_count}명에게 전송 성공")
+                self._write_weather_alarm_log(market, title, body, weather_info, len(valid_users),
+                                              success_count, failure_count)
 
             return {
                 'success': True,
                 'message': f'{market.name} 날씨 알림이 전송되었습니다.',
                 'sent_count': success_count,
+                'enqueued_count': enqueued_count,
                 'total_users': len(valid_users),
                 'fcm_result': result
             }
@@ -643,6 +833,82 @@ class WeatherAlertSystem:
                 'sent_count': 0
             }
 
+    def _write_weather_alarm_log(self, market: Market, title: str, body: str, weather_info: Dict[str, Any],
+                                 total_users: int, success_count: int, failure_count: int):
+        """시장 단위 날씨 알림의 알림 로그 기록 (기록된 로그 id, 실패하면 None)"""
+        alerts = weather_info.get('alerts', {})
+        # 데이터베이스에 알림 로그 기록
+        try:
+            # 알림 타입 결정 (우선순위: high_temp > low_temp > strong_wind > snow > rain)
+            alert_type = None
+            alert_data = None
+            temperature = None
+            rain_probability = None
+            wind_speed = None
+            precipitation_type = None
+            forecast_time = None
+
+            if alerts.get('high_temp'):
+                alert_type = 'high_temp'
+                alert_data = alerts['high_temp'][0]
+                temperature = alert_data.get('temperature')
+                forecast_time = alert_data.get('time_str')
+            elif alerts.get('low_temp'):
+                alert_type = 'low_temp'
+                alert_data = alerts['low_temp'][0]
+                temperature = alert_data.get('temperature')
+                forecast_time = alert_data.get('time_str')
+            elif alerts.get('strong_wind'):
+                alert_type = 'strong_wind'
+                alert_data = alerts['strong_wind'][0]
+                wind_speed = alert_data.get('wind_speed')
+                forecast_time = alert_data.get('time_str')
+            elif alerts.get('snow'):
+                alert_type = 'snow'
+                alert_data = alerts['snow'][0]
+                precipitation_type = 'snow'
+                forecast_time = alert_data.get('time_str')
+            elif alerts.get('rain'):
+                alert_type = 'rain'
+                alert_data = alerts['rain'][0]
+                rain_probability = alert_data.get('pop')
+                precipitation_type = alert_data.get('description')
+                forecast_time = alert_data.get('time_str')
+
+            # MarketAlarmLog 레코드 생성
+            if alert_type and alert_data:
+                alarm_log = MarketAlarmLog(
+                    market_id=market.id,
+                    alert_type=alert_type,
+                    alert_title=title,
+                    alert_body=body,
+                    total_users=total_users,
+                    success_count=success_count,
+                    failure_count=failure_count,
+                    weather_data=alerts,  # JSON 필드로 전체 알림 데이터 저장
+                    temperature=temperature,
+                    rain_probability=rain_probability,
+                    wind_speed=wind_speed,
+                    precipitation_type=precipitation_type,
+                    forecast_time=forecast_time,
+                    checked_hours=weather_info.get('checked_hours')
+                )
+
+                db.session.add(alarm_log)
+                db.session.commit()
+                weather_response_cache.invalidate_dashboards()
+
+                logger.info(f"{market.name} 알림 로그 데이터베이스 기록 완료 (ID: {alarm_log.id})")
+                return alarm_log.id
+            else:
+                logger.warning(f"{market.name} 알림 타입을 결정할 수 없어 로그를 기록하지 못했습니다.")
+
+        except Exception as log_error:
+            logger.error(f"{market.name} 알림 로그 데이터베이스 기록 실패: {log_error}")
+            db.session.rollback()
+            # 로그 기록 실패는 전체 프로세스를 중단하지 않음
+        return None
+
     def _create_weather_alert_message(self, market_name: str, alerts: Dict, hours: int) -> tuple:
         """날씨 알림 메시지 생성 (우선순위에 따라)"""
         # 우선순위: 폭염 > 한파 > 강풍 > 눈 > 비
@@ -810,102 +1076,81 @@ class WeatherAlertSystem:
 
             return (title, body)
 
-    def send_individual_alert_to_user(self, user: User, market: Market, weather_info: Dict[str, Any]) -> bool:
+    def _token_group_kwargs(self, assigned_tokens: Dict[int, List[str]]) -> Dict[str, Any]:
+        """여러 사용자에게 보내는 멀티캐스트의 사용자별 토큰 묶음 (아웃박스가 사용자 단위로 병합하도록)"""
+        if not getattr(self.sender, 'queued', False):
+            return {}
+        return {'token_groups': list(assigned_tokens.values())}
+
+    def _build_market_alert_data(self, market: Market, alerts: Dict[str, Any]) -> Dict[str, str]:
+        """시장 단일 알림의 FCM data payload (모든 값은 문자열)"""
+        return {
+            'type': 'weather_alert',
+            'market_id': str(market.id),
+            'market_name': market.name,
+            'alerts': json.dumps(alerts, ensure_ascii=False)
+        }
+
+    def _send_to_user_tokens(self, user: User, tokens: List[str], title: str, body: str,
+                             data: Dict[str, str], alarm_log_ids: List[int] = None) -> bool:
+        """
+        사용자 기기 토큰으로 전송 (기기가 여러 대면 멀티캐스트, 한 대라도 성공하면 성공)
+
+        아웃박스 발송기(sender.queued)는 적재 여부를 반환하며, alarm_log_ids로 연결한 알림 이력에
+        실제 전송 결과가 나중에 반영됩니다.
+        """
+        if tokens is None:
+            tokens = user_tokens(user)
+        if not tokens:
+            # 배정된 토큰 없음 (대표 토큰이 다른 사용자의 기기로 옮겨 간 경우)
+            return False
+        delivery_kwargs = {'alarm_log_ids': alarm_log_ids} if alarm_log_ids else {}
+        if len(tokens) <= 1:
+            return self.sender.send_notification(
+                token=tokens[0],
+                title=title,
+                body=body,
+                data=data,
+                **delivery_kwargs
+            )
+        if getattr(self.sender, 'queued', False):
+            # 여러 기기 토큰이 사용자 한 명 (아웃박스 병합 단위)
+            delivery_kwargs['token_groups'] = [tokens]
+        result = self.sender.send_multicast(tokens, title, body, data, **delivery_kwargs)
+        if not result:
+            return False
+        return result.get('enqueued_count' if getattr(self.sender, 'queued', False) else 'success_count', 0) > 0
+
+    def send_individual_alert_to_user(self, user: User, market: Market, weather_info: Dict[str, Any],
+                                      tokens: List[str] = None, alarm_log_ids: List[int] = None) -> bool:
         """개별 사용자에게 단일 시장 날씨 알림 전송"""
         try:
             alerts = weather_info.get('alerts', {})
             title, body = self._create_weather_alert_message(market.name, alerts, weather_info['checked_hours'])
 
             # FCM 알림 전송
-            import json
-            notification_data = {
-                'type': 'weather_alert',
-                'market_id': str(market.id),
-                'market_name': market.name,
-                'alerts': json.dumps(alerts, ensure_ascii=False)
-            }
+            notification_data = self._build_market_alert_data(market, alerts)
 
-            return fcm_service.send_notification(
-                token=user.fcm_token,
-                title=title,
-                body=body,
-                data=notification_data
-            )
+            return self._send_to_user_tokens(user, tokens, title, body, notification_data, alarm_log_ids)
         except Exception as e:
             logger.error(f"사용자 {user.id}에게 개별 알림 전송 실패: {e}")
             return False
 
-    def send_summary_alert_to_user(self, user: User, alerts_list: List[Dict[str, Any]]) -> bool:
+    def send_summary_alert_to_user(self, user: User, alerts_list: List[Dict[str, Any]],
+                                   tokens: List[str] = None, alarm_log_ids: List[int] = None) -> bool:
         """개별 사용자에게 요약된 날씨 알림 전송 (3개 이상 시장)"""
         try:
-            market_names = [item['market'].name for item in alerts_list]
-            count = len(market_names)
-            
-            # 제목 생성
-            title = f"{count}개 시장 날씨 알림"
-            
-            # 본문 생성 (시장A, 시장B 외 N곳...)
-            if count <= 2:
-                markets_str = ", ".join(market_names)
-            else:
-                markets_str = f"{market_names[0]}, {market_names[1]} 외 {count-2}곳"
-                
-            # 실제 알림 종류 수집
-            unique_types = set()
-            for item in alerts_list:
-                for a_type in item['weather_info'].get('alerts', {}).keys():
-                    unique_types.add(a_type)
-            
-            # 한글 변환
-            type_names = []
-            type_map = {
-                'rain': '비',
-                'snow': '눈',
-                'high_temp': '폭염',
-                'low_temp': '한파',
-                'strong_wind': '강풍'
-            }
-            
-            for t in unique_types:
-                if t in type_map:
-                    type_names.append(type_map[t])
-            
-            # 우선순위 정렬? (비/눈 -> 특보) 또는 가나다순? 일단 발견 순서대로 해도 무방하나 정렬하면 깔끔함.
-            # 임의 정렬: 비, 눈, 폭염, 한파, 강풍 순
-            sort_order = ['비', '눈', '폭염', '한파', '강풍']
-            type_names.sort(key=lambda x: sort_order.index(x) if x in sort_order else 99)
-            
-            if not type_names:
-                weather_str = "기상 특보"
-            else:
-                weather_str = ", ".join(type_names)
-
-            body = f"{markets_str}에 {weather_str} 등 주의할 날씨가 예상됩니다. 앱에서 상세 내용을 확인하세요."
-
-            # 데이터 페이로드 생성 (간소화)
-            import json
-            summary_data = []
-            for item in alerts_list:
-                market = item['market']
-                alert_types = list(item['weather_info'].get('alerts', {}).keys())
-                summary_data.append({
-                    'market_id': market.id,
-                    'market_name': market.name,
-                    'types': alert_types
-                })
-
-            notification_data = {
-                'type': 'weather_summary_alert',
-                'count': str(count),
-                'summary': json.dumps(summary_data, ensure_ascii=False)
-            }
+            summary_entries = [
+                {
+                    'market_id': item['market'].id,
+                    'market_name': item['market'].name,
+                    'types': list(item['weather_info'].get('alerts', {}).keys())
+                }
+                for item in alerts_list
+            ]
+            title, body, notification_data = build_summary_alert_content(summary_entries)
 
-            return fcm_service.send_notification(
-                token=user.fcm_token,
-                title=title,
-                body=body,
-                data=notification_data
-            )
+            return self._send_to_user_tokens(user, tokens, title, body, notification_data, alarm_log_ids)
         except Exception as e:
             logger.error(f"사용자 {user.id}에게 요약 알림 전송 실패: {e}")
             return False
@@ -919,17 +1164,21 @@ class WeatherAlertSystem:
             from datetime import datetime, timedelta
             
             # 최근 알림 조회
-            last_log = MarketAlarmLog.query.filter_by(
+            query = MarketAlarmLog.query.filter_by(
                 market_id=market_id,
                 alert_type=alert_type
-            ).order_by(MarketAlarmLog.created_at.desc()).first()
+            )
+            if self.reference_time is not None:
+                # 재생 모드: 기준 시각 이후의 로그는 아직 존재하지 않았던 것으로 간주
+                query = query.filter(MarketAlarmLog.created_at <= self._utc_now())
+            last_log = query.order_by(MarketAlarmLog.created_at.desc()).first()
             
             if not last_log:
                 return False
                 
             # 1. Cool-down 체크 (6시간)
             cool_down_hours = 6
-            elapsed = datetime.utcnow() - last_log.created_at
+            elapsed = self._utc_now() - last_log.created_at
             if elapsed < timedelta(hours=cool_down_hours):
                 return True
                 
@@ -944,11 +1193,345 @@ class WeatherAlertSystem:
             return False
 
 
-    def check_all_markets_with_all_conditions(self, hours: int = None) -> Dict[str, Any]:
-        """모든 관심 시장의 다양한 날씨 조건 확인 및 알림 전송 (사용자별 그룹화 적용)"""
+    def _send_user_batch(self, batch: Dict[str, Any]) -> tuple:
+        """
+        사용자 1명에게 배치된 알림 전송 (3개 이상 시장이면 요약 알림)
+
+        Returns:
+            tuple: (전송 성공 메시지 수, [(market_id, success), ...])
+                   아웃박스 발송기면 적재된 메시지 수와 시장별 적재 여부
+        """
+        user = batch['user']
+        user_alerts = batch['alerts']
+        # 미리 조회한 기기 토큰이 있으면 전달 (없으면 전송 시 사용자별 조회)
+        token_kwargs = {'tokens': batch['tokens']} if batch.get('tokens') is not None else {}
+
+        if not user_alerts:
+            return 0, []
+
+        if len(user_alerts) >= 3:
+            # 요약 알림 전송 - 포함된 모든 시장에 같은 결과 반영
+            success = self.send_summary_alert_to_user(
+                user, user_alerts, **token_kwargs,
+                **self._delivery_kwargs(batch, [item['market'].id for item in user_alerts])
+            )
+            return (1 if success else 0), [(item['market'].id, success) for item in user_alerts]
+
+        # 개별 알림 전송
+        messages_sent = 0
+        market_results = []
+        for item in user_alerts:
+            success = self.send_individual_alert_to_user(
+                user, item['market'], item['weather_info'], **token_kwargs,
+                **self._delivery_kwargs(batch, [item['market'].id])
+            )
+            if success:
+                messages_sent += 1
+            market_results.append((item['market'].id, success))
+        return messages_sent, market_results
+
+    def _delivery_kwargs(self, batch: Dict[str, Any], market_ids: List[int]) -> Dict[str, Any]:
+        """메시지에 연결할 알림 이력 id (아웃박스 전송으로 미리 기록한 이력이 있을 때만)"""
+        log_ids = batch.get('alarm_log_ids')
+        if not log_ids:
+            return {}
+        linked = [log_ids[market_id] for market_id in market_ids if market_id in log_ids]
+        return {'alarm_log_ids': linked} if linked else {}
+
+    def _dispatch_user_batches(self, user_batches: Dict[int, Dict[str, Any]], market_ids: List[int]) -> DispatchAccumulator:
+        """
+        사용자 배치를 스레드 풀로 동시에 전송
+
+        FCM 호출은 사용자마다 블로킹 HTTP 왕복이므로 dispatch_workers 개의 스레드로
+        병렬 처리하고, 제출 후 완료되지 않은 배치는 dispatch_max_in_flight 개로 제한해
+        대규모 실행 시 Future 객체가 한꺼번에 쌓이지 않도록 합니다.
+        아웃박스 발송기는 사용자 배치가 끝날 때마다 그 배치의 메시지를 적재합니다.
+        """
+        accumulator = DispatchAccumulator(market_ids)
+        in_flight = threading.BoundedSemaphore(max(1, self.dispatch_max_in_flight))
+        app = current_app._get_current_object() if has_app_context() else None
+        batch_scope = getattr(self.sender, 'batch', None)
+
+        def _send(batch):
+            with ExitStack() as stack:
+                if app is not None:
+                    stack.enter_context(app.app_context())
+                    if batch_scope is not None:
+                        stack.enter_context(batch_scope())
+                return self._send_user_batch(batch)
+
+        def _on_done(future):
+            try:
+                messages_sent, market_results = future.result()
+                accumulator.record(messages_sent, market_results)
+            except Exception as e:
+                logger.error(f"사용자 알림 배치 전송 중 오류: {e}")
+            finally:
+                in_flight.release()
+
+        with ThreadPoolExecutor(max_workers=max(1, self.dispatch_workers),
+                                thread_name_prefix='alert-dispatch') as executor:
+            for batch in user_batches.values():
+                in_flight.acquire()
+                try:
+                    future = executor.submit(_send, batch)
+                except Exception:
+                    in_flight.release()
+                    raise
+                future.add_done_callback(_on_done)
+
+        return accumulator
+
+    def _plan_topic_delivery(self, active_market_alerts: List[Dict[str, Any]],
+                             user_batches: Dict[int, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        시장 주제로 한 번에 보낼 수 있는 시장을 골라 사용자 배치에서 제외
+
+        주제 구독자 전원이 이 시장 알림을 개별 알림으로 받을 사용자일 때만 주제로 전송합니다.
+        요약 알림 대상(3개 시장 이상), 방해금지 중인 사용자, 주제 구독이 기록되지 않은
+        사용자가 한 명이라도 있으면 해당 시장은 기존처럼 사용자별로 전송합니다.
+
+        Returns:
+            list: 주제로 전송할 시장 알림 목록
+        """
+        topic_alerts = []
+        for m_alert in active_market_alerts:
+            topic = market_topic_name(m_alert['market'].id)
+            recipient_ids = {user.id for user in m_alert['users']}
+            subscribers = m_alert['subscribers']
+
+            # 주제 구독은 대표 토큰 기준이므로 기기가 여러 대인 사용자가 있으면 개별 전송
+            eligible = bool(subscribers) and all(
+                user.id in recipient_ids
+                and len(user_batches[user.id]['alerts']) < 3
+                and len(user_batches[user.id].get('tokens') or []) <= 1
+                and topic in (user.fcm_topics or [])
+                for user in subscribers
+            )
+            if eligible:
+                m_alert['topic'] = topic
+                topic_alerts.append(m_alert)
+
+        topic_market_ids = {m_alert['market'].id for m_alert in topic_alerts}
+        if topic_market_ids:
+            for batch in user_batches.values():
+                batch['alerts'] = [a for a in batch['alerts'] if a['market'].id not in topic_market_ids]
+
+        return topic_alerts
+
+    def _send_topic_alerts(self, topic_alerts: List[Dict[str, Any]], alarm_log_ids: Dict[int, int] = None) -> int:
+        """시장 주제로 알림 전송 후 시장별 성공/실패 수 반영 (전송 메시지 수 반환)"""
+        messages_sent = 0
+        for m_alert in topic_alerts:
+            market = m_alert['market']
+            # 아웃박스 전송이면 주제 메시지 1건이 대표하는 사용자 수만큼 알림 이력에 반영
+            delivery_kwargs = {}
+            if alarm_log_ids and market.id in alarm_log_ids:
+                delivery_kwargs = {'alarm_log_ids': [alarm_log_ids[market.id]],
+                                   'recipient_count': len(m_alert['users'])}
+            try:
+                success = self.sender.send_to_topic(
+                    m_alert['topic'],
+                    m_alert['title'],
+                    m_alert['body'],
+                    self._build_market_alert_data(market, m_alert['alerts_data']),
+                    **delivery_kwargs
+                )
+            except Exception as e:
+                logger.error(f"시장 {market.name} 주제 알림 전송 실패: {e}")
+                success = False
+
+            if success:
+                messages_sent += 1
+                m_alert['success_count'] = len(m_alert['users'])
+                m_alert['failure_count'] = 0
+            else:
+                m_alert['success_count'] = 0
+                m_alert['failure_count'] = len(m_alert['users'])
+        return messages_sent
+
+    def _flush_sender(self) -> int:
+        """발송기에 모인 메시지를 적재 (적재된 메시지 수 반환)"""
+        flush = getattr(self.sender, 'flush', None)
+        if flush is None:
+            return 0
+        return flush()
+
+    def _write_pending_alarm_logs(self, active_market_alerts: List[Dict[str, Any]]) -> Dict[int, int]:
+        """
+        아웃박스 전송 전에 알림 이력을 성공/실패 0건으로 먼저 기록 ({market_id: 로그 id})
+
+        적재 시점에는 전송 결과를 알 수 없으므로, 전송 워커가 메시지에 연결된 이력에
+        실제 성공/실패 사용자 수를 반영합니다.
+        """
+        log_writer = AlarmLogBulkWriter()
+        for m_alert in active_market_alerts:
+            if m_alert['users']:
+                log_writer.add(self._build_alarm_log_payload(m_alert))
+
+        try:
+            return log_writer.flush_returning_ids()
+        except Exception as e:
+            logger.error(f"알림 로그 선기록 실패: {e}")
+            db.session.rollback()
+            return {}
+
+    def _prune_invalid_tokens(self) -> int:
+        """발송기에 수집된 무효 토큰을 한 번의 UPDATE로 정리 (정리된 사용자 수 반환)"""
+        prune = getattr(self.sender, 'prune_invalid_tokens', None)
+        if prune is None:
+            return 0
+        return prune()
+
+    def _get_config_version(self, thresholds: Dict[str, Any], hours: int) -> str:
+        """시장 알림 임계값 설정 버전 (평가 결과에 영향을 주는 설정의 해시)"""
+        payload = json.dumps({
+            'thresholds': thresholds,
+            'hours': hours,
+            'snow_amount': self.default_thresholds['snow_amount']
+        }, sort_keys=True)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def _load_grid_forecast_inputs(self) -> Dict[tuple, tuple]:
+        """
+        격자별 평가 입력 (최신 발표의 예보 지문, 그 발표의 마지막 예보 시각)
+
+        평가는 최신 발표 포인터(weather_latest)가 가리키는 발표의 예보만 사용하므로
+        (포인터 수집 시각이 2시간 이내일 때) 같은 포인터로 그 발표의 지문을 찾습니다.
+        지문 행이 처음 기록된 시각과는 관계없이 발표 내용으로만 정해집니다.
+
+        Returns:
+            Dict: {(nx, ny): (content_hash, 마지막 예보 시각 datetime | None)}
+        """
+        cutoff = self._utc_now() - timedelta(hours=2)
+        fresh_pointer = and_(
+            WeatherLatest.api_type == 'forecast',
+            WeatherLatest.collected_at >= cutoff
+        )
+
+        fingerprints = db.session.query(
+            WeatherLatest.nx, WeatherLatest.ny, ForecastFingerprint.content_hash
+        ).join(
+            ForecastFingerprint,
+            and_(
+                ForecastFingerprint.nx == WeatherLatest.nx,
+                ForecastFingerprint.ny == WeatherLatest.ny,
+                ForecastFingerprint.base_date == WeatherLatest.base_date,
+                ForecastFingerprint.base_time == WeatherLatest.base_time
+            )
+        ).filter(fresh_pointer).all()
+
+        # 발표별 마지막 예보 시각 (YYYYMMDDHHMM)
+        last_forecasts = db.session.query(
+            Weather.nx, Weather.ny, func.max(Weather.fcst_date + Weather.fcst_time)
+        ).join(
+            WeatherLatest,
+            and_(
+                WeatherLatest.nx == Weather.nx,
+                WeatherLatest.ny == Weather.ny,
+                WeatherLatest.base_date == Weather.base_date,
+                WeatherLatest.base_time == Weather.base_time
+            )
+        ).filter(
+            fresh_pointer,
+            Weather.api_type == 'forecast'
+        ).group_by(Weather.nx, Weather.ny).all()
+
+        last_forecast_at = {}
+        for nx, ny, last in last_forecasts:
+            try:
+                last_forecast_at[(nx, ny)] = datetime.strptime(last, "%Y%m%d%H%M")
+            except (TypeError, ValueError):
+                continue
+
+        return {
+            (nx, ny): (content_hash, last_forecast_at.get((nx, ny)))
+            for nx, ny, content_hash in fingerprints
+        }
+
+    def _evaluation_input_hash(self, forecast_input: tuple, hours: int) -> str:
+        """
+        시장 평가 입력 지문 (예보 지문 + 평가 구간)
+
+        평가는 기준 시각 + hours 까지의 예보만 보므로, 같은 발표라도 매시간 새 예보 시각이
+        구간에 들어오면 결과가 달라질 수 있습니다. 발표의 마지막 예보 시각이 이미 구간 안이면
+        구간은 발표 전체로 고정되고, 아니면 구간 끝(정시 단위)을 지문에 포함해 재평가합니다.
+        """
+        content_hash, last_forecast_at = forecast_input
+        window_end = self._now() + timedelta(hours=hours)
+        if last_forecast_at is not None and last_forecast_at <= window_end:
+            window = 'all'
+        else:
+            window = window_end.strftime('%Y%m%d%H')
+        return hashlib.sha256(f"{content_hash}|{window}".encode('utf-8')).hexdigest()
+
+    def _save_evaluation_memos(self, memo_updates: List[Dict[str, Any]], memos: Dict[int, MarketEvaluationMemo]):
+        """시장별 평가 결과 메모 저장"""
+        if not memo_updates:
+            return
+
+        evaluated_at = datetime.utcnow()
+        for update in memo_updates:
+            memo = memos.get(update['market_id'])
+            if memo is None:
+                memo = MarketEvaluationMemo(market_id=update['market_id'])
+                db.session.add(memo)
+            memo.forecast_hash = update['forecast_hash']
+            memo.config_version = update['config_version']
+            memo.has_alerts = update['has_alerts']
+            memo.alert_types = update['alert_types']
+            memo.evaluated_at = evaluated_at
+
+        db.session.commit()
+
+    def _build_alarm_log_payload(self, m_alert: Dict[str, Any]) -> Dict[str, Any]:
+        """시장별 알림 처리 결과를 MarketAlarmLog INSERT payload로 변환"""
+        alerts = m_alert['alerts_data']
+
+        temperature = None
+        rain_probability = None
+        wind_speed = None
+        precipitation_type = None
+
+        if alerts.get('high_temp'): temperature = alerts['high_temp'][0].get('temperature')
+        elif alerts.get('low_temp'): temperature = alerts['low_temp'][0].get('temperature')
+
+        if alerts.get('rain'):
+            rain_probability = alerts['rain'][0].get('pop')
+            precipitation_type = alerts['rain'][0].get('description')
+
+        if alerts.get('strong_wind'): wind_speed = alerts['strong_wind'][0].get('wind_speed')
+        if alerts.get('snow'): precipitation_type = 'snow'
+
+        # 알림 제목/본문은 대표값으로 (요약 알림으로 나갔을 수도 있지만, 로그에는 원본 이벤트 기록)
+        return {
+            'market_id': m_alert['market'].id,
+            'alert_type': m_alert['primary_alert_type'] or 'unknown',
+            'alert_title': m_alert['title'],
+            'alert_body': m_alert['body'],
+            'total_users': len(m_alert['users']),
+            'success_count': m_alert['success_count'],
+            'failure_count': m_alert['failure_count'],
+            'weather_data': alerts,
+            'temperature': temperature,
+            'rain_probability': rain_probability,
+            'wind_speed': wind_speed,
+            'precipitation_type': precipitation_type,
+            'forecast_time': m_alert['primary_forecast_time'],
+            'checked_hours': m_alert['weather_info'].get('checked_hours')
+        }
+
+    def check_all_markets_with_all_conditions(self, hours: int = None, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        모든 관심 시장의 다양한 날씨 조건 확인 및 알림 전송 (사용자별 그룹화 적용)
+
+        Args:
+            hours: 확인할 예보 시간 범위
+            dry_run: True이면 알림 로그를 기록하지 않음 (발송기는 self.sender 그대로 사용)
+        """
         hours = hours or self.forecast_hours
 
-        logger.info(f"향후 {hours}시간 날씨 조건 확인 및 알림 전송 시작 (Grouping 적용)")
+        logger.info(f"향후 {hours}시간 날씨 조건 확인 및 알림 전송 시작 (Grouping 적용{', 드라이런' if dry_run else ''})")
 
         try:
             # 1. 정보를 수집할 활성 시장 및 사용자 조회
@@ -974,6 +1557,16 @@ class WeatherAlertSystem:
 
                 logger.info(f"{len(markets_with_interest)}개 시장의 날씨 조건 확인 중...")
 
+                # 단계별 소요 시간 (초) - 평가/그룹화/메시지 생성은 시장별 누적
+                metrics = {'evaluate_seconds': 0.0, 'group_seconds': 0.0, 'compose_seconds': 0.0}
+
+                # 증분 평가 입력 (격자별 예보 지문, 시장별 지난 평가 결과)
+                use_memo = self.incremental_enabled and self.forecast_source is None and self.reference_time is None
+                grid_inputs = self._load_grid_forecast_inputs() if use_memo else {}
+                memos = {memo.market_id: memo for memo in MarketEvaluationMemo.query.all()} if use_memo else {}
+                memo_updates = []
+                skipped_count = 0
+
                 # 2. 시장별 날씨 확인 및 알림 대상 수집
                 # 구조: active_market_alerts = [ { 'market': m, 'info': info, 'users': [u1, u2...] } ]
                 active_market_alerts = []
@@ -984,10 +1577,36 @@ class WeatherAlertSystem:
                 
                 for market in markets_with_interest:
                     try:
+                        stage_started = time.perf_counter()
+
+                        # 입력(예보 지문 + 평가 구간 + 임계값 설정)이 지난 평가와 같으면 재평가 생략
+                        forecast_input = grid_inputs.get((market.nx, market.ny))
+                        forecast_hash = self._evaluation_input_hash(forecast_input, hours) if forecast_input else None
+                        config_version = None
+                        if forecast_hash:
+                            config_version = self._get_config_version(self.get_market_thresholds(market), hours)
+                            memo = memos.get(market.id)
+                            if memo is not None and memo.matches(forecast_hash, config_version):
+                                skipped_count += 1
+                                metrics['evaluate_seconds'] += time.perf_counter() - stage_started
+                                continue
+
                         # 날씨 확인
                         weather_info = self.check_all_weather_conditions_for_market(market, hours)
                         checked_count += 1
 
+                        # 평가 결과 메모는 알림이 없거나 이번 실행에서 알림이 나간 시장만 저장
+                        # (메모가 일치하면 시장을 건너뛰므로 전송 전에 실패한 알림이 재시도되지 않음)
+                        memo_update = None
+                        if forecast_hash and 'error' not in weather_info:
+                            memo_update = {
+                                'market_id': market.id,
+                                'forecast_hash': forecast_hash,
+                                'config_version': config_version,
+                                'has_alerts': bool(weather_info.get('has_alerts')),
+                                'alert_types': list(weather_info.get('alerts', {}).keys())
+                            }
+
                         if weather_info.get('has_alerts'):
                             # 알림이 필요한 경우만 처리
                             interested_users = market.get_interested_users()
@@ -1018,13 +1637,17 @@ class WeatherAlertSystem:
                                 primary_alert_type = 'rain'
                                 primary_forecast_time = alerts['rain'][0].get('time_str')
 
-                            if primary_alert_type and self._is_duplicate_alert(market.id, primary_alert_type, primary_forecast_time):
+                            is_duplicate = primary_alert_type and self._is_duplicate_alert(market.id, primary_alert_type, primary_forecast_time)
+                            metrics['evaluate_seconds'] += time.perf_counter() - stage_started
+
+                            if is_duplicate:
                                 logger.info(f"시장 {market.name} 중복 알림으로 스킵")
                                 continue
 
                             # 유효한 사용자 수집 및 배치 구성
+                            stage_started = time.perf_counter()
                             for user in interested_users:
-                                if user.can_receive_fcm() and not user.is_in_do_not_disturb_time():
+                                if user.can_receive_fcm() and not user.is_in_do_not_disturb_time(self.reference_time):
                                     valid_users.append(user)
                                     
                                     if user.id not in user_batches:
@@ -1035,6 +1658,13 @@ class WeatherAlertSystem:
                                         'weather_info': weather_info
                                     })
                             
+                            metrics['group_seconds'] += time.perf_counter() - stage_started
+
+                            # 알림 제목/본문은 시장별로 한 번만 생성 (로그 기록 시 재사용)
+                            stage_started = time.perf_counter()
+                            title, body = self._create_weather_alert_message(market.name, alerts, weather_info['checked_hours'])
+                            metrics['compose_seconds'] += time.perf_counter() - stage_started
+
                             # 시장별 알림 정보 저장 (나중에 로그 기록용)
                             active_market_alerts.append({
                                 'market': market,
@@ -1044,118 +1674,160 @@ class WeatherAlertSystem:
                                 'failure_count': 0,
                                 'primary_alert_type': primary_alert_type, # 로그용
                                 'primary_forecast_time': primary_forecast_time,
-                                'alerts_data': alerts
+                                'alerts_data': alerts,
+                                'subscribers': interested_users,
+                                'title': title,
+                                'body': body,
+                                'memo_update': memo_update
                             })
+                        else:
+                            metrics['evaluate_seconds'] += time.perf_counter() - stage_started
+                            if memo_update:
+                                memo_updates.append(memo_update)
 
                     except Exception as e:
                         logger.error(f"시장 {market.name} 처리 중 오류: {e}")
 
-                # 3. 사용자별 알림 전송 (Grouping)
-                logger.info(f"사용자 {len(user_batches)}명에게 알림 전송 시작")
-                
-                total_alerts_sent = 0
-                
+                for key in ('evaluate_seconds', 'group_seconds', 'compose_seconds'):
+                    metrics[key] = round(metrics[key], 4)
+                metrics['skipped_markets'] = skipped_count
+                metrics['skip_rate'] = round(skipped_count / len(markets_with_interest), 4)
+                if skipped_count:
+                    logger.info(f"예보/설정 변경 없는 {skipped_count}개 시장 재평가 생략 (생략률 {metrics['skip_rate']:.1%})")
+                stage_started = time.perf_counter()
+
+                target_users = len(user_batches)
+
+                # 대상 사용자 전원의 기기 토큰을 한 번에 조회 (사용자별 조회 없이 다중 기기 전송)
+                # 토큰 하나는 실행 전체에서 한 사용자에게만 배정 (계정을 바꾼 기기에 이전 계정 알림 중복 방지)
+                tokens_by_user = assign_tokens(batch['user'] for batch in user_batches.values())
                 for user_id, batch in user_batches.items():
-                    user = batch['user']
-                    user_alerts = batch['alerts']
-                    
-                    if not user_alerts:
-                        continue
-                        
-                    is_summary = len(user_alerts) >= 3
-                    
-                    if is_summary:
-                        # 요약 알림 전송
-                        success = self.send_summary_alert_to_user(user, user_alerts)
-                        if success:
-                            total_alerts_sent += 1
-                        
-                        # 각 시장별 성공 카운트 업데이트
-                        for item in user_alerts:
-                            # 해당 시장의 active_market_alerts 항목 찾기
-                            # 성능을 위해 매번 찾는건 비효율적일 수 있으나, 시장 수가 적으므로 허용
-                            for m_alert in active_market_alerts:
-                                if m_alert['market'].id == item['market'].id:
-                                    if success:
-                                        m_alert['success_count'] += 1
-                                    else:
-                                        m_alert['failure_count'] += 1
-                                    break
-                    else:
-                        # 개별 알림 전송
-                        for item in user_alerts:
-                            success = self.send_individual_alert_to_user(user, item['market'], item['weather_info'])
-                            if success:
-                                total_alerts_sent += 1
-                                
-                            # 시장별 성공 카운트 업데이트
-                            for m_alert in active_market_alerts:
-                                if m_alert['market'].id == item['market'].id:
-                                    if success:
-                                        m_alert['success_count'] += 1
-                                    else:
-                                        m_alert['failure_count'] += 1
-                                    break
-
-                # 4. 로그 기록 (시장별로)
+                    batch['tokens'] = tokens_by_user.get(user_id, [])
+
+                # 주제 기반 전송 모드: 시장 주제로 보낼 시장은 사용자 배치에서 제외
+                topic_alerts = []
+                if self.delivery_mode == 'topic':
+                    topic_alerts = self._plan_topic_delivery(active_market_alerts, user_batches)
+                    user_batches = {uid: batch for uid, batch in user_batches.items() if batch['alerts']}
+                    logger.info(f"시장 주제 전송 {len(topic_alerts)}개 시장, 개별 전송 사용자 {len(user_batches)}명")
+
+                # 아웃박스 전송: 알림 이력을 먼저 기록하고 메시지에 연결 (전송 결과는 전송 워커가 반영)
+                queued = getattr(self.sender, 'queued', False) and not dry_run
+                alarm_log_ids = self._write_pending_alarm_logs(active_market_alerts) if queued else {}
+                for batch in user_batches.values():
+                    batch['alarm_log_ids'] = alarm_log_ids
+
+                # 3. 사용자별 알림 전송 (Grouping, 병렬)
+                logger.info(f"사용자 {len(user_batches)}명에게 알림 {'적재' if queued else '전송'} 시작 (동시 {self.dispatch_workers}개)")
+
+                accumulator = self._dispatch_user_batches(user_batches, [m['market'].id for m in active_market_alerts])
+                total_alerts_sent = accumulator.messages_sent
+
+                # 시장별 성공/실패 카운트 반영 (아웃박스 전송이면 적재/적재 실패 수)
+                for m_alert in active_market_alerts:
+                    counts = accumulator.market_counts[m_alert['market'].id]
+                    m_alert['success_count'] = counts['success']
+                    m_alert['failure_count'] = counts['failure']
+
+                total_alerts_sent += self._send_topic_alerts(topic_alerts, alarm_log_ids)
+                metrics['topic_markets'] = len(topic_alerts)
+
+                flush_failed = False
+                try:
+                    metrics['enqueued'] = self._flush_sender()
+                except Exception as e:
+                    logger.error(f"알림 아웃박스 적재 실패: {e}")
+                    metrics['enqueued'] = 0
+                    flush_failed = True
+
+                # 대상 사용자 전원에게 전송(적재)된 시장만 평가 결과 메모 저장
                 for m_alert in active_market_alerts:
+                    if m_alert.get('memo_update') and m_alert['success_count'] > 0 and m_alert['failure_count'] == 0:
+                        memo_updates.append(m_alert['memo_update'])
+
+                metrics['dispatch_seconds'] = round(time.perf_counter() - stage_started, 4)
+                stage_started = time.perf_counter()
+
+                # 4. 로그 기록 (시장별 payload를 모아 한 번에 기록)
+                if queued:
+                    # 이력은 전송 전에 기록됨 - 적재하지 못한 사용자만 바로 실패로 반영
+                    metrics['log_rows'] = len(alarm_log_ids)
                     try:
-                        market = m_alert['market']
-                        # 성공한 건수가 있거나 실패한 건수가 있을 때만 기록 (대상 사용자가 없으면 스킵될 수 있음)
-                        if m_alert['success_count'] > 0 or m_alert['failure_count'] > 0:
-                            # 상세 데이터 추출
-                            alerts = m_alert['alerts_data']
-                            
-                            # 로그 데이터 준비
-                            temperature = None
-                            rain_probability = None
-                            wind_speed = None
-                            precipitation_type = None
-                            
-                            if alerts.get('high_temp'): temperature = alerts['high_temp'][0].get('temperature')
-                            elif alerts.get('low_temp'): temperature = alerts['low_temp'][0].get('temperature')
-                            
-                            if alerts.get('rain'): 
-                                rain_probability = alerts['rain'][0].get('pop')
-                                precipitation_type = alerts['rain'][0].get('description')
-                                
-                            if alerts.get('strong_wind'): wind_speed = alerts['strong_wind'][0].get('wind_speed')
-                            if alerts.get('snow'): precipitation_type = 'snow'
-
-                            # 알림 제목/본문은 대표값으로 (요약 알림으로 나갔을 수도 있지만, 로그에는 원본 이벤트 기록)
-                            title, body = self._create_weather_alert_message(market.name, alerts, m_alert['weather_info']['checked_hours'])
-
-                            alarm_log = MarketAlarmLog(
-                                market_id=market.id,
-                                alert_type=m_alert['primary_alert_type'] or 'unknown',
-                                alert_title=title,
-                                alert_body=body,
-                                total_users=len(m_alert['users']),
-                                success_count=m_alert['success_count'],
-                                failure_count=m_alert['failure_count'],
-                                weather_data=alerts,
-                                temperature=temperature,
-                                rain_probability=rain_probability,
-                                wind_speed=wind_speed,
-                                precipitation_type=precipitation_type,
-                                forecast_time=m_alert['primary_forecast_time'],
-                                checked_hours=m_alert['weather_info'].get('checked_hours')
-                            )
-                            db.session.add(alarm_log)
+                        apply_alarm_log_outcomes({
+                            alarm_log_ids[m_alert['market'].id]: [0, m_alert['failure_count']]
+                            for m_alert in active_market_alerts if m_alert['market'].id in alarm_log_ids
+                        })
+                        db.session.commit()
                     except Exception as e:
-                        logger.error(f"로그 기록 중 오류 (시장: {m_alert['market'].name}): {e}")
+                        logger.error(f"알림 로그 적재 실패 반영 중 오류: {e}")
+                        db.session.rollback()
+                else:
+                    log_writer = AlarmLogBulkWriter()
+                    for m_alert in active_market_alerts:
+                        try:
+                            # 성공한 건수가 있거나 실패한 건수가 있을 때만 기록 (대상 사용자가 없으면 스킵될 수 있음)
+                            if m_alert['success_count'] > 0 or m_alert['failure_count'] > 0:
+                                log_writer.add(self._build_alarm_log_payload(m_alert))
+                        except Exception as e:
+                            logger.error(f"로그 기록 중 오류 (시장: {m_alert['market'].name}): {e}")
 
-                db.session.commit()
-                
-                logger.info(f"알림 처리 완료: {checked_count}개 시장 확인, {total_alerts_sent}건 메시지 전송 (요약 포함)")
+                    try:
+                        if dry_run:
+                            # 드라이런: 기록할 건수만 집계
+                            metrics['log_rows'] = len(log_writer)
+                        else:
+                            metrics['log_rows'] = log_writer.flush()
+                    except Exception as e:
+                        logger.error(f"알림 로그 일괄 기록 실패: {e}")
+                        db.session.rollback()
+                        metrics['log_rows'] = 0
+
+                if flush_failed:
+                    # 적재하지 못한 알림이 다음 실행에서 재평가되도록 메모를 남기지 않음
+                    logger.warning("아웃박스 적재 실패로 시장 평가 결과 메모 저장 생략")
+                elif not dry_run:
+                    try:
+                        self._save_evaluation_memos(memo_updates, memos)
+                    except Exception as e:
+                        logger.error(f"시장 평가 결과 메모 저장 실패: {e}")
+                        db.session.rollback()
 
-                return {
+                # 5. 이번 실행에서 무효로 판명된 FCM 토큰 일괄 정리
+                # (아웃박스 전송이면 무효 토큰은 전송 워커가 전송할 때 정리)
+                if not dry_run and not queued:
+                    metrics['pruned_tokens'] = self._prune_invalid_tokens()
+
+                metrics['log_seconds'] = round(time.perf_counter() - stage_started, 4)
+                logger.info(
+                    f"단계별 소요 시간: 평가 {metrics['evaluate_seconds']}s, 그룹화 {metrics['group_seconds']}s, "
+                    f"메시지 생성 {metrics['compose_seconds']}s, 전송 {metrics['dispatch_seconds']}s, "
+                    f"로그 {metrics['log_seconds']}s ({metrics['log_rows']}건)"
+                )
+
+                # 6. 지도 군집의 알림 상태 갱신
+                if not dry_run:
+                    refresh_market_map()
+
+                action = '적재' if queued else '전송'
+                logger.info(f"알림 처리 완료: {checked_count}개 시장 확인, {total_alerts_sent}건 메시지 {action} (요약 포함)")
+
+                result = {
                     'success': True,
-                    'message': f'{checked_count}개 시장 확인 완료, 총 {total_alerts_sent}건 메시지 전송',
+                    'message': f'{checked_count}개 시장 확인 완료, 총 {total_alerts_sent}건 메시지 {action}',
                     'checked_markets': checked_count,
-                    'alerts_sent': total_alerts_sent,
+                    # 아웃박스 전송이면 실제 전송 결과는 전송 워커가 알림 이력에 반영
+                    'alerts_sent': 0 if queued else total_alerts_sent,
+                    'alerts_enqueued': total_alerts_sent if queued else 0,
+                    'skipped_markets': skipped_count,
+                    'alerting_markets': len(active_market_alerts),
+                    'target_users': target_users,
+                    'dry_run': dry_run,
+                    'metrics': metrics,
                     'results': [] # 상세 결과는 생략 (구조가 복잡해짐)
                 }
+                if 'pruned_tokens' in metrics:
+                    result['pruned_tokens'] = metrics['pruned_tokens']
+                return result
 
         except Exception as e:
             logger.error(f"전체 시장 날씨 조건 확인 중 오류: {e}")
@@ -1201,196 +1873,235 @@ def check_market_all_conditions(market_id: int, hours: int = 24) -> Dict[str, An
 
         return weather_alert_system.check_all_weather_conditions_for_market(market, hours)
 
+def _load_latest_weather_by_grid(grids) -> Dict[tuple, Dict[str, Any]]:
+    """
+    여러 격자의 최신 현재 날씨와 최신 발표 예보(앞 6개 시각)를 한 번에 조회
+
+    격자별 최신 발표 포인터(weather_latest)로 현재 날씨와 예보 행을 찾으므로
+    날씨 이력 전체를 정렬하지 않습니다.
+
+    Returns:
+        Dict: {(nx, ny): {'current': Weather | None, 'forecast': [Weather, ...]}}
+    """
+    return load_latest_weather_by_grid(grids, forecast_limit=6)
+
+
+def _build_weather_summary_message(market: Market, current_weather, forecast_weather) -> Dict[str, Any]:
+    """테스트 날씨 요약 알림의 제목/본문/데이터 생성"""
+    title = f"☀️ {market.name} 날씨 정보"
+
+    # 현재 날씨 정보
+    temp = current_weather.temp if current_weather.temp is not None else '?'
+    humidity = current_weather.humidity if current_weather.humidity is not None else '?'
+    wind_speed = current_weather.wind_speed if current_weather.wind_speed is not None else '?'
+
+    # 강수 형태 확인
+    weather_condition = "맑음"
+    if current_weather.pty:
+        pty_map = {'0': '없음', '1': '비', '2': '비/눈', '3': '눈', '4': '소나기'}
+        weather_condition = pty_map.get(current_weather.pty, '맑음')
+
+    body = f"현재: {temp}°C, 습도 {humidity}%, 풍속 {wind_speed}m/s"
+    if weather_condition != "없음" and weather_condition != "맑음":
+        body += f"\n날씨: {weather_condition}"
+
+    # 향후 예보 정보 추가 (강수확률이 있는 예보)
+    rain_forecasts = [f for f in forecast_weather if f.pop and f.pop >= 30]
+    if rain_forecasts:
+        max_pop = max([f.pop for f in rain_forecasts])
+        body += f"\n향후 강수확률: 최대 {int(max_pop)}%"
+
+    # 데이터 업데이트 시간
+    updated_time = current_weather.created_at.strftime('%H:%M') if current_weather.created_at else '?'
+    body += f"\n(업데이트: {updated_time})"
+
+    return {
+        'title': title,
+        'body': body,
+        'data': {
+            'type': 'weather_summary_test',
+            'market_id': str(market.id),
+            'market_name': market.name,
+            'temperature': str(temp),
+            'humidity': str(humidity),
+            'wind_speed': str(wind_speed),
+            'weather_condition': weather_condition,
+            'updated_at': updated_time
+        },
+        'weather_summary': {
+            'temp': temp,
+            'humidity': humidity,
+            'wind_speed': wind_speed,
+            'condition': weather_condition
+        }
+    }
+
+
 def send_test_weather_summary_to_all_users() -> Dict[str, Any]:
     """
     [테스트용] 모든 관심 시장의 날씨 요약을 조건 없이 사용자에게 알림 전송
 
     실제 날씨 조건(비, 폭염, 한파 등) 체크 없이 데이터베이스에 저장된
     최신 날씨 정보를 요약해서 관심 시장을 등록한 사용자들에게 전송합니다.
+    관심 사용자와 날씨 데이터는 시장 수와 무관하게 고정된 횟수의 쿼리로 적재하고,
+    시장별 멀티캐스트는 스레드 풀로 동시에 전송합니다.
 
     Returns:
         Dict: 전송 결과
     """
-    from app import app, db
-    from models import Weather
-    from datetime import datetime
-    import json
+    from app import app
 
     logger.info("테스트 날씨 요약 알림 전송 시작")
 
     try:
         with app.app_context():
-            # 관심을 가진 사용자가 있는 활성 시장들 조회
-            markets_with_interest = db.session.query(Market).join(
-                UserMarketInterest,
-                Market.id == UserMarketInterest.market_id
+            # 알림을 받을 수 있는 관심 사용자와 시장을 한 번에 조회
+            rows = db.session.query(Market, User).join(
+                UserMarketInterest, Market.id == UserMarketInterest.market_id
+            ).join(
+                User, User.id == UserMarketInterest.user_id
             ).filter(
                 Market.is_active == True,
                 Market.nx.isnot(None),
                 Market.ny.isnot(None),
                 UserMarketInterest.is_active == True,
-                UserMarketInterest.notification_enabled == True
-            ).distinct(Market.id).all()
+                UserMarketInterest.notification_enabled == True,
+                User.is_active == True,
+                User.fcm_enabled == True,
+                User.fcm_token.isnot(None)
+            ).all()
 
-            if not markets_with_interest:
+            if not rows:
                 return {
                     'success': True,
                     'message': '관심을 가진 사용자가 있는 활성 시장이 없습니다.',
                     'sent_count': 0
                 }
 
-            logger.info(f"{len(markets_with_interest)}개 시장의 날씨 요약 알림 전송 중...")
+            markets = {}
+            tokens_by_market = defaultdict(dict)
+            check_time = datetime.now()
+            tokens_by_user = assign_tokens(user for _, user in rows)
+            for market, user in rows:
+                markets[market.id] = market
+                # 방해금지 시간 체크
+                if not user.is_in_do_not_disturb_time(check_time):
+                    # 사용자 기기 토큰 포함, 시장별로 중복 제거 (순서 유지)
+                    for token in tokens_by_user.get(user.id, []):
+                        tokens_by_market[market.id].setdefault(token, None)
+
+            logger.info(f"{len(markets)}개 시장의 날씨 요약 알림 전송 중...")
+
+            weather_by_grid = _load_latest_weather_by_grid(
+                {(market.nx, market.ny) for market in markets.values()}
+            )
 
-            total_sent = 0
             results = []
+            sends = []
+            for market_id, market in markets.items():
+                grid_weather = weather_by_grid.get((market.nx, market.ny), {})
+                current_weather = grid_weather.get('current')
 
-            for market in markets_with_interest:
-                try:
-                    # 데이터베이스에서 최신 날씨 데이터 조회
-                    current_weather = Weather.query.filter_by(
-                        nx=market.nx,
-                        ny=market.ny,
-                        api_type='current'
-                    ).order_by(Weather.created_at.desc()).first()
-
-                    # 최신 예보 데이터도 조회 (향후 날씨)
-                    forecast_weather = Weather.query.filter_by(
-                        nx=market.nx,
-                        ny=market.ny,
-                        api_type='forecast'
-                    ).order_by(
-                        Weather.base_date.desc(),
-                        Weather.base_time.desc(),
-                        Weather.fcst_date.asc(),
-                        Weather.fcst_time.asc()
-                    ).limit(6).all()  # 향후 6시간 정도
-
-                    if not current_weather:
-                        logger.warning(f"{market.name}: 날씨 데이터 없음")
-                        results.append({
-                            'market': market.name,
-                            'success': False,
-                            'message': '날씨 데이터 없음'
-                        })
-                        continue
-
-                    # 해당 시장에 관심을 가진 사용자들 조회
-                    interested_users = market.get_interested_users()
-
-                    if not interested_users:
-                        results.append({
-                            'market': market.name,
-                            'success': True,
-                            'message': '관심 사용자 없음',
-                            'sent_count': 0
-                        })
-                        continue
+                if not current_weather:
+                    logger.warning(f"{market.name}: 날씨 데이터 없음")
+                    results.append({
+                        'market': market.name,
+                        'success': False,
+                        'message': '날씨 데이터 없음'
+                    })
+                    continue
 
-                    # FCM 토큰 수집 (방해금지 시간 체크 포함)
-                    fcm_tokens = []
-                    valid_users = []
+                fcm_tokens = list(tokens_by_market.get(market_id, {}))
+                if not fcm_tokens:
+                    results.append({
+                        'market': market.name,
+                        'success': True,
+                        'message': 'FCM 알림을 받을 수 있는 사용자 없음',
+                        'sent_count': 0
+                    })
+                    continue
 
-                    for user in interested_users:
-                        if user.can_receive_fcm() and not user.is_in_do_not_disturb_time():
-                            fcm_tokens.append(user.fcm_token)
-                            valid_users.append(user)
+                message = _build_weather_summary_message(market, current_weather, grid_weather['forecast'])
+                sends.append((market.name, fcm_tokens, message))
 
-                    if not fcm_tokens:
-                        results.append({
-                            'market': market.name,
-                            'success': True,
-                            'message': 'FCM 알림을 받을 수 있는 사용자 없음',
-                            'sent_count': 0
-                        })
-                        continue
-
-                    # 날씨 요약 메시지 생성
-                    title = f"☀️ {market.name} 날씨 정보"
-
-                    # 현재 날씨 정보
-                    temp = current_weather.temp if current_weather.temp is not None else '?'
-                    humidity = current_weather.humidity if current_weather.humidity is not None else '?'
-                    wind_speed = current_weather.wind_speed if current_weather.wind_speed is not None else '?'
-
-                    # 강수 형태 확인
-                    weather_condition = "맑음"
-                    if current_weather.pty:
-                        pty_map = {'0': '없음', '1': '비', '2': '비/눈', '3': '눈', '4': '소나기'}
-                        weather_condition = pty_map.get(current_weather.pty, '맑음')
-
-                    body = f"현재: {temp}°C, 습도 {humidity}%, 풍속 {wind_speed}m/s"
-                    if weather_condition != "없음" and weather_condition != "맑음":
-                        body += f"\n날씨: {weather_condition}"
-
-                    # 향후 예보 정보 추가
-                    if forecast_weather:
-                        # 강수확률이 있는 예보 찾기
-                        rain_forecasts = [f for f in forecast_weather if f.pop and f.pop >= 30]
-                        if rain_forecasts:
-                            max_pop = max([f.pop for f in rain_forecasts])
-                            body += f"\n향후 강수확률: 최대 {int(max_pop)}%"
-
-                    # 데이터 업데이트 시간
-                    updated_time = current_weather.created_at.strftime('%H:%M') if current_weather.created_at else '?'
-                    body += f"\n(업데이트: {updated_time})"
-
-                    # FCM 알림 전송
-                    notification_data = {
-                        'type': 'weather_summary_test',
-                        'market_id': str(market.id),
-                        'market_name': market.name,
-                        'temperature': str(temp),
-                        'humidity': str(humidity),
-                        'wind_speed': str(wind_speed),
-                        'weather_condition': weather_condition,
-                        'updated_at': updated_time
-                    }
+        sender = weather_alert_system.sender
+        queued = getattr(sender, 'queued', False)
+        batch_scope = getattr(sender, 'batch', None)
 
-                    result = fcm_service.send_multicast(
+        def _send(item):
+            market_name, fcm_tokens, message = item
+            try:
+                # 아웃박스 발송기는 시장마다 적재
+                with app.app_context(), (batch_scope() if batch_scope else nullcontext()):
+                    result = sender.send_multicast(
                         tokens=fcm_tokens,
-                        title=title,
-                        body=body,
-                        data=notification_data
+                        title=message['title'],
+                        body=message['body'],
+                        data=message['data']
                     )
 
-                    success_count = result.get('success_count', 0) if result else 0
-                    failure_count = result.get('failure_count', 0) if result else len(valid_users)
-
-                    logger.info(f"{market.name} 날씨 요약: {len(valid_users)}명 중 {success_count}명에게 전송 성공")
+                if queued:
+                    enqueued_count = result.get('enqueued_count', 0) if result else 0
+                    logger.info(f"{market_name} 날씨 요약: {len(fcm_tokens)}명 중 {enqueued_count}명 적재")
+                    return {
+                        'market': market_name,
+                        'success': True,
+                        'enqueued_count': enqueued_count,
+                        'weather_summary': message['weather_summary']
+                    }
 
-                    total_sent += success_count
+                success_count = result.get('success_count', 0) if result else 0
+                failure_count = result.get('failure_count', 0) if result else len(fcm_tokens)
 
-                    results.append({
-                        'market': market.name,
-                        'success': True,
-                        'sent_count': success_count,
-                        'failed_count': failure_count,
-                        'weather_summary': {
-                            'temp': temp,
-                            'humidity': humidity,
-                            'wind_speed': wind_speed,
-                            'condition': weather_condition
-                        }
-                    })
+                logger.info(f"{market_name} 날씨 요약: {len(fcm_tokens)}명 중 {success_count}명에게 전송 성공")
+                return {
+                    'market': market_name,
+                    'success': True,
+                    'sent_count': success_count,
+                    'failed_count': failure_count,
+                    'weather_summary': message['weather_summary']
+                }
+            except Exception as e:
+                logger.error(f"시장 {market_name} 처리 중 오류: {e}")
+                return {
+                    'market': market_name,
+                    'success': False,
+                    'error': str(e)
+                }
 
-                except Exception as e:
-                    logger.error(f"시장 {market.name} 처리 중 오류: {e}")
-                    results.append({
-                        'market': market.name,
-                        'success': False,
-                        'error': str(e)
-                    })
+        with ThreadPoolExecutor(max_workers=max(1, weather_alert_system.dispatch_workers),
+                                thread_name_prefix='summary-dispatch') as executor:
+            results.extend(executor.map(_send, sends))
 
-            logger.info(f"테스트 날씨 요약 알림 전송 완료: 총 {total_sent}건 전송")
+        with app.app_context():
+            weather_alert_system._flush_sender()
+            pruned_tokens = None if queued else weather_alert_system._prune_invalid_tokens()
 
+        if queued:
+            # 실제 전송 결과는 전송 워커가 처리 (아웃박스 현황: /api/admin/notifications/outbox)
+            total_enqueued = sum(r.get('enqueued_count', 0) for r in results)
+            logger.info(f"테스트 날씨 요약 알림 적재 완료: 총 {total_enqueued}건 적재")
             return {
                 'success': True,
-                'message': f'{len(markets_with_interest)}개 시장에 대해 총 {total_sent}건 알림 전송 완료',
-                'total_markets': len(markets_with_interest),
-                'total_sent': total_sent,
+                'message': f'{len(markets)}개 시장에 대해 총 {total_enqueued}건 알림 적재 완료',
+                'total_markets': len(markets),
+                'total_sent': 0,
+                'total_enqueued': total_enqueued,
                 'results': results
             }
 
+        total_sent = sum(r.get('sent_count', 0) for r in results)
+        logger.info(f"테스트 날씨 요약 알림 전송 완료: 총 {total_sent}건 전송")
+
+        return {
+            'success': True,
+            'message': f'{len(markets)}개 시장에 대해 총 {total_sent}건 알림 전송 완료',
+            'total_markets': len(markets),
+            'total_sent': total_sent,
+            'pruned_tokens': pruned_tokens,
+            'results': results
+        }
+
     except Exception as e:
         logger.error(f"테스트 날씨 요약 알림 전송 중 오류: {e}")
         import traceback
@@ -1399,4 +2110,4 @@ def send_test_weather_summary_to_all_users() -> Dict[str, Any]:
             'success': False,
             'error': str(e),
             'total_sent': 0
-        }
\ No newline at end of file
+        }
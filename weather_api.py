@@ -1,7 +1,14 @@
 import requests
 import json
+import hashlib
 from datetime import datetime, timedelta
 
+# 예보 지문 계산에 포함되는 필드 (알림 판단에 영향을 주는 값)
+FORECAST_FINGERPRINT_FIELDS = (
+    'fcst_date', 'fcst_time', 'temp', 'humidity', 'rain_1h', 'wind_speed',
+    'wind_direction', 'pop', 'pty', 'sky', 'lightning'
+)
+
 class KMAWeatherAPI:
     """기상청 날씨 API 클래스"""
     
@@ -132,6 +139,9 @@ class KMAWeatherAPI:
             for weather_data in weather_forecasts:
                 weather_id = self._save_weather_data(weather_data)
                 weather_data['saved_id'] = weather_id
+
+            # 발표 단위 예보 지문 저장 (변경 없는 시장 재평가 생략용)
+            self._save_forecast_fingerprint(nx, ny, weather_forecasts)
             
             return {
                 'status': 'success',
@@ -312,7 +322,16 @@ class KMAWeatherAPI:
             # 존재하지 않으면 새로 생성
             weather = Weather(**weather_data)
             db.session.add(weather)
+            db.session.flush()
+
+            # 같은 트랜잭션에서 격자별 최신 발표 포인터 갱신
+            from weather_latest import record_latest_weather
+            record_latest_weather(weather)
             db.session.commit()
+
+            # 새 데이터가 들어온 격자의 조회 응답 캐시 무효화
+            from weather_cache import weather_response_cache
+            weather_response_cache.invalidate(weather_data['nx'], weather_data['ny'])
             return weather.id
             
         except ImportError:
@@ -328,6 +347,62 @@ class KMAWeatherAPI:
             print(f"⚠️  데이터베이스 저장 실패: {str(e)}")
             return None
 
+    def _save_forecast_fingerprint(self, nx, ny, weather_forecasts):
+        """격자·발표시각별 예보 내용 해시 저장 (같은 발표를 다시 수집하면 해시만 갱신)"""
+        if not weather_forecasts:
+            return None
+
+        try:
+            from app import db
+            from models import ForecastFingerprint
+
+            base_date = weather_forecasts[0]['base_date']
+            base_time = weather_forecasts[0]['base_time']
+            content_hash = compute_forecast_fingerprint(weather_forecasts)
+
+            fingerprint = ForecastFingerprint.query.filter_by(
+                nx=nx, ny=ny, base_date=base_date, base_time=base_time
+            ).first()
+
+            if fingerprint is None:
+                fingerprint = ForecastFingerprint(nx=nx, ny=ny, base_date=base_date, base_time=base_time)
+                db.session.add(fingerprint)
+
+            if fingerprint.content_hash != content_hash:
+                fingerprint.content_hash = content_hash
+                fingerprint.row_count = len(weather_forecasts)
+                db.session.commit()
+
+            return content_hash
+
+        except ImportError:
+            return None
+        except Exception as e:
+            try:
+                from app import db
+                db.session.rollback()
+            except:
+                pass
+            print(f"⚠️  예보 지문 저장 실패: {str(e)}")
+            return None
+
+def compute_forecast_fingerprint(weather_forecasts):
+    """
+    예보 목록의 내용 해시 계산 (예보 시각 순으로 정렬해 순서와 무관하게 동일한 값)
+
+    Args:
+        weather_forecasts (list): 예보 데이터 딕셔너리 리스트
+
+    Returns:
+        str: SHA-256 hex digest
+    """
+    rows = sorted(
+        [[forecast.get(field) for field in FORECAST_FINGERPRINT_FIELDS] for forecast in weather_forecasts],
+        key=lambda row: (row[0] or '', row[1] or '')
+    )
+    payload = json.dumps(rows, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
 # 좌표 변환 유틸리티 함수들
 def convert_to_grid(lat, lon):
     """
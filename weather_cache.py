@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+날씨 조회 응답 캐시
+
+/api/weather/current, /api/weather/forecast 응답을 격자(nx, ny)별로 캐시합니다.
+날씨 데이터는 격자마다 한 시간에 한 번 정도만 바뀌므로, 수집(weather_api._save_weather_data)이
+새 행을 저장할 때 해당 격자의 캐시를 무효화하고 그 사이의 조회는 DB를 거치지 않습니다.
+
+관심 시장 대시보드(/api/watchlist/dashboard)는 사용자별로 캐시하며, 사용자 관심 목록이
+바뀌거나 날씨 수집/알림 로그 기록이 있으면 무효화됩니다.
+
+무효화는 버전 번호를 올리는 방식입니다. 캐시 키에 버전이 포함되므로, 조회 도중
+수집이 끝나 버전이 바뀌면 그 조회가 저장하는 (이미 오래된) 응답은 다시 읽히지 않습니다.
+
+환경변수:
+    WEATHER_CACHE_BACKEND      memory(기본) | redis | off
+    WEATHER_CACHE_TTL_SECONDS  응답 보관 시간 (기본 600초, 무효화가 누락돼도 이 시간 후 갱신)
+    WEATHER_CACHE_MAX_ENTRIES  memory 백엔드 최대 항목 수 (기본 2048, LRU)
+    WEATHER_CACHE_REDIS_URL    redis 백엔드 주소 (redis 패키지 필요, 여러 프로세스가 캐시 공유)
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CACHE_KINDS = ('current', 'forecast', 'dashboard')
+
+# 모든 대시보드가 공유하는 버전 (날씨 수집, 알림 로그 기록 시 증가)
+DASHBOARD_VERSION_KEY = 'dashboards'
+
+
+class CacheBackend:
+    """캐시 저장소 인터페이스"""
+
+    name = 'base'
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl_seconds: float):
+        raise NotImplementedError
+
+    def get_version(self, key: str) -> int:
+        """버전 번호 (무효화된 적 없으면 0)"""
+        raise NotImplementedError
+
+    def bump_version(self, key: str) -> int:
+        """버전 번호를 1 올려 이전 버전의 캐시 항목을 모두 무효화"""
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def size(self) -> Optional[int]:
+        """저장된 항목 수 (알 수 없으면 None)"""
+        return None
+
+
+class MemoryCacheBackend(CacheBackend):
+    """프로세스 내 LRU + TTL 캐시"""
+
+    name = 'memory'
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max(1, max_entries)
+        # key -> (만료 시각, 값)
+        self._entries: 'OrderedDict[str, Tuple[float, Any]]' = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl_seconds: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_version(self, key: str) -> int:
+        with self._lock:
+            return self._versions.get(key, 0)
+
+    def bump_version(self, key: str) -> int:
+        with self._lock:
+            version = self._versions.get(key, 0) + 1
+            self._versions[key] = version
+            return version
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def size(self) -> Optional[int]:
+        with self._lock:
+            return len(self._entries)
+
+
+class RedisCacheBackend(CacheBackend):
+    """Redis 공유 캐시 (여러 프로세스/서버가 같은 캐시와 무효화를 공유)"""
+
+    name = 'redis'
+
+    def __init__(self, url: str, prefix: str = 'weather_cache:'):
+        import redis  # 선택 의존성: redis 백엔드를 쓸 때만 필요
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self.client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any, ttl_seconds: float):
+        payload = json.dumps(value, ensure_ascii=False, default=str)
+        self.client.set(self.prefix + key, payload, ex=max(1, int(ttl_seconds)))
+
+    def get_version(self, key: str) -> int:
+        raw = self.client.get(self.prefix + 'version:' + key)
+        return int(raw) if raw is not None else 0
+
+    def bump_version(self, key: str) -> int:
+        return int(self.client.incr(self.prefix + 'version:' + key))
+
+    def clear(self):
+        for key in self.client.scan_iter(match=self.prefix + '*'):
+            if not key.decode().startswith(self.prefix + 'version:'):
+                self.client.delete(key)
+
+
+class WeatherResponseCache:
+    """격자(nx, ny)별 날씨 조회 응답 캐시 (수집 시 무효화, 적중/실패 통계)"""
+
+    def __init__(self, backend: Optional[CacheBackend] = None, ttl_seconds: float = 600):
+        """
+        Args:
+            backend: 캐시 저장소 (None이면 캐시 사용 안 함)
+            ttl_seconds: 응답 보관 시간
+        """
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._stats = {kind: {'hits': 0, 'misses': 0} for kind in CACHE_KINDS}
+        self._invalidations = 0
+        self._errors = 0
+
+    @classmethod
+    def from_env(cls) -> 'WeatherResponseCache':
+        return cls(
+            backend=create_cache_backend_from_env(),
+            ttl_seconds=float(os.environ.get('WEATHER_CACHE_TTL_SECONDS', '600'))
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None and self.ttl_seconds > 0
+
+    @staticmethod
+    def _grid_key(nx: int, ny: int) -> str:
+        return f"{nx}:{ny}"
+
+    @staticmethod
+    def _user_key(user_id: int) -> str:
+        return f"user:{user_id}"
+
+    def _record_error(self, action: str, error: Exception):
+        with self._lock:
+            self._errors += 1
+        logger.warning(f"날씨 캐시 {action} 실패 ({self.backend.name}): {error}")
+
+    def _lookup(self, kind: str, name: str, version_keys: Tuple[str, ...]) -> Tuple[Optional[Dict], Optional[str]]:
+        """버전 번호들을 붙인 키로 조회 (응답, set()에 넘길 키)"""
+        if not self.enabled:
+            return None, None
+
+        try:
+            versions = '.'.join(str(self.backend.get_version(key)) for key in version_keys)
+            key = f"{kind}:{name}:v{versions}"
+            value = self.backend.get(key)
+        except Exception as e:
+            # 캐시 장애는 조회 실패로 이어지지 않도록 DB 조회로 대체
+            self._record_error('조회', e)
+            return None, None
+
+        with self._lock:
+            self._stats[kind]['hits' if value is not None else 'misses'] += 1
+        return value, key
+
+    def get(self, kind: str, nx: int, ny: int) -> Tuple[Optional[Dict], Optional[str]]:
+        """
+        캐시된 격자 응답 조회
+
+        Returns:
+            tuple: (캐시된 응답 또는 None, 응답을 저장할 때 set()에 넘길 키)
+        """
+        return self._lookup(kind, self._grid_key(nx, ny), (self._grid_key(nx, ny),))
+
+    def get_dashboard(self, user_id: int) -> Tuple[Optional[Dict], Optional[str]]:
+        """캐시된 사용자 대시보드 조회 (반환 형식은 get()과 같음)"""
+        return self._lookup('dashboard', str(user_id), (self._user_key(user_id), DASHBOARD_VERSION_KEY))
+
+    def set(self, key: Optional[str], response: Dict):
+        """get()이 돌려준 키로 응답 저장 (키가 없으면 무시)"""
+        if not key or not self.enabled:
+            return
+        try:
+            self.backend.set(key, response, self.ttl_seconds)
+        except Exception as e:
+            self._record_error('저장', e)
+
+    def _bump(self, *version_keys: str):
+        if self.backend is None:
+            return
+        try:
+            for key in version_keys:
+                self.backend.bump_version(key)
+            with self._lock:
+                self._invalidations += 1
+        except Exception as e:
+            self._record_error('무효화', e)
+
+    def invalidate(self, nx: int, ny: int):
+        """격자의 현재/예보 응답과 모든 대시보드 캐시 무효화 (새 날씨 데이터 저장 후 호출)"""
+        self._bump(self._grid_key(nx, ny), DASHBOARD_VERSION_KEY)
+
+    def invalidate_user(self, user_id: int):
+        """사용자 대시보드 캐시 무효화 (관심 목록 변경 후 호출)"""
+        self._bump(self._user_key(user_id))
+
+    def invalidate_dashboards(self):
+        """모든 대시보드 캐시 무효화 (알림 로그 기록 후 호출)"""
+        self._bump(DASHBOARD_VERSION_KEY)
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def metrics(self) -> Dict[str, Any]:
+        """종류별 적중/실패 수와 적중률, 무효화 횟수"""
+        with self._lock:
+            stats = {kind: dict(counts) for kind, counts in self._stats.items()}
+            invalidations = self._invalidations
+            errors = self._errors
+
+        for counts in stats.values():
+            total = counts['hits'] + counts['misses']
+            counts['hit_ratio'] = round(counts['hits'] / total, 4) if total else 0.0
+
+        hits = sum(counts['hits'] for counts in stats.values())
+        misses = sum(counts['misses'] for counts in stats.values())
+        return {
+            'backend': self.backend.name if self.backend is not None else 'off',
+            'ttl_seconds': self.ttl_seconds,
+            'entries': self.backend.size() if self.backend is not None else 0,
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            'by_kind': stats,
+            'invalidations': invalidations,
+            'evictions': getattr(self.backend, 'evictions', None),
+            'errors': errors
+        }
+
+
+def create_cache_backend_from_env() -> Optional[CacheBackend]:
+    """WEATHER_CACHE_BACKEND 환경변수에 맞는 캐시 저장소 생성 (off면 None)"""
+    backend = os.environ.get('WEATHER_CACHE_BACKEND', 'memory').lower()
+
+    if backend in ('off', 'none', 'false', '0'):
+        return None
+    if backend == 'redis':
+        try:
+            return RedisCacheBackend(os.environ.get('WEATHER_CACHE_REDIS_URL', 'redis://localhost:6379/0'))
+        except ImportError:
+            logger.warning("redis package is not installed, falling back to memory weather cache")
+    elif backend != 'memory':
+        logger.warning(f"Unknown WEATHER_CACHE_BACKEND '{backend}', falling back to memory")
+    return MemoryCacheBackend(max_entries=int(os.environ.get('WEATHER_CACHE_MAX_ENTRIES', '2048')))
+
+
+# 프로세스 전체가 공유하는 날씨 응답 캐시
+weather_response_cache = WeatherResponseCache.from_env()
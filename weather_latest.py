@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+격자별 최신 날씨 포인터 (weather_latest)
+
+weather 테이블은 발표마다 행이 쌓이므로 "최신 발표"를 찾으려면 이력 전체를
+base_date/base_time(또는 created_at) 역순으로 정렬해야 했습니다. 수집 시
+(nx, ny, api_type)마다 최신 발표를 가리키는 포인터를 같은 트랜잭션에서 upsert해 두고,
+조회는 포인터 기본키 조회 + 해당 발표 행 인덱스 조회로 처리합니다.
+
+포인터는 더 최신(같거나 늦은 base_date/base_time) 발표가 들어올 때만 바뀌므로
+늦게 도착한 과거 발표가 최신 포인터를 덮어쓰지 않습니다.
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import func, insert, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+
+from database import db
+from models import Weather, WeatherLatest
+
+logger = logging.getLogger(__name__)
+
+
+def _upsert_statement(values: Dict):
+    """더 최신 발표일 때만 갱신하는 upsert 문 (PostgreSQL/SQLite는 ON CONFLICT, 그 외 None)"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        dialect_insert = postgresql.insert
+    elif dialect == 'sqlite':
+        dialect_insert = sqlite.insert
+    else:
+        return None
+
+    statement = dialect_insert(WeatherLatest).values(**values)
+    return statement.on_conflict_do_update(
+        index_elements=[WeatherLatest.nx, WeatherLatest.ny, WeatherLatest.api_type],
+        set_={
+            'base_date': statement.excluded.base_date,
+            'base_time': statement.excluded.base_time,
+            'weather_id': statement.excluded.weather_id,
+            'collected_at': statement.excluded.collected_at
+        },
+        where=tuple_(WeatherLatest.base_date, WeatherLatest.base_time)
+        <= tuple_(statement.excluded.base_date, statement.excluded.base_time)
+    )
+
+
+def record_latest_weather(weather: Weather):
+    """
+    새로 저장한 weather 행으로 포인터 갱신 (커밋은 호출하는 쪽에서, 행 ID가 있도록 flush 후 호출)
+    """
+    values = {
+        'nx': weather.nx,
+        'ny': weather.ny,
+        'api_type': weather.api_type,
+        'base_date': weather.base_date,
+        'base_time': weather.base_time,
+        'weather_id': weather.id,
+        'collected_at': weather.created_at or datetime.utcnow()
+    }
+
+    statement = _upsert_statement(values)
+    if statement is not None:
+        db.session.execute(statement)
+        return
+
+    pointer = db.session.get(WeatherLatest, (weather.nx, weather.ny, weather.api_type))
+    if pointer is None:
+        db.session.add(WeatherLatest(**values))
+    elif (pointer.base_date, pointer.base_time) <= (weather.base_date, weather.base_time):
+        for key, value in values.items():
+            setattr(pointer, key, value)
+
+
+def get_latest_pointer(nx: int, ny: int, api_type: str) -> Optional[WeatherLatest]:
+    """격자·종류의 최신 발표 포인터 (기본키 조회)"""
+    return db.session.get(WeatherLatest, (nx, ny, api_type))
+
+
+def get_latest_current(nx: int, ny: int) -> Optional[Weather]:
+    """격자의 최신 현재 날씨 행"""
+    pointer = get_latest_pointer(nx, ny, 'current')
+    if pointer is None or pointer.weather_id is None:
+        return None
+    return db.session.get(Weather, pointer.weather_id)
+
+
+def latest_forecast_query(nx: int, ny: int, pointer: Optional[WeatherLatest] = None):
+    """
+    격자의 최신 발표 예보 행 쿼리 (예보 시각 순, idx_weather_lookup 사용)
+
+    Returns:
+        Query 또는 None (포인터 없음)
+    """
+    if pointer is None:
+        pointer = get_latest_pointer(nx, ny, 'forecast')
+    if pointer is None:
+        return None
+    return Weather.query.filter_by(
+        nx=nx,
+        ny=ny,
+        base_date=pointer.base_date,
+        base_time=pointer.base_time,
+        api_type='forecast'
+    ).order_by(Weather.fcst_date.asc(), Weather.fcst_time.asc())
+
+
+def load_latest_weather_by_grid(grids: Iterable[Tuple[int, int]], forecast_limit: int = 6) -> Dict[tuple, Dict[str, Any]]:
+    """
+    여러 격자의 최신 현재 날씨와 최신 발표 예보(앞 forecast_limit개 시각)를 한 번에 조회
+
+    포인터 1회, 현재 날씨 1회(ID 조회), 예보 1회(발표 키 조회)의 쿼리로 모든 격자를 적재합니다.
+
+    Returns:
+        Dict: {(nx, ny): {'current': Weather | None, 'forecast': [Weather, ...]}}
+    """
+    grids = list(grids)
+    weather_by_grid = {grid: {'current': None, 'forecast': []} for grid in grids}
+    if not grids:
+        return weather_by_grid
+
+    pointers = WeatherLatest.query.filter(tuple_(WeatherLatest.nx, WeatherLatest.ny).in_(grids)).all()
+
+    current_ids = [p.weather_id for p in pointers if p.api_type == 'current' and p.weather_id is not None]
+    if current_ids:
+        for weather in Weather.query.filter(Weather.id.in_(current_ids)).all():
+            weather_by_grid[(weather.nx, weather.ny)]['current'] = weather
+
+    issuances = [(p.nx, p.ny, p.base_date, p.base_time) for p in pointers if p.api_type == 'forecast']
+    if issuances:
+        ranked = db.session.query(
+            Weather.id.label('id'),
+            func.row_number().over(
+                partition_by=(Weather.nx, Weather.ny),
+                order_by=(Weather.fcst_date.asc(), Weather.fcst_time.asc())
+            ).label('fcst_rank')
+        ).filter(
+            Weather.api_type == 'forecast',
+            tuple_(Weather.nx, Weather.ny, Weather.base_date, Weather.base_time).in_(issuances)
+        ).subquery()
+
+        forecast_rows = Weather.query.join(
+            ranked, Weather.id == ranked.c.id
+        ).filter(
+            ranked.c.fcst_rank <= forecast_limit
+        ).order_by(Weather.fcst_date.asc(), Weather.fcst_time.asc()).all()
+
+        for weather in forecast_rows:
+            weather_by_grid[(weather.nx, weather.ny)]['forecast'].append(weather)
+
+    return weather_by_grid
+
+
+def prune_latest_pointers(before: datetime) -> int:
+    """보관 기간이 지나 삭제된 발표를 가리키는 포인터 삭제 (커밋은 호출하는 쪽에서)"""
+    return WeatherLatest.query.filter(WeatherLatest.collected_at < before).delete(synchronize_session=False)
+
+
+def refresh_weather_latest(grids: Optional[Iterable[Tuple[int, int]]] = None) -> int:
+    """
+    weather 이력에서 포인터를 다시 계산 (수집 경로를 거치지 않은 대량 적재 후 호출)
+
+    (nx, ny, api_type)별 최신 발표의 마지막 행을 row_number로 골라 INSERT ... SELECT 한 번으로
+    등록합니다.
+
+    Args:
+        grids: 다시 계산할 격자 목록 (None이면 전체)
+
+    Returns:
+        int: 등록된 포인터 수
+    """
+    ranked_query = select(
+        Weather.nx, Weather.ny, Weather.api_type, Weather.base_date, Weather.base_time,
+        Weather.id, Weather.created_at,
+        func.row_number().over(
+            partition_by=(Weather.nx, Weather.ny, Weather.api_type),
+            order_by=(Weather.base_date.desc(), Weather.base_time.desc(),
+                      Weather.created_at.desc(), Weather.id.desc())
+        ).label('rn')
+    )
+    pointers = WeatherLatest.query
+    if grids is not None:
+        grids = list(grids)
+        if not grids:
+            return 0
+        ranked_query = ranked_query.where(tuple_(Weather.nx, Weather.ny).in_(grids))
+        pointers = pointers.filter(tuple_(WeatherLatest.nx, WeatherLatest.ny).in_(grids))
+    ranked = ranked_query.subquery()
+
+    pointers.delete(synchronize_session=False)
+    source = select(
+        ranked.c.nx, ranked.c.ny, ranked.c.api_type, ranked.c.base_date, ranked.c.base_time,
+        ranked.c.id, ranked.c.created_at
+    ).where(ranked.c.rn == 1)
+
+    result = db.session.execute(
+        insert(WeatherLatest).from_select(
+            ['nx', 'ny', 'api_type', 'base_date', 'base_time', 'weather_id', 'collected_at'], source
+        )
+    )
+    db.session.commit()
+    return result.rowcount or 0
+
+
+def rebuild_weather_latest() -> int:
+    """
+    포인터 테이블이 비어 있으면 weather 이력에서 한 번에 채움 (기존 데이터 이전용)
+
+    이후에는 수집이 포인터를 갱신하므로 이미 채워져 있으면 아무것도 하지 않습니다.
+
+    Returns:
+        int: 새로 등록된 포인터 수
+    """
+    if db.session.query(WeatherLatest.nx).first() is not None:
+        return 0
+
+    created = refresh_weather_latest()
+    if created:
+        logger.info(f"weather_latest 백필: {created}개 격자 포인터 등록")
+    return created
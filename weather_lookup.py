@@ -0,0 +1,325 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+날씨 조회 응답 구성 (단건/일괄)
+
+/api/weather/current, /api/weather/forecast 단건 응답과 /api/weather/batch 일괄 응답을
+같은 형식으로 만듭니다. 일괄 조회는 요청한 시장/격자를 격자 단위로 중복 제거한 뒤
+격자별 응답 캐시(weather_cache)에서 먼저 찾고, 없는 격자만 최신 포인터(weather_latest)로
+묶어 한 번에 조회합니다.
+
+관심 시장 대시보드(/api/watchlist/dashboard)와 가까운 시장 조회(/api/markets/nearby)도 같은
+일괄 조회를 사용해, 시장 수와 관계없이 고정된 횟수의 쿼리로 시장별 날씨를 구성합니다.
+
+환경변수:
+    WEATHER_BATCH_MAX_GRIDS         일괄 조회 최대 격자 수 (기본 200)
+    WEATHER_BATCH_STREAM_THRESHOLD  이 격자 수를 넘으면 NDJSON 스트리밍 응답 (기본 50)
+    WEATHER_BATCH_CHUNK_SIZE        한 번에 DB에서 적재하는 격자 수 (기본 50)
+"""
+
+import os
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from datetime import datetime
+
+from sqlalchemy import func, or_, tuple_
+from sqlalchemy.orm import joinedload
+
+from database import db
+from market_geo import market_geo_index
+from models import Market, MarketAlarmLog, UserMarketInterest
+from weather_cache import weather_response_cache
+from weather_latest import load_latest_weather_by_grid
+
+logger = logging.getLogger(__name__)
+
+# 단건 예보 응답과 같은 최대 예보 행 수
+FORECAST_ROW_LIMIT = 100
+
+BATCH_MAX_GRIDS = int(os.environ.get('WEATHER_BATCH_MAX_GRIDS', '200'))
+BATCH_STREAM_THRESHOLD = int(os.environ.get('WEATHER_BATCH_STREAM_THRESHOLD', '50'))
+BATCH_CHUNK_SIZE = int(os.environ.get('WEATHER_BATCH_CHUNK_SIZE', '50'))
+
+
+def build_current_result(market: Market, weather) -> Dict[str, Any]:
+    """현재 날씨 단건 응답 본문"""
+    return {
+        'status': 'success',
+        'message': f'{market.name}의 최신 날씨 데이터를 가져왔습니다.',
+        'data': weather.to_dict(),
+        'location_name': market.name,
+        'nx': market.nx,
+        'ny': market.ny
+    }
+
+
+def build_forecast_result(nx: int, ny: int, forecasts: List) -> Dict[str, Any]:
+    """최신 발표 예보 단건 응답 본문 (forecasts는 예보 시각 순, 비어 있지 않아야 함)"""
+    return {
+        'status': 'success',
+        'message': '데이터베이스에서 최신 예보 데이터를 가져왔습니다.',
+        'data': [weather.to_dict() for weather in forecasts],
+        'location_name': forecasts[0].location_name,
+        'nx': nx,
+        'ny': ny,
+        'base_date': forecasts[0].base_date,
+        'base_time': forecasts[0].base_time
+    }
+
+
+class BatchRequestError(ValueError):
+    """일괄 조회 요청 형식 오류 (400)"""
+
+
+def _parse_grid(item) -> Tuple[int, int]:
+    if isinstance(item, dict):
+        return int(item['nx']), int(item['ny'])
+    nx, ny = item
+    return int(nx), int(ny)
+
+
+def parse_batch_request(data: Dict[str, Any]) -> Tuple[List[int], List[Tuple[int, int]]]:
+    """
+    요청 본문에서 시장 ID와 격자 목록 추출 (순서 유지, 중복 제거)
+
+    Raises:
+        BatchRequestError: 형식 오류, 빈 요청, 최대 개수 초과
+    """
+    market_ids = data.get('market_ids') or []
+    grids = data.get('grids') or []
+    if not isinstance(market_ids, list) or not isinstance(grids, list):
+        raise BatchRequestError('market_ids와 grids는 배열이어야 합니다.')
+
+    try:
+        market_ids = list(dict.fromkeys(int(market_id) for market_id in market_ids))
+        grids = list(dict.fromkeys(_parse_grid(item) for item in grids))
+    except (KeyError, TypeError, ValueError):
+        raise BatchRequestError('market_ids는 정수, grids는 {"nx", "ny"} 또는 [nx, ny] 형식이어야 합니다.')
+
+    if not market_ids and not grids:
+        raise BatchRequestError('market_ids 또는 grids가 필요합니다.')
+    # 시장 ID는 격자로 합쳐지므로 요청 항목 수 기준으로 먼저 제한 (조회 전 거부)
+    if len(market_ids) + len(grids) > BATCH_MAX_GRIDS:
+        raise BatchRequestError(f'한 번에 최대 {BATCH_MAX_GRIDS}개까지 조회할 수 있습니다.')
+    return market_ids, grids
+
+
+def resolve_batch_grids(market_ids: List[int], grids: List[Tuple[int, int]]
+                        ) -> Tuple[Dict[Tuple[int, int], Dict[str, Any]], List[int]]:
+    """
+    요청 시장/격자를 격자 단위로 합침 (활성 시장 조회 1회)
+
+    Returns:
+        tuple: ({(nx, ny): {'market': 대표 시장 | None, 'market_ids': [요청한 시장 ID, ...]}} (요청 순서),
+                찾을 수 없거나 격자가 없는 시장 ID 목록)
+    """
+    conditions = []
+    if market_ids:
+        conditions.append(Market.id.in_(market_ids))
+    if grids:
+        conditions.append(tuple_(Market.nx, Market.ny).in_(grids))
+
+    markets = Market.query.filter(
+        Market.is_active == True,
+        Market.nx.isnot(None),
+        Market.ny.isnot(None),
+        or_(*conditions)
+    ).order_by(Market.id).all()
+
+    by_id = {market.id: market for market in markets}
+    representative = {}
+    for market in markets:
+        representative.setdefault((market.nx, market.ny), market)
+
+    resolved: Dict[Tuple[int, int], Dict[str, Any]] = {}
+    missing_market_ids = []
+    for market_id in market_ids:
+        market = by_id.get(market_id)
+        if market is None:
+            missing_market_ids.append(market_id)
+            continue
+        entry = resolved.setdefault((market.nx, market.ny), {'market': representative[(market.nx, market.ny)],
+                                                             'market_ids': []})
+        entry['market_ids'].append(market_id)
+    for grid in grids:
+        resolved.setdefault(grid, {'market': representative.get(grid), 'market_ids': []})
+    return resolved, missing_market_ids
+
+
+def _grid_item(grid: Tuple[int, int], market: Optional[Market], market_ids: List[int],
+               current: Optional[Dict], forecast: Optional[Dict]) -> Dict[str, Any]:
+    """일괄 응답의 격자 1개 항목"""
+    nx, ny = grid
+    item = {
+        'nx': nx,
+        'ny': ny,
+        'market_ids': market_ids,
+        'location_name': market.name if market is not None else None,
+        'current': current['data'] if current else None,
+        'forecast': {
+            'base_date': forecast['base_date'],
+            'base_time': forecast['base_time'],
+            'data': forecast['data']
+        } if forecast else None
+    }
+    if market is None:
+        item['error'] = f'해당 위치의 시장 정보가 없습니다. (격자좌표: {nx}, {ny})'
+    return item
+
+
+def iter_batch_weather(resolved: Dict[Tuple[int, int], Dict[str, Any]],
+                       chunk_size: int = None) -> Iterator[Dict[str, Any]]:
+    """
+    격자별 현재 날씨/최신 예보 항목 생성 (chunk_size개 격자씩 캐시 확인 후 나머지를 한 번에 적재)
+
+    현재 날씨는 단건 API처럼 활성 시장이 있는 격자만 반환합니다.
+    """
+    chunk_size = max(1, chunk_size or BATCH_CHUNK_SIZE)
+    grids = list(resolved)
+
+    for start in range(0, len(grids), chunk_size):
+        chunk = grids[start:start + chunk_size]
+
+        results = {}
+        missing = []
+        for grid in chunk:
+            current, current_key = weather_response_cache.get('current', *grid)
+            forecast, forecast_key = weather_response_cache.get('forecast', *grid)
+            results[grid] = {'current': current, 'forecast': forecast,
+                             'current_key': current_key, 'forecast_key': forecast_key}
+            if current is None or forecast is None:
+                missing.append(grid)
+
+        if missing:
+            loaded = load_latest_weather_by_grid(missing, forecast_limit=FORECAST_ROW_LIMIT)
+            for grid in missing:
+                entry = results[grid]
+                market = resolved[grid]['market']
+                if entry['current'] is None and market is not None and loaded[grid]['current'] is not None:
+                    entry['current'] = build_current_result(market, loaded[grid]['current'])
+                    weather_response_cache.set(entry['current_key'], entry['current'])
+                if entry['forecast'] is None and loaded[grid]['forecast']:
+                    entry['forecast'] = build_forecast_result(grid[0], grid[1], loaded[grid]['forecast'])
+                    weather_response_cache.set(entry['forecast_key'], entry['forecast'])
+
+        for grid in chunk:
+            entry = results[grid]
+            market = resolved[grid]['market']
+            yield _grid_item(grid, market, resolved[grid]['market_ids'],
+                             entry['current'] if market is not None else None, entry['forecast'])
+
+
+def batch_should_stream(grid_count: int, requested: Optional[bool] = None) -> bool:
+    """요청이 명시하지 않으면 격자 수로 스트리밍 여부 결정"""
+    if requested is not None:
+        return bool(requested)
+    return grid_count > BATCH_STREAM_THRESHOLD
+
+
+def load_weather_for_markets(markets: Iterable[Optional[Market]]) -> Dict[Tuple[int, int], Dict[str, Any]]:
+    """시장들을 격자 단위로 묶어 한 번에 날씨 조회 ({(nx, ny): 일괄 응답 항목})"""
+    resolved: Dict[Tuple[int, int], Dict[str, Any]] = {}
+    for market in markets:
+        if market is None or market.nx is None or market.ny is None:
+            continue
+        entry = resolved.setdefault((market.nx, market.ny), {'market': market, 'market_ids': []})
+        entry['market_ids'].append(market.id)
+
+    return {
+        (item['nx'], item['ny']): item
+        for item in iter_batch_weather(resolved, chunk_size=max(1, len(resolved)))
+    }
+
+
+def build_nearby_markets(lat: float, lon: float, k: int, radius_km: Optional[float] = None) -> Dict[str, Any]:
+    """
+    가까운 시장 응답 구성 (위치 인덱스로 k개 선택 후 시장 1회, 날씨 최대 3회 조회)
+    """
+    nearby = market_geo_index.nearest(lat, lon, k, radius_km)
+    markets = {market.id: market for market in Market.query.filter(
+        Market.id.in_([item.market_id for item in nearby]),
+        Market.is_active == True
+    ).all()} if nearby else {}
+
+    weather_by_grid = load_weather_for_markets(markets.values())
+
+    results = []
+    for item in nearby:
+        market = markets.get(item.market_id)
+        if market is None:
+            continue
+        weather = weather_by_grid.get((market.nx, market.ny))
+        entry = market.to_dict()
+        entry.update({
+            'distance_km': round(item.distance_km, 3),
+            'current_weather': weather['current'] if weather else None,
+            'forecast': weather['forecast'] if weather else None
+        })
+        results.append(entry)
+
+    return {
+        'status': 'success',
+        'lat': lat,
+        'lon': lon,
+        'radius_km': radius_km,
+        'count': len(results),
+        'markets': results
+    }
+
+
+def load_latest_alarm_logs(market_ids: List[int]) -> Dict[int, MarketAlarmLog]:
+    """시장별 가장 최근 알림 로그를 한 번에 조회 (시장별 row_number)"""
+    if not market_ids:
+        return {}
+
+    ranked = db.session.query(
+        MarketAlarmLog.id.label('id'),
+        func.row_number().over(
+            partition_by=MarketAlarmLog.market_id,
+            order_by=(MarketAlarmLog.created_at.desc(), MarketAlarmLog.id.desc())
+        ).label('rn')
+    ).filter(MarketAlarmLog.market_id.in_(market_ids)).subquery()
+
+    logs = MarketAlarmLog.query.join(ranked, MarketAlarmLog.id == ranked.c.id).filter(ranked.c.rn == 1).all()
+    return {log.market_id: log for log in logs}
+
+
+def build_watchlist_dashboard(user_id: int) -> Dict[str, Any]:
+    """
+    관심 시장 대시보드 응답 구성
+
+    관심 목록 1회(시장 즉시 로딩), 날씨 최대 3회(캐시 적중 시 생략), 최근 알림 1회로
+    관심 시장 수와 관계없이 고정된 횟수의 쿼리만 실행합니다.
+    """
+    interests = UserMarketInterest.query.options(
+        joinedload(UserMarketInterest.market)
+    ).filter_by(
+        user_id=user_id,
+        is_active=True
+    ).order_by(UserMarketInterest.created_at, UserMarketInterest.id).all()
+
+    # 관심 시장을 격자 단위로 묶어 한 번에 날씨 조회
+    weather_by_grid = load_weather_for_markets(interest.market for interest in interests)
+    # 시장은 위에서 즉시 로딩되어 로그의 market 관계도 추가 쿼리 없이 채워짐
+    latest_logs = load_latest_alarm_logs([interest.market_id for interest in interests])
+
+    watchlist = []
+    for interest in interests:
+        market = interest.market
+        weather = weather_by_grid.get((market.nx, market.ny)) if market is not None else None
+        log = latest_logs.get(interest.market_id)
+        item = interest.to_dict()
+        item.update({
+            'current_weather': weather['current'] if weather else None,
+            'forecast': weather['forecast'] if weather else None,
+            'latest_alarm': log.to_dict() if log else None
+        })
+        watchlist.append(item)
+
+    return {
+        'status': 'success',
+        'count': len(watchlist),
+        'watchlist': watchlist,
+        'generated_at': datetime.utcnow().isoformat()
+    }
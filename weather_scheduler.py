@@ -216,6 +216,11 @@ class WeatherScheduler:
 
             if result.get('success'):
                 logger.info(f"날씨 알림 완료: {result.get('message')}")
+                metrics = result.get('metrics') or {}
+                if 'skip_rate' in metrics:
+                    logger.info(f"변경 없는 시장 재평가 생략: {metrics['skipped_markets']}개 (생략률 {metrics['skip_rate']:.1%})")
+                if metrics.get('pruned_tokens'):
+                    logger.info(f"무효 FCM 토큰 정리: {metrics['pruned_tokens']}건")
                 # 어떤 종류의 알림이 전송되었는지 로그
                 if result.get('results'):
                     alert_summary = {}
@@ -245,7 +250,15 @@ class WeatherScheduler:
                 
                 # 삭제 대상 조회 및 삭제
                 deleted_count = Weather.query.filter(Weather.created_at < cutoff_date).delete()
+                # 삭제된 발표만 가리키는 최신 포인터도 정리
+                from weather_latest import prune_latest_pointers
+                prune_latest_pointers(cutoff_date)
                 db.session.commit()
+
+                if deleted_count:
+                    # 삭제된 행이 캐시된 응답에 남지 않도록 날씨 조회 캐시 비움
+                    from weather_cache import weather_response_cache
+                    weather_response_cache.clear()
                 
                 logger.info(f"오래된 날씨 데이터 삭제 완료: {deleted_count}개 레코드 삭제됨")
                 
@@ -253,6 +266,21 @@ class WeatherScheduler:
             logger.error(f"오래된 데이터 삭제 중 오류: {str(e)}")
             # 롤백은 자동 처리됨 (새 세션)
     
+    def validate_fcm_tokens(self):
+        """저장된 FCM 토큰 dry-run 검증 및 무효 토큰 일괄 정리 (한산한 새벽 시간대)"""
+        logger.info("FCM 토큰 검증 작업 시작")
+        try:
+            from token_validation import validate_stored_tokens
+
+            with app.app_context():
+                result = validate_stored_tokens()
+
+            if not result.get('success'):
+                logger.error(f"FCM 토큰 검증 실패: {result.get('error')}")
+
+        except Exception as e:
+            logger.error(f"FCM 토큰 검증 작업 중 오류: {str(e)}")
+
     def start(self):
         """스케줄러 시작"""
         if not self.weather_api:
@@ -289,6 +317,19 @@ class WeatherScheduler:
         )
         logger.info("오래된 데이터 삭제 작업 등록: 매일 03:00")
 
+        # FCM 토큰 검증 작업 등록 (매일 새벽, 정각 알림/45분 수집과 겹치지 않게 30분)
+        from token_validation import token_validation_enabled
+        if token_validation_enabled():
+            validation_hour = os.environ.get('TOKEN_VALIDATION_CRON_HOUR', '4')
+            self.scheduler.add_job(
+                func=self.validate_fcm_tokens,
+                trigger=CronTrigger(hour=validation_hour, minute='30'),
+                id='fcm_token_validation_job',
+                name=f'FCM 토큰 검증 (매일 {validation_hour}:30)',
+                replace_existing=True
+            )
+            logger.info(f"FCM 토큰 검증 작업 등록: 매일 {validation_hour}:30")
+
         # 스케줄러 시작
         self.scheduler.start()
         logger.info("=" * 60)